@@ -1,113 +1,168 @@
 import time
 import os
+import functools
+import threading
 import json
 import re
 # import google.generativeai as genai # <--- We don't need this anymore
-from groq import Groq # <--- Import the new library
-from flask import Flask, request, jsonify
+from flask import Blueprint, Flask, Response, abort, current_app, request, jsonify, send_from_directory, stream_with_context
 from flask_cors import CORS
-from dotenv import load_dotenv
-from models import db, Article
 from prompts import get_combined_prompt, get_keyword_prompt
-import firebase_admin
-from firebase_admin import credentials, storage
-from models import db, Article, Category 
-import requests
+from providers import generate_image
+from image_processing import process_image_later
+from image_library import add_to_library, find_reusable, get_relevant_fallback_image
+from storage import CACHE_CONTROL, LocalStorage, get_storage, upload_image
+from model_router import route_chat
+import llm_cache
+from streaming import stream_article, repair_fields
+from models import db, Article, ArticleImage, Category, IMAGE_PLACEHOLDER_RE
+from config import load_config
+from persistence import insert_article, mark_articles_changed, upsert_categories
+from categories import get_categories
+import feeds
+from export import category_articles
+import instrumentation
+import db_routing
+from db_routing import replica_reads
 import random
 import base64
-from slugify import slugify
 from flask_migrate import Migrate
 from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import defer
 
-# Load environment variables
-load_dotenv()
+# All routes live on this blueprint; create_app() registers it on a configured app.
+# Nothing here touches the network or the database at import time: Firebase,
+# Groq and the provider pools are created on first use.
+api = Blueprint('api', __name__)
+migrate = Migrate()
 
-# Configure Flask App
-app = Flask(__name__)
 
-frontend_url = os.getenv("FRONTEND_URL") 
-allowed_origins = ["http://localhost:3000"]
-
-if frontend_url:
-    allowed_origins.append(frontend_url)
-
-# Apply the CORS configuration.
-# The 'origins' parameter directly accepts our list of allowed domains.
-CORS(app, origins=allowed_origins, supports_credentials=True)
-
-# --- Ensure your Firebase setup is present ---
-if not firebase_admin._apps:
-    # Get the absolute path to the directory containing this script (app.py)
-    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-    # Join that path with the credentials filename to create the correct path
-    CRED_PATH = os.path.join(BASE_DIR, "firebase-credentials.json")
-
-    try:
-        cred = credentials.Certificate(CRED_PATH)
-        firebase_admin.initialize_app(cred, {
-            'storageBucket': os.getenv("FIREBASE_STORAGE_BUCKET")
-        })
-        print("Firebase Admin SDK initialized successfully.")
-    except Exception as e:
-        print(f"!!! CRITICAL: Failed to initialize Firebase Admin SDK: {e} !!!")
-
-    
-# Configure Database (this stays the same)
-app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL')
-app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
-    'pool_pre_ping': True,
-    'pool_recycle': 300, 
-}
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db.init_app(app)
-migrate = Migrate(app, db)
-
-with app.app_context():
-    db.create_all()
-
-
-client = Groq(
-    api_key=os.getenv("GROQ_API_KEY"),
-)
+def generation_slot(view):
+    """
+    Caps how many generation requests one process serves at a time
+    (GENERATION_SLOTS), so slow provider calls can never occupy every thread
+    and reader endpoints always have threads left. Over the cap, the request
+    gets a 503 with Retry-After instead of queueing.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        slots = current_app.extensions.get('generation_slots')
+        if slots is None:
+            return view(*args, **kwargs)
+        if not slots.acquire(blocking=False):
+            response = jsonify({"error": "The server is busy generating other articles. Please retry shortly."})
+            response.headers['Retry-After'] = '30'
+            return response, 503
+        try:
+            response = current_app.make_response(view(*args, **kwargs))
+        except BaseException:
+            slots.release()
+            raise
+        if response.is_streamed:
+            # A stream keeps generating after the view returns; free the slot when it closes
+            response.call_on_close(slots.release)
+        else:
+            slots.release()
+        return response
+    return wrapper
 
-FIREWORKS_API_KEY = os.getenv("FIREWORKS_API_KEY")
-FIREWORKS_API_URL = "https://api.fireworks.ai/inference/v1/workflows/accounts/fireworks/models/flux-1-schnell-fp8/text_to_image"
-FIREWORKS_MODEL_ID = "stable-diffusion-xl-lightning-4step"
 
-def get_random_fallback_image():
+def save_generated_article(data):
     """
-    Fetches the list of all images from Firebase Storage
-    and returns the public URL of a random one.
+    Adds internal links to a freshly generated article and saves it.
+    Returns (article, created); an existing article with the same slug is returned as is.
     """
-    try:
-        print("--- Initiating fallback: fetching existing images from Firebase Storage ---")
-        bucket = storage.bucket()
-        # List all blobs in the 'images/' directory
-        blobs = bucket.list_blobs(prefix='images/')
-        
-        # Collect all public URLs into a list, skipping the folder itself
-        image_urls = [blob.public_url for blob in blobs if blob.name != 'images/']
-        
-        if not image_urls:
-            print("--- Fallback failed: No existing images found in Firebase Storage. ---")
-            return None
-
-        # Select one URL at random
-        random_url = random.choice(image_urls)
-        print(f"--- Fallback successful. Selected random image: {random_url} ---")
-        return random_url
-    except Exception as e:
-        print(f"--- Fallback failed with an error: {e} ---")
-        return None
+    # --- NEW: Automated Internal Linking Logic ---
+    article_content = data['content']
+    search_terms = data['title'].split(' ')[-3:]
+    search_query = func.plainto_tsquery('english', ' & '.join(search_terms))
+    
+    # Instead of .match(), we use the custom '@@' operator to prevent
+    # SQLAlchemy from double-wrapping our search query.
+    relevant_articles = db.session.query(Article.title, Article.slug)\
+        .filter(Article.is_published == True)\
+        .filter(func.to_tsvector('english', Article.title).op('@@')(search_query))\
+        .limit(2).all()
+
+    if relevant_articles:
+        links_markdown = "\n\n### Read More:\n"
+        for rel_title, rel_slug in relevant_articles:
+            links_markdown += f"- [{rel_title}](/blog/{rel_slug})\n"
+        
+        article_content += links_markdown
+        data['content'] = article_content
+    # --- END of Internal Linking Logic ---
+
+    # --- Save to Database ---
+    # The unique (slug, lang) index settles duplicates, even between concurrent requests
+    new_article, created = insert_article(
+        slug=data['slug'],
+        title=data['title'],
+        meta_description=data['meta_description'],
+        content=data['content'],
+        is_published=True, # Save as draft
+        author_name=data.get('authorName'),
+        author_bio=data.get('authorBio'),
+    )
+    if not created:
+        return new_article, False
+    
+    category_name = data.get('category')
+    if category_name:
+        new_article.categories.append(upsert_categories([category_name])[category_name])
 
+    new_article.sync_images()
+    db.session.add(new_article)
+    db.session.commit()
+    return new_article, True
 
 # --- API ROUTES ---
-@app.route('/api/health', methods=['GET'])
+@api.route('/api/health', methods=['GET'])
 def health_check():
     """A simple endpoint to verify the service is up and running."""
     return jsonify({"status": "ok"}), 200
 
-@app.route('/api/generate-content', methods=['POST'])
+@api.route('/media/<path:key>', methods=['GET'])
+def serve_local_media(key):
+    """Serves stored images when STORAGE_BACKEND=local. Keys are content hashes, so they never change."""
+    storage = get_storage()
+    if not isinstance(storage, LocalStorage):
+        abort(404)
+    response = send_from_directory(storage.root, key)
+    response.headers['Cache-Control'] = CACHE_CONTROL
+    return response
+
+def send_feed_file(relative_path):
+    """Serves a file written by feeds.py, gzipped when the client accepts it. ETags come from send_file."""
+    if not relative_path.endswith('.xml'):
+        abort(404)
+    mimetype = 'application/atom+xml' if relative_path.endswith('atom.xml') else \
+        'application/rss+xml' if relative_path.endswith('rss.xml') else 'application/xml'
+    gzipped = 'gzip' in request.headers.get('Accept-Encoding', '')
+    response = send_from_directory(feeds.FEEDS_DIR, relative_path + '.gz' if gzipped else relative_path,
+                                   mimetype=mimetype, conditional=True)
+    if gzipped:
+        response.headers['Content-Encoding'] = 'gzip'
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = feeds.CACHE_CONTROL
+    return response
+
+@api.route('/sitemap.xml', methods=['GET'])
+def sitemap_index():
+    return send_feed_file('sitemap.xml')
+
+@api.route('/sitemap-<int:shard>.xml', methods=['GET'])
+def sitemap_shard(shard):
+    return send_feed_file(f"sitemap-{shard}.xml")
+
+@api.route('/feeds/<path:path>', methods=['GET'])
+def feed(path):
+    """RSS and Atom feeds: /feeds/<lang>/rss.xml, /feeds/<lang>/category/<slug>/atom.xml, ..."""
+    return send_feed_file(f"feeds/{path}")
+
+@api.route('/api/generate-content', methods=['POST'])
+@generation_slot
 def generate_content_text_only():
     query = request.json.get('query')
     if not query:
@@ -122,11 +177,11 @@ def generate_content_text_only():
         try:
           print("Generating SEO keywords...")
           keyword_prompt = get_keyword_prompt(query)
-          keyword_completion = client.chat.completions.create(
+          keyword_completion = route_chat('keywords',
             messages=[{"role": "user", "content": keyword_prompt}],
-            model="llama-3.1-8b-instant", # Fast model is fine for this
             temperature=0.5,
             response_format={"type": "json_object"},
+            cache_ttl=llm_cache.KEYWORDS_TTL,
           )
           keyword_data = json.loads(keyword_completion.choices[0].message.content)
           seo_keywords = keyword_data.get("keywords", [])
@@ -136,11 +191,11 @@ def generate_content_text_only():
           print("Attempting API call for text generation with keywords...")
           combined_prompt = get_combined_prompt(query, seo_keywords) # Pass keywords to the prompt
         
-          chat_completion = client.chat.completions.create(
+          chat_completion = route_chat('long_form',
             messages=[{"role": "user", "content": combined_prompt}],
-            model="llama-3.1-8b-instant", # Use the powerful model for the main article
             temperature=0.7,
             response_format={"type": "json_object"},
+            cache_ttl=llm_cache.ARTICLE_TTL,
           )
           response_content = chat_completion.choices[0].message.content
           print("JSON mode successful.")
@@ -148,9 +203,8 @@ def generate_content_text_only():
         except Exception as e:
             # If it fails, fall back to text mode
             print(f"JSON mode failed: {e}. Retrying in text mode...")
-            chat_completion = client.chat.completions.create(
+            chat_completion = route_chat('long_form',
                 messages=[{"role": "user", "content": combined_prompt}],
-                model="llama-3.1-8b-instant",
                 temperature=0.7,
             )
             response_content = chat_completion.choices[0].message.content
@@ -180,56 +234,9 @@ def generate_content_text_only():
         if data.get("title") == "Invalid Topic Request":
             return jsonify({"error": "The requested topic could not be generated."}), 422
         
-        # --- NEW: Automated Internal Linking Logic ---
-        article_content = data['content']
-        search_terms = data['title'].split(' ')[-3:]
-        search_query = func.plainto_tsquery('english', ' & '.join(search_terms))
-        
-        # --- THIS IS THE FIX ---
-        # Instead of .match(), we use the custom '@@' operator to prevent
-        # SQLAlchemy from double-wrapping our search query.
-        relevant_articles = db.session.query(Article.title, Article.slug)\
-            .filter(Article.is_published == True)\
-            .filter(func.to_tsvector('english', Article.title).op('@@')(search_query))\
-            .limit(2).all()
-        # --- END OF FIX ---
-
-        if relevant_articles:
-            links_markdown = "\n\n### Read More:\n"
-            for rel_title, rel_slug in relevant_articles:
-                links_markdown += f"- [{rel_title}](/blog/{rel_slug})\n"
-            
-            article_content += links_markdown
-            data['content'] = article_content
-        # --- END of Internal Linking Logic ---
-
-
-        # --- Stage 3: Save to Database ---
-        slug = data['slug']
-        existing_article = Article.query.filter_by(slug=slug, lang='en').first()
-        if existing_article:
-            return jsonify(existing_article.to_dict()), 200
-
-        new_article = Article(
-            slug=slug,
-            title=data['title'],
-            meta_description=data['meta_description'],
-            content=data['content'],
-            is_published=True, # Save as draft
-            author_name=data.get('authorName'),
-            author_bio=data.get('authorBio'),
-        )
-        
-        category_name = data.get('category')
-        if category_name:
-            category = Category.query.filter_by(name=category_name).first()
-            if not category:
-                category = Category(name=category_name, slug=slugify(category_name))
-                db.session.add(category)
-            new_article.categories.append(category)
-
-        db.session.add(new_article)
-        db.session.commit()
+        new_article, created = save_generated_article(data)
+        if not created:
+            return jsonify(new_article.to_dict()), 200
 
         print("Text-only article saved successfully.")
         return jsonify(new_article.to_dict()), 201
@@ -239,39 +246,117 @@ def generate_content_text_only():
         if response_content:
             print(f"---AI TEXT RESPONSE THAT CAUSED FAILURE---\n{response_content}")
         return jsonify({"error": "A critical error occurred."}), 500
+
+
+def sse_event(event, data):
+    """Formats one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@api.route('/api/generate-content/stream', methods=['POST'])
+@generation_slot
+def generate_content_stream():
+    """
+    Generates an article like /api/generate-content, but streams progress as
+    Server-Sent Events. If the completion is cut off, the finished fields are
+    kept and only the missing ones are regenerated.
+    """
+    query = request.json.get('query')
+    if not query:
+        return jsonify({"error": "Query is required"}), 400
+
+    def generate():
+        try:
+            yield sse_event('stage', {'stage': 'keywords'})
+            keyword_completion = route_chat('keywords',
+                messages=[{"role": "user", "content": get_keyword_prompt(query)}],
+                temperature=0.5,
+                response_format={"type": "json_object"},
+                cache_ttl=llm_cache.KEYWORDS_TTL,
+            )
+            seo_keywords = json.loads(keyword_completion.choices[0].message.content).get("keywords", [])
+
+            yield sse_event('stage', {'stage': 'article', 'keywords': seo_keywords})
+            result = None
+            for event, payload in stream_article(get_combined_prompt(query, seo_keywords)):
+                if event == 'result':
+                    result = payload
+                else:
+                    yield sse_event(event, payload)
+
+            if result['fields'].get("title") == "Invalid Topic Request":
+                yield sse_event('error', {"error": "The requested topic could not be generated."})
+                return
+            if not result['complete']:
+                print(f"Stream ended early ({result['finish_reason']}). Salvaging fields: {list(result['fields'])}")
+                yield sse_event('truncated', {'fields': list(result['fields']), 'partial': list(result['partial'])})
+
+            data = None
+            for event, payload in repair_fields(query, result['fields'], result['partial']):
+                if event == 'result':
+                    data = payload
+                else:
+                    yield sse_event(event, payload)
+
+            yield sse_event('stage', {'stage': 'saving'})
+            article, created = save_generated_article(data)
+            yield sse_event('done', {'article': article.to_dict(), 'created': created})
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"A critical error occurred in generate_content_stream: {e}")
+            yield sse_event('error', {"error": "A critical error occurred."})
+
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers=headers)
     
     
     
-def get_random_fallback_image():
+def find_article_image(article, prompt, index):
     """
-    Fetches the list of all images from Firebase Storage
-    and returns the public URL of a random one.
+    Finds the ArticleImage row for a placeholder, creating the rows for
+    articles saved before the article_images table existed.
     """
-    try:
-        print("--- Initiating fallback: fetching existing images from Firebase Storage ---")
-        bucket = storage.bucket()
-        # List all blobs in the 'images/' directory
-        blobs = bucket.list_blobs(prefix='images/')
-        
-        # Collect all public URLs into a list, skipping the folder itself
-        image_urls = [blob.public_url for blob in blobs if blob.name != 'images/']
-        
-        if not image_urls:
-            print("--- Fallback failed: No existing images found in Firebase Storage. ---")
-            return None
-
-        # Select one URL at random
-        random_url = random.choice(image_urls)
-        print(f"--- Fallback successful. Selected random image: {random_url} ---")
-        return random_url
-    except Exception as e:
-        print(f"--- Fallback failed with an error: {e} ---")
-        return None
+    if not article.images:
+        try:
+            article.sync_images()
+            db.session.commit()
+        except IntegrityError:
+            # Another request created the rows first
+            db.session.rollback()
+
+    # The frontend sends the prompt it saw, so prefer the first unfilled placeholder
+    # with that prompt and only fall back to the index it counted.
+    image = ArticleImage.query.filter_by(article_id=article.id, prompt=prompt)\
+        .order_by((ArticleImage.status == 'ready').asc(), ArticleImage.index.asc())\
+        .first()
+    if image is None and index is not None:
+        image = ArticleImage.query.filter_by(article_id=article.id, index=index).first()
+    return image
+
+def mark_article_image_ready(image, article_id, image_url, variants=None):
+    """
+    Stores an image URL with row-level updates so that concurrent requests for
+    other placeholders of the same article never overwrite each other.
+    Returns False if another request already filled this placeholder.
+    """
+    claimed = ArticleImage.query\
+        .filter(ArticleImage.id == image.id, ArticleImage.status != 'ready')\
+        .update({'url': image_url, 'status': 'ready', 'variants': variants}, synchronize_session=False)
+
+    # Set the hero image only if nobody has set it yet
+    Article.query.filter(Article.id == article_id, Article.image_url.is_(None))\
+        .update({'image_url': image_url, 'image_variants': variants}, synchronize_session=False)
+    # Bulk updates skip the flush hooks, so log the change for the feeds and snapshots here
+    if claimed:
+        mark_articles_changed(db.session, [article_id])
+    db.session.commit()
+    return claimed > 0
 
-@app.route('/api/generate-image', methods=['POST'])
+@api.route('/api/generate-image', methods=['POST'])
+@generation_slot
 def generate_image_for_placeholder():
     """
-    Final, robust image generation with a Firebase Storage fallback.
+    Final, robust image generation with a fallback to an already stored image.
     """
     data = request.json
     prompt = data.get('prompt')
@@ -281,87 +366,77 @@ def generate_image_for_placeholder():
     if not all([prompt, article_slug, placeholder_index is not None]):
         return jsonify({"error": "Prompt, slug, and index are required"}), 400
 
-    image_url = None
-    try:
-        # This is your primary image generation logic (e.g., with Fireworks.ai)
-        # We will wrap it in a try...except block.
-        print(f"Requesting image from Fireworks.ai for prompt: '{prompt}'")
-        
-        headers = {
-            "Accept": "image/jpeg",
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {FIREWORKS_API_KEY}"
-        }
-        payload = {"prompt": f"{prompt}, cinematic, masterpiece, 8k", "height": 512, "width": 1024,}
-        
-        response = requests.post(FIREWORKS_API_URL, headers=headers, json=payload, timeout=90)
-        response.raise_for_status()
-        
-        image_bytes = response.content
-        if not image_bytes:
-            raise ValueError("Live API did not return an image.")
+    article = Article.query.filter_by(slug=article_slug).first()
+    if not article:
+        print(f"ERROR: Could not find article with slug '{article_slug}' to update.")
+        return jsonify({"error": "Article not found"}), 404
 
-        print("Image generated by live API successfully.")
-        
-        # Upload the NEWLY generated image to Firebase
-        bucket = storage.bucket()
-        destination_blob_name = f"images/{article_slug}-{placeholder_index + 1}.png"
-        blob = bucket.blob(destination_blob_name)
-        blob.upload_from_string(image_bytes, content_type='image/jpeg')
-        blob.make_public()
-        image_url = blob.public_url
-        print(f"Image uploaded to Firebase: {image_url}")
+    image = find_article_image(article, prompt, placeholder_index)
+    if image is None:
+        print(f"ERROR: No image placeholder for '{prompt}' in article '{article_slug}'.")
+        return jsonify({"error": "Image placeholder not found"}), 404
+
+    if image.status == 'ready' and image.url:
+        print(f"WARNING: Placeholder already processed for '{prompt}'.")
+        return jsonify({"imageUrl": image.url})
+
+    image_bytes = None
+    variants = None
+    # Don't show the same picture twice in one article
+    used_urls = {other.url for other in article.images if other.url}
+    reusable = find_reusable(prompt, exclude_urls=used_urls)
+    if reusable is not None:
+        image_url, variants = reusable.url, reusable.variants
+    else:
+        try:
+            image_bytes = generate_image(prompt)
+            print("Image generated by live API successfully.")
 
-    except Exception as e:
-        print(f"!!! Live image generation failed: {e}. Attempting to use fallback image. !!!")
-        # --- THIS IS THE NEW FALLBACK LOGIC ---
-        image_url = get_random_fallback_image()
-        # --- END OF NEW LOGIC ---
+            # Store the NEWLY generated image under its content hash
+            image_url = upload_image(image_bytes)
+            add_to_library(prompt, image_url, image_bytes)
+
+        except Exception as e:
+            print(f"!!! Live image generation failed: {e}. Attempting to use fallback image. !!!")
+            image_bytes = None
+            image_url, variants = get_relevant_fallback_image(prompt, exclude_urls=used_urls)
 
     # --- This part now runs for BOTH successful generation AND successful fallback ---
     if image_url:
-        # --- THIS IS THE DEFINITIVE FIX ---
         try:
-            # You MUST use the app context for database operations in a background/async task
-            with app.app_context():
-                article_to_update = Article.query.filter_by(slug=article_slug).first()
-                if article_to_update:
-                    placeholder_full_tag = f"[IMAGE: {prompt}]"
-                    if placeholder_full_tag in article_to_update.content:
-                        markdown_image_tag = f"![{prompt}]({image_url})"
-                        
-                        # Set hero image if it's the first one
-                        if article_to_update.image_url is None:
-                            article_to_update.image_url = image_url
-                        
-                        # Replace placeholder and commit
-                        article_to_update.content = article_to_update.content.replace(placeholder_full_tag, markdown_image_tag, 1)
-                        db.session.commit()
-                        print(f"SUCCESS: Database updated for article '{article_slug}'.")
-                    else:
-                        print(f"WARNING: Placeholder already processed for '{prompt}'.")
-                else:
-                    print(f"ERROR: Could not find article with slug '{article_slug}' to update.")
-
+            if mark_article_image_ready(image, article.id, image_url, variants):
+                print(f"SUCCESS: Database updated for article '{article_slug}'.")
+                if image_bytes:
+                    # Responsive variants are rendered after the response, off the request path
+                    process_image_later(current_app._get_current_object(), image.id, image_url, image_bytes)
+            else:
+                print(f"WARNING: Placeholder already processed for '{prompt}'.")
+                db.session.refresh(image)
+                image_url = image.url
             return jsonify({"imageUrl": image_url})
         except Exception as db_error:
+            db.session.rollback()
             print(f"A critical error occurred during database update: {db_error}")
             return jsonify({"error": "Failed to update article with image."}), 500
-        # --- END OF DEFINITIVE FIX --
     else:
         # This only happens if BOTH live generation AND the fallback fail
+        ArticleImage.query.filter_by(id=image.id, status='pending')\
+            .update({'status': 'failed'}, synchronize_session=False)
+        db.session.commit()
         print("CRITICAL: Both live generation and fallback failed. No image will be used.")
         return jsonify({"error": "Failed to generate or find a fallback image."}), 500
     
 # The get_article route remains exactly the same
-@app.route('/api/get-article/<slug>', methods=['GET'])
+@api.route('/api/get-article/<slug>', methods=['GET'])
+@replica_reads
 def get_article(slug):
     article = Article.query.filter_by(slug=slug, is_published=True).first()
     if article:
         return jsonify(article.to_dict())
     return jsonify({"error": "Article not found"}), 404
 
-@app.route('/api/articles', methods=['GET'])
+@api.route('/api/articles', methods=['GET'])
+@replica_reads
 def get_all_articles():
     # Get query parameters
     page = request.args.get('page', 1, type=int)
@@ -371,7 +446,8 @@ def get_all_articles():
     fetch_all = request.args.get('all', 'false', type=str).lower() == 'true'
 
     try:
-        query = Article.query.filter_by(is_published=True)
+        # Lists never show the content, the bulk of each row
+        query = Article.query.filter_by(is_published=True).options(defer(Article._content))
 
         if exclude_slug:
             query = query.filter(Article.slug != exclude_slug)
@@ -390,11 +466,7 @@ def get_all_articles():
             has_more = paginated_articles.has_next
         
         # We need to return the ID for React keys
-        article_list = [
-            {"id": article.id, "slug": article.slug, "title": article.title,"meta_description": article.meta_description,
-                "image_url": article.image_url}
-            for article in articles
-        ]
+        article_list = [article.to_list_dict() for article in articles]
         
         return jsonify({
             "articles": article_list,
@@ -405,29 +477,32 @@ def get_all_articles():
         print(f"An error occurred while fetching articles: {e}")
         return jsonify({"error": "Failed to fetch articles"}), 500
     
-@app.route('/api/categories', methods=['GET'])
+@api.route('/api/categories', methods=['GET'])
+@replica_reads
 def get_all_categories():
-    """Fetches a list of all unique categories."""
+    """
+    Lists all categories with their published article counts, from the
+    in-process cache (see categories.py). With ?lang=xx, article_count only
+    counts articles in that language.
+    """
     try:
-        # Query the database for all categories, ordered by name
-        categories = Category.query.order_by(Category.name.asc()).all()
-        category_list = [category.to_dict() for category in categories]
-        print(f"Found {len(category_list)} categories to return.")
+        category_list = get_categories()
+        lang = request.args.get('lang')
+        if lang:
+            category_list = [{**category, 'article_count': category['article_counts'].get(lang, 0)}
+                             for category in category_list]
         return jsonify(category_list)
     except Exception as e:
         print(f"An error occurred while fetching categories: {e}")
         return jsonify({"error": "Failed to fetch categories"}), 500
     
-@app.route('/api/articles/category/<string:category_slug>', methods=['GET'])
+@api.route('/api/articles/category/<string:category_slug>', methods=['GET'])
+@replica_reads
 def get_articles_by_category(category_slug):
     """Fetches all published articles for a specific category."""
     try:
         category = Category.query.filter_by(slug=category_slug).first_or_404()
-        published_articles = [
-            article.to_dict() 
-            for article in category.articles 
-            if article.is_published
-        ]
+        published_articles = [article.to_dict() for article in category_articles(category)]
         
         return jsonify({
             "category": category.to_dict(),
@@ -438,20 +513,19 @@ def get_articles_by_category(category_slug):
         return jsonify({"error": "Failed to fetch articles for this category"}), 500
     
 
-@app.route('/api/articles/breaking', methods=['GET'])
+@api.route('/api/articles/breaking', methods=['GET'])
+@replica_reads
 def get_breaking_articles():
     """Fetches the most recent breaking news articles."""
     try:
         limit = request.args.get('limit', 5, type=int)
         articles = Article.query.filter_by(is_published=True, is_breaking_news=True)\
+            .options(defer(Article._content))\
             .order_by(Article.id.desc())\
             .limit(limit)\
             .all()
         
-        article_list = [
-            {"id": article.id, "slug": article.slug, "title": article.title, "meta_description": article.meta_description, "image_url": article.image_url}
-            for article in articles
-        ]
+        article_list = [article.to_list_dict() for article in articles]
         return jsonify(article_list)
     except Exception as e:
         print(f"An error occurred while fetching breaking articles: {e}")
@@ -459,23 +533,30 @@ def get_breaking_articles():
     
     # --- ADMIN API ROUTES ---
 
-ADMIN_SECRET_KEY = os.getenv("ADMIN_SECRET_KEY")
-
 # A helper function to check the secret key
 def is_admin():
-    return request.headers.get('x-admin-secret-key') == ADMIN_SECRET_KEY
-
-@app.route('/api/admin/articles', methods=['GET'])
+    return request.headers.get('x-admin-secret-key') == current_app.config['ADMIN_SECRET_KEY']
+
+def admin_required(view):
+    """Rejects non-admin requests with a 401. Goes above @generation_slot, so they never take a slot."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not is_admin():
+            return jsonify({"error": "Unauthorized"}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+@api.route('/api/admin/articles', methods=['GET'])
 def admin_get_all_articles():
     if not is_admin():
         return jsonify({"error": "Unauthorized"}), 401
     
-    articles = Article.query.order_by(Article.id.desc()).all()    
+    articles = Article.query.options(defer(Article._content)).order_by(Article.id.desc()).all()
     article_list = [article.to_admin_dict() for article in articles]
 
     return jsonify(article_list)
 
-@app.route('/api/admin/article/<int:article_id>/toggle', methods=['POST'])
+@api.route('/api/admin/article/<int:article_id>/toggle', methods=['POST'])
 def admin_toggle_publish(article_id):
     if not is_admin():
         return jsonify({"error": "Unauthorized"}), 401
@@ -489,7 +570,7 @@ def admin_toggle_publish(article_id):
     db.session.commit()
     return jsonify(article.to_dict())
 
-@app.route('/api/admin/article/<int:article_id>', methods=['DELETE'])
+@api.route('/api/admin/article/<int:article_id>', methods=['DELETE'])
 def admin_delete_article(article_id):
     if not is_admin():
         return jsonify({"error": "Unauthorized"}), 401
@@ -502,7 +583,7 @@ def admin_delete_article(article_id):
     db.session.commit()
     return jsonify({"message": "Article deleted successfully"})
 
-@app.route('/api/admin/article/<int:article_id>/edit', methods=['PUT'])
+@api.route('/api/admin/article/<int:article_id>/edit', methods=['PUT'])
 def admin_edit_article(article_id):
     if not is_admin():
         return jsonify({"error": "Unauthorized"}), 401
@@ -519,13 +600,14 @@ def admin_edit_article(article_id):
         return jsonify({"error": "Content is required"}), 400
         
     article.content = new_content
+    article.sync_images()
     db.session.commit()
     
     print(f"Article {article_id} updated successfully.")
     return jsonify(article.to_dict())
 
 
-@app.route('/api/admin/article/<int:article_id>', methods=['GET'])
+@api.route('/api/admin/article/<int:article_id>', methods=['GET'])
 def admin_get_article(article_id):
     if not is_admin():
         return jsonify({"error": "Unauthorized"}), 401
@@ -536,83 +618,92 @@ def admin_get_article(article_id):
     
     return jsonify(article.to_dict()) # Use the full to_dict()
 
-@app.route('/api/admin/article/<int:article_id>/regenerate-image', methods=['POST'])
+@api.route('/api/admin/article/<int:article_id>/regenerate-image', methods=['POST'])
+@admin_required
+@generation_slot
 def admin_regenerate_image(article_id):
-    if not is_admin():
-        return jsonify({"error": "Unauthorized"}), 401
-    
     article = Article.query.get(article_id)
     if not article:
         return jsonify({"error": "Article not found"}), 404
         
     data = request.json
     prompt = data.get('prompt')
+    placeholder_index = data.get('index')
     placeholder_full_tag = data.get('placeholder') # e.g., "[IMAGE: a description]"
     
-    if not prompt or not placeholder_full_tag:
-        return jsonify({"error": "Prompt and placeholder are required"}), 400
+    if not prompt or (placeholder_index is None and not placeholder_full_tag):
+        return jsonify({"error": "Prompt and index or placeholder are required"}), 400
+
+    # Images are found by their row, so they can be regenerated even after
+    # the placeholder has been filled.
+    image = None
+    if placeholder_index is not None:
+        image = ArticleImage.query.filter_by(article_id=article.id, index=placeholder_index).first()
+    elif placeholder_full_tag:
+        match = IMAGE_PLACEHOLDER_RE.fullmatch(placeholder_full_tag.strip())
+        if match:
+            image = ArticleImage.query.filter_by(article_id=article.id, prompt=match.group(1))\
+                .order_by(ArticleImage.index.asc()).first()
 
     try:
         print(f"Regenerating image for article {article_id} with prompt: '{prompt}'")
-        
-        # --- (This is the same trusted image generation logic from before) ---
-        headers = {"Authorization": f"Bearer {HF_API_TOKEN}"}
-        payload = {"inputs": prompt}
-        response = requests.post(HF_API_URL, headers=headers, json=payload, timeout=60)
-        response.raise_for_status()
-        image_bytes = response.content
-        
-        if not image_bytes:
-            raise ValueError("Hugging Face API returned no image data.")
+        image_bytes = generate_image(prompt)
             
-        # --- Upload to Firebase ---
-        # We create a new unique name to avoid browser caching issues
-        timestamp = int(time.time())
-        bucket = storage.bucket()
-        destination_blob_name = f"images/{article.slug}-{timestamp}.png"
-        blob = bucket.blob(destination_blob_name)
-        blob.upload_from_string(image_bytes, content_type='image/png')
-        blob.make_public()
-        new_image_url = blob.public_url
+        # --- Upload to storage ---
+        # The key is a hash of the new image, so it never collides with a cached old one
+        new_image_url = upload_image(image_bytes)
+        add_to_library(prompt, new_image_url, image_bytes)
         print(f"Image regenerated and uploaded: {new_image_url}")
         
-        # --- Update the Article Content in the Database ---
-        new_markdown_tag = f"![{prompt}]({new_image_url})"
-        
-        # Replace the specific old placeholder/image tag with the new one
-        # We need to find the old URL to replace it
-        old_content = article.content
-        # Simple replacement for now. A more robust solution might parse Markdown.
-        # This assumes the prompt is unique enough to identify the image tag.
-        
-        # Find the old markdown tag to replace
-        # This is a simplification; a real app might need a more robust way to find the old tag
-        # For now, we'll just replace the placeholder text
-        article.content = old_content.replace(placeholder_full_tag, new_markdown_tag, 1)
-
-        # Update the main hero image if it was the first one
-        if article.image_url is None or article.image_url in old_content:
-             article.image_url = new_image_url
+        if image is not None:
+            old_image_url = image.url
+            ArticleImage.query.filter_by(id=image.id)\
+                .update({'prompt': prompt, 'url': new_image_url, 'status': 'ready', 'variants': None}, synchronize_session=False)
+            # Update the main hero image if it was this one
+            Article.query.filter(Article.id == article.id)\
+                .filter((Article.image_url.is_(None)) | (Article.image_url == old_image_url))\
+                .update({'image_url': new_image_url, 'image_variants': None}, synchronize_session=False)
+            mark_articles_changed(db.session, [article.id])
+            # The stored content keeps the original placeholder, so keep its prompt in sync
+            if prompt != image.prompt:
+                article.replace_image_prompt(image.index, prompt)
+        elif placeholder_full_tag and placeholder_full_tag in article.content:
+            # Articles written before the article_images table store their images inline
+            old_content = article.content
+            article.content = old_content.replace(placeholder_full_tag, f"![{prompt}]({new_image_url})", 1)
+            if article.image_url is None or article.image_url in placeholder_full_tag:
+                article.image_url, article.image_variants = new_image_url, None
+        else:
+            return jsonify({"error": "Image placeholder not found"}), 404
 
         db.session.commit()
+        db.session.refresh(article)
+        process_image_later(current_app._get_current_object(), image.id if image is not None else None, new_image_url, image_bytes)
 
-        return jsonify({"newImageUrl": new_image_url, "newContent": article.content})
+        return jsonify({"newImageUrl": new_image_url, "newContent": article.render_content()})
 
     except Exception as e:
+        db.session.rollback()
         print(f"A critical error occurred in admin_regenerate_image: {e}")
         return jsonify({"error": "Failed to regenerate image."}), 500
     
 
-@app.route('/api/search', methods=['GET'])
+@api.route('/api/search', methods=['GET'])
+@replica_reads
 def search_articles():
-    """Searches articles using PostgreSQL's full-text search."""
+    """
+    Searches articles using PostgreSQL's full-text search, over the title and
+    content. Archived articles (see archive.py) keep only compressed content,
+    so they are matched by title alone.
+    """
     query_term = request.args.get('q', '').strip()
 
     if not query_term:
         return jsonify([]) # Return empty list if query is empty
 
     try:
-        # We will search in both the title and the content of the article.
+        # We will search in both the title and the content of the article
+        # (content is '' for archived articles).
         # 'english' is the search configuration, tsvector creates the document,
         # and to_tsquery creates the search query.
         search_query = func.plainto_tsquery('english', query_term)
@@ -648,5 +739,47 @@ def search_articles():
         print(f"An error occurred during search: {e}")
         return jsonify({"error": "Search failed"}), 500
 
+# --- APP FACTORY ---
+def create_app(config=None):
+    """Builds the web app. config is an optional dict of overrides for config.Config."""
+    app = Flask(__name__)
+    load_config(app, config)
+
+    allowed_origins = ["http://localhost:3000"]
+    if app.config.get('FRONTEND_URL'):
+        allowed_origins.append(app.config['FRONTEND_URL'])
+
+    # Apply the CORS configuration.
+    # The 'origins' parameter directly accepts our list of allowed domains.
+    CORS(app, origins=allowed_origins, supports_credentials=True)
+
+    db.init_app(app)
+    migrate.init_app(app, db)
+    db_routing.init_app(app)
+    app.register_blueprint(api)
+    instrumentation.init_app(app)
+
+    # See generation_slot(). 0 makes a reader-only process that rejects all generation.
+    if app.config['GENERATION_SLOTS'] is not None:
+        app.extensions['generation_slots'] = threading.BoundedSemaphore(app.config['GENERATION_SLOTS'])
+
+    if app.config['CREATE_TABLES_ON_STARTUP']:
+        with app.app_context():
+            db.create_all(bind_key=None) # The primary only: a replica is read-only, and may be down
+    return app
+
+
+_default_app = None
+
+def __getattr__(name):
+    """Builds the default app on first access, so `gunicorn app:app` keeps working."""
+    global _default_app
+    if name == 'app':
+        if _default_app is None:
+            _default_app = create_app()
+        return _default_app
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+
 if __name__ == '__main__':
-    app.run(debug=True, port=5001)
\ No newline at end of file
+    # The dev server creates missing tables itself unless told otherwise
+    create_app({'CREATE_TABLES_ON_STARTUP': os.getenv("CREATE_TABLES_ON_STARTUP", "true").lower() == "true"}).run(debug=True, port=5001)
\ No newline at end of file
@@ -0,0 +1,231 @@
+# /backend/archive.py
+"""
+Archive tier for old articles.
+
+The article table gains dozens of full articles (plus nine translations of
+each) every day, yet readers mostly ask for recent ones. Run this daily
+(worker_daemon.py does, and retrains the dictionaries monthly):
+
+    python archive.py [--days 180] [--batch-size 200]
+
+It moves the content of articles older than ARCHIVE_AFTER_DAYS into the
+article_archive table, compressed, and leaves '' in article.content. The
+article table stays small enough to be cached whole, and Article.content
+still returns the full text: an archived article's content is loaded and
+decompressed on first access. Saving new content (an admin edit) brings an
+article back. Archived articles are still found by search, by title only.
+
+Content is compressed with zstd (ARCHIVE_CODEC, needs the zstandard package)
+using a dictionary trained per language: articles in one language share most
+of their vocabulary and Markdown structure, which a dictionary captures once
+instead of in every row. Retrain now and then and re-encode the archive with
+the newest dictionaries, in batches:
+
+    python archive.py --train-dictionaries --recompress
+
+Live content stays uncompressed so the full-text index on it keeps working.
+"""
+import argparse
+import datetime
+import os
+import time
+import zlib
+
+from sqlalchemy import delete, func, update
+
+from models import db, Article, ArticleArchive, CompressionDictionary
+
+# --- CONFIGURATION ---
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "180"))
+ARCHIVE_CODEC = os.getenv("ARCHIVE_CODEC", "zstd") # 'zstd' or 'zlib'
+ZSTD_LEVEL = int(os.getenv("ARCHIVE_ZSTD_LEVEL", "19")) # Slow to write, as fast as any level to read
+BATCH_SIZE = 200
+DICTIONARY_SIZE = 112640 # zstd's default, ~110 KB
+MIN_DICTIONARY_SAMPLES = 50 # Fewer articles than this in a language train a poor dictionary
+MAX_DICTIONARY_SAMPLES = 2000
+
+_dictionaries = {} # id -> zstandard.ZstdCompressionDict; dictionary rows never change
+_latest_dictionary = {} # lang -> id of its newest dictionary, or None
+_compressors = {} # dictionary id -> ZstdCompressor, for the single-threaded archive runs
+
+
+# --- CODECS ---
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("ARCHIVE_CODEC=zstd needs zstandard. Run: pip install zstandard")
+    return zstandard
+
+
+def _dictionary(dictionary_id):
+    if dictionary_id not in _dictionaries:
+        row = db.session.get(CompressionDictionary, dictionary_id)
+        if row is None:
+            raise ValueError(f"Compression dictionary {dictionary_id} does not exist.")
+        _dictionaries[dictionary_id] = _zstd().ZstdCompressionDict(row.data)
+    return _dictionaries[dictionary_id]
+
+
+def latest_dictionary_id(lang):
+    if lang not in _latest_dictionary:
+        _latest_dictionary[lang] = db.session.query(func.max(CompressionDictionary.id))\
+            .filter(CompressionDictionary.lang == lang).scalar()
+    return _latest_dictionary[lang]
+
+
+def encoding_for(lang):
+    """(codec, dictionary_id) that new archive rows in the language get."""
+    if ARCHIVE_CODEC == 'zlib':
+        return 'zlib', None
+    return 'zstd', latest_dictionary_id(lang) if lang else None
+
+
+def compress(text, lang=None):
+    """Returns (codec, dictionary_id, data) for the text, using the language's newest dictionary if any."""
+    data = text.encode('utf-8')
+    codec, dictionary_id = encoding_for(lang)
+    if codec == 'zlib':
+        return 'zlib', None, zlib.compress(data, 9)
+    if dictionary_id not in _compressors:
+        zstd = _zstd()
+        dict_data = _dictionary(dictionary_id) if dictionary_id else None
+        _compressors[dictionary_id] = zstd.ZstdCompressor(level=ZSTD_LEVEL, dict_data=dict_data)
+    return 'zstd', dictionary_id, _compressors[dictionary_id].compress(data)
+
+
+def decompress(codec, data, dictionary_id=None):
+    if codec == 'zlib':
+        return zlib.decompress(data).decode('utf-8')
+    if codec == 'zstd':
+        dict_data = _dictionary(dictionary_id) if dictionary_id else None
+        # A decompressor per call: web threads decompress concurrently and instances aren't thread-safe
+        return _zstd().ZstdDecompressor(dict_data=dict_data).decompress(data).decode('utf-8')
+    raise ValueError(f"Unknown archive codec '{codec}'.")
+
+
+# --- DICTIONARIES ---
+def train_dictionaries():
+    """Trains a new dictionary per language on its most recent articles, archived or not. Returns the languages trained."""
+    zstd = _zstd()
+    trained = []
+    for (lang,) in db.session.query(Article.lang).distinct().order_by(Article.lang):
+        rows = db.session.query(Article._content, ArticleArchive.codec, ArticleArchive.content, ArticleArchive.dictionary_id)\
+            .outerjoin(ArticleArchive)\
+            .filter(Article.lang == lang)\
+            .order_by(Article.id.desc())\
+            .limit(MAX_DICTIONARY_SAMPLES)
+        samples = [(content or decompress(codec, data, dictionary_id)).encode('utf-8')
+                   for content, codec, data, dictionary_id in rows if content or data]
+        if len(samples) < MIN_DICTIONARY_SAMPLES:
+            print(f"  {lang}: only {len(samples)} articles, not training a dictionary")
+            continue
+        try:
+            dictionary = zstd.train_dictionary(DICTIONARY_SIZE, samples, level=ZSTD_LEVEL)
+        except zstd.ZstdError as e:
+            print(f"  {lang}: could not train a dictionary: {e}")
+            continue
+        db.session.add(CompressionDictionary(lang=lang, data=dictionary.as_bytes(), sample_count=len(samples)))
+        db.session.commit()
+        trained.append(lang)
+        print(f"  {lang}: trained a {len(dictionary.as_bytes()) // 1024} KB dictionary on {len(samples)} articles")
+    _latest_dictionary.clear()
+    return trained
+
+
+# --- ARCHIVING ---
+def archive_batch(cutoff, after_id=0, batch_size=BATCH_SIZE):
+    """
+    Archives up to batch_size articles created before cutoff, in one
+    transaction. Returns (last article id, articles archived, bytes before, bytes after).
+    """
+    # Rows an edit has locked are skipped; locking ours makes a later edit wait for this commit
+    rows = db.session.query(Article.id, Article.lang, Article._content)\
+        .filter(Article.created_at < cutoff, Article._content != '', Article.id > after_id)\
+        .order_by(Article.id)\
+        .limit(batch_size)\
+        .with_for_update(skip_locked=True)\
+        .all()
+    if not rows:
+        return None, 0, 0, 0
+
+    ids = [article_id for article_id, _, _ in rows]
+    archived = []
+    for article_id, lang, content in rows:
+        codec, dictionary_id, data = compress(content, lang)
+        archived.append({'article_id': article_id, 'codec': codec, 'dictionary_id': dictionary_id,
+                         'content': data, 'original_size': len(content.encode('utf-8'))})
+    # An edit can leave an outdated archive row behind; it is replaced here
+    db.session.execute(delete(ArticleArchive.__table__).where(ArticleArchive.article_id.in_(ids)))
+    db.session.execute(ArticleArchive.__table__.insert(), archived)
+    # Keep updated_at as it was: archiving doesn't change what readers see
+    db.session.execute(update(Article.__table__)
+                       .where(Article.__table__.c.id.in_(ids))
+                       .values(content='', updated_at=Article.__table__.c.updated_at))
+    db.session.commit()
+    return ids[-1], len(ids), sum(row['original_size'] for row in archived), sum(len(row['content']) for row in archived)
+
+
+def archive_old_articles(days=ARCHIVE_AFTER_DAYS, batch_size=BATCH_SIZE):
+    """Archives every article older than the given number of days, one batch per transaction."""
+    cutoff = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=days)
+    print(f"Archiving the content of articles created before {cutoff:%Y-%m-%d}...")
+    started = time.perf_counter()
+    last_id, total, before, after = 0, 0, 0, 0
+    while True:
+        last_id, count, batch_before, batch_after = archive_batch(cutoff, last_id, batch_size)
+        if not count:
+            break
+        total, before, after = total + count, before + batch_before, after + batch_after
+        print(f"  ...{total} archived (up to article {last_id})")
+    ratio = f", {before / 1e6:.1f} MB -> {after / 1e6:.1f} MB" if total else ""
+    print(f"Archived {total} articles in {time.perf_counter() - started:.1f}s{ratio}.")
+    return total
+
+
+def recompress_archive(batch_size=BATCH_SIZE):
+    """
+    Re-encodes archived content that doesn't use ARCHIVE_CODEC and its
+    language's newest dictionary, one batch per transaction. Returns the number of rows.
+    """
+    started = time.perf_counter()
+    total = 0
+    for (lang,) in db.session.query(Article.lang).join(ArticleArchive).distinct().order_by(Article.lang):
+        codec, dictionary_id = encoding_for(lang)
+        last_id = 0
+        while True:
+            outdated = db.session.query(ArticleArchive).join(Article)\
+                .filter(Article.lang == lang, ArticleArchive.article_id > last_id)\
+                .filter((ArticleArchive.codec != codec) | ArticleArchive.dictionary_id.is_distinct_from(dictionary_id))\
+                .order_by(ArticleArchive.article_id)\
+                .limit(batch_size)\
+                .all()
+            if not outdated:
+                break
+            for row in outdated:
+                row.codec, row.dictionary_id, row.content = compress(row.text(), lang)
+            last_id = outdated[-1].article_id
+            db.session.commit()
+            total += len(outdated)
+            print(f"  {lang}: ...{total} recompressed (up to article {last_id})")
+    print(f"Recompressed {total} archived articles in {time.perf_counter() - started:.1f}s.")
+    return total
+
+
+if __name__ == '__main__':
+    from config import create_worker_app
+
+    parser = argparse.ArgumentParser(description="Moves the content of old articles to the archive table.")
+    parser.add_argument('--days', type=int, default=ARCHIVE_AFTER_DAYS, help="archive articles older than this")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--train-dictionaries', action='store_true', help="train a new zstd dictionary per language first")
+    parser.add_argument('--recompress', action='store_true', help="re-encode the archive with the newest dictionaries")
+    args = parser.parse_args()
+
+    with create_worker_app().app_context():
+        if args.train_dictionaries:
+            print("Training compression dictionaries...")
+            train_dictionaries()
+        archive_old_articles(args.days, args.batch_size)
+        if args.recompress:
+            recompress_archive(args.batch_size)
@@ -0,0 +1,205 @@
+# /backend/benchmarks/bench_api.py
+"""
+Benchmarks the public read API and stores the results as JSON.
+
+    python benchmarks/seed_corpus.py --articles 10000 --reset
+    python benchmarks/bench_api.py --start-server --concurrency 8 --requests 500
+    python benchmarks/bench_api.py --compare benchmarks/results/<older>.json
+
+For each endpoint it reports p50/p95/p99 latency, throughput, errors and DB
+queries per request. Query counts come from the X-DB-Queries header, so the
+server must run with INSTRUMENTATION_ENABLED=true (--start-server does that).
+Results go to benchmarks/results/<time>-<git sha>.json. --compare prints the
+change against an earlier file and exits non-zero when any p95 regressed by
+more than --max-regression.
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BACKEND_DIR, 'benchmarks', 'results')
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.seed_corpus import TOPIC_WORDS
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def git_sha():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return 'unknown'
+
+
+def discover_targets(session, base_url, rng):
+    """Collects real slugs and category slugs through the API itself."""
+    slugs = []
+    for page in range(1, 6):
+        payload = session.get(f"{base_url}/api/articles", params={'page': page, 'limit': 50}, timeout=60).json()
+        slugs.extend(article['slug'] for article in payload['articles'])
+        if not payload['has_more']:
+            break
+    categories = [category['slug'] for category in session.get(f"{base_url}/api/categories", timeout=60).json()]
+    if not slugs or not categories:
+        raise RuntimeError("No articles or categories found. Seed the database with benchmarks/seed_corpus.py first.")
+    return slugs, categories
+
+
+def build_scenarios(slugs, categories, rng):
+    """Each scenario is (name, function returning the next path to request)."""
+    return [
+        ('articles_page', lambda: f"/api/articles?page={rng.randint(1, 20)}&limit=10"),
+        ('get_article', lambda: f"/api/get-article/{rng.choice(slugs)}"),
+        ('search', lambda: f"/api/search?q={'+'.join(rng.sample(TOPIC_WORDS, rng.choice([1, 2])))}"),
+        ('categories', lambda: "/api/categories"),
+        ('category_articles', lambda: f"/api/articles/category/{rng.choice(categories)}"),
+    ]
+
+
+def run_scenario(base_url, next_path, total, concurrency):
+    paths = [next_path() for _ in range(total)]
+    sessions = {}
+
+    def one(path):
+        # One keep-alive session per benchmark thread, like a browser
+        session = sessions.setdefault(threading.get_ident(), requests.Session())
+        started = time.perf_counter()
+        try:
+            response = session.get(base_url + path, timeout=120)
+            elapsed = (time.perf_counter() - started) * 1000
+            queries = response.headers.get('X-DB-Queries')
+            return elapsed, response.status_code < 400, int(queries) if queries is not None else None, len(response.content)
+        except requests.RequestException:
+            return (time.perf_counter() - started) * 1000, False, None, 0
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, paths))
+    wall = time.perf_counter() - started
+
+    latencies = [r[0] for r in results]
+    queries = [r[2] for r in results if r[2] is not None]
+    return {
+        'requests': total,
+        'concurrency': concurrency,
+        'errors': sum(1 for r in results if not r[1]),
+        'throughput_rps': round(total / wall, 1),
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'queries_per_request': round(sum(queries) / len(queries), 2) if queries else None,
+        'avg_response_bytes': int(sum(r[3] for r in results) / max(len(results), 1)),
+    }
+
+
+def start_server(port):
+    env = {**os.environ, 'PORT': str(port), 'INSTRUMENTATION_ENABLED': 'true', 'CREATE_TABLES_ON_STARTUP': 'false'}
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+                              cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"{base_url}/api/health", timeout=1).ok:
+                return server, base_url
+        except requests.RequestException:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("gunicorn did not come up in time")
+
+
+def compare(current, previous_path, max_regression):
+    with open(previous_path, encoding='utf-8') as f:
+        previous = json.load(f)
+    print(f"\nCompared with {previous['git_sha']} ({previous['started_at']}):")
+    print(f"{'endpoint':<20} {'p95 before':>11} {'p95 now':>9} {'change':>8} {'queries':>12}")
+    regressed = []
+    for name, result in current['endpoints'].items():
+        before = previous['endpoints'].get(name)
+        if not before:
+            continue
+        change = (result['p95_ms'] - before['p95_ms']) / max(before['p95_ms'], 0.01)
+        queries = f"{before['queries_per_request']} -> {result['queries_per_request']}"
+        print(f"{name:<20} {before['p95_ms']:>9.1f}ms {result['p95_ms']:>7.1f}ms {change:>+7.0%} {queries:>12}")
+        if change > max_regression:
+            regressed.append(name)
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', default='http://127.0.0.1:5001')
+    parser.add_argument('--start-server', action='store_true', help="run gunicorn with instrumentation on --port")
+    parser.add_argument('--port', type=int, default=5098)
+    parser.add_argument('--requests', type=int, default=300, help="requests per endpoint")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--only', nargs='*', help="endpoint names to run")
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', help="result file (default: benchmarks/results/<time>-<sha>.json)")
+    parser.add_argument('--compare', help="earlier result file to diff against")
+    parser.add_argument('--max-regression', type=float, default=0.2, help="allowed p95 increase, 0.2 = 20%%")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    server = None
+    base_url = args.base_url
+    if args.start_server:
+        server, base_url = start_server(args.port)
+
+    try:
+        session = requests.Session()
+        slugs, categories = discover_targets(session, base_url, rng)
+        session.get(f"{base_url}/api/health", timeout=10) # warm up
+
+        results = {
+            'started_at': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'git_sha': git_sha(),
+            'base_url': base_url,
+            'endpoints': {},
+        }
+        print(f"{'endpoint':<20} {'rps':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'queries':>8} {'errors':>7}")
+        for name, next_path in build_scenarios(slugs, categories, rng):
+            if args.only and name not in args.only:
+                continue
+            result = run_scenario(base_url, next_path, args.requests, args.concurrency)
+            results['endpoints'][name] = result
+            print(f"{name:<20} {result['throughput_rps']:>7} {result['p50_ms']:>6.1f}ms {result['p95_ms']:>6.1f}ms "
+                  f"{result['p99_ms']:>6.1f}ms {str(result['queries_per_request']):>8} {result['errors']:>7}")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=60)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}-{results['git_sha']}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        regressed = compare(results, args.compare, args.max_regression)
+        if regressed:
+            print(f"FAILED: p95 regressed by more than {args.max_regression:.0%} on: {', '.join(regressed)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+# /backend/benchmarks/bench_archive.py
+"""
+Benchmarks the archive tier: compression, table size, cache hit rate and get_article latency.
+
+    DATABASE_URL=postgresql://localhost/blog_bench python benchmarks/seed_corpus.py --articles 20000 --reset
+    DATABASE_URL=postgresql://localhost/blog_bench python benchmarks/bench_archive.py --apply
+
+First it compares the codecs on a sample of articles per language: zlib,
+zstd, and zstd with a dictionary trained on other articles of the language.
+It reports the compression ratio and the time to decompress one article.
+
+With --apply it then measures the database before and after archiving
+(training dictionaries, archiving everything older than --days, recompressing):
+  - the size of the article and article_archive tables, TOAST and indexes included
+  - the buffer cache hit rate of the article table while serving get_article (Postgres only)
+  - get_article latency for recent (live) and old (archived) articles
+--apply changes the database; never point it at production. Needs zstandard.
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+import time
+import zlib
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import zstandard
+from sqlalchemy import func, text
+
+import archive
+from app import create_app
+from models import db, Article, ArticleArchive
+
+CACHE_STATS_SQL = text("""
+    SELECT COALESCE(SUM(heap_blks_hit + COALESCE(toast_blks_hit, 0)), 0),
+           COALESCE(SUM(heap_blks_read + COALESCE(toast_blks_read, 0)), 0)
+    FROM pg_statio_user_tables WHERE relname IN ('article', 'article_archive')
+""")
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def compare_codecs(sample_size, rng):
+    print(f"{'lang':<6} {'codec':<14} {'ratio':>7} {'decompress':>11}")
+    for (lang,) in db.session.query(Article.lang).distinct().order_by(Article.lang):
+        texts = [content.encode('utf-8') for (content,) in db.session.query(Article._content)
+                 .filter(Article.lang == lang, Article._content != '').limit(sample_size * 2 + archive.MIN_DICTIONARY_SAMPLES)]
+        if len(texts) < sample_size + archive.MIN_DICTIONARY_SAMPLES:
+            continue
+        rng.shuffle(texts)
+        tests, training = texts[:sample_size], texts[sample_size:]
+        dictionary = zstandard.train_dictionary(archive.DICTIONARY_SIZE, training, level=archive.ZSTD_LEVEL)
+        codecs = {
+            'zlib-9': (lambda b: zlib.compress(b, 9), zlib.decompress),
+            f'zstd-{archive.ZSTD_LEVEL}': (zstandard.ZstdCompressor(level=archive.ZSTD_LEVEL).compress,
+                                           lambda b: zstandard.ZstdDecompressor().decompress(b)),
+            f'zstd-{archive.ZSTD_LEVEL}+dict': (zstandard.ZstdCompressor(level=archive.ZSTD_LEVEL, dict_data=dictionary).compress,
+                                                lambda b: zstandard.ZstdDecompressor(dict_data=dictionary).decompress(b)),
+        }
+        raw = sum(len(t) for t in tests)
+        for name, (compress, decompress) in codecs.items():
+            packed = [compress(t) for t in tests]
+            started = time.perf_counter()
+            for p in packed:
+                decompress(p)
+            per_article = (time.perf_counter() - started) / len(packed)
+            print(f"{lang:<6} {name:<14} {raw / sum(len(p) for p in packed):>6.2f}x {per_article * 1e6:>9.0f}us")
+
+
+def table_sizes():
+    if db.engine.dialect.name == 'postgresql':
+        return {table: db.session.execute(text(f"SELECT pg_total_relation_size('{table}')")).scalar()
+                for table in ('article', 'article_archive')}
+    # SQLite: the bytes of content stored in each table, a lower bound of the table size
+    return {'article': db.session.query(func.coalesce(func.sum(func.length(Article._content)), 0)).scalar(),
+            'article_archive': db.session.query(func.coalesce(func.sum(func.length(ArticleArchive.content)), 0)).scalar()}
+
+
+def measure_reads(client, slugs, rounds):
+    """get_article latencies, and the cache hit rate over them on Postgres."""
+    before = db.session.execute(CACHE_STATS_SQL).one() if db.engine.dialect.name == 'postgresql' else None
+    db.session.commit()
+    latencies = []
+    for _ in range(rounds):
+        for slug in slugs:
+            started = time.perf_counter()
+            response = client.get(f"/api/get-article/{slug}")
+            latencies.append(time.perf_counter() - started)
+            assert response.status_code == 200, slug
+    hit_rate = None
+    if before is not None:
+        time.sleep(0.6) # The statistics collector reports with a short delay
+        after = db.session.execute(CACHE_STATS_SQL).one()
+        hits, reads = after[0] - before[0], after[1] - before[1]
+        hit_rate = hits / (hits + reads) if hits + reads else None
+    return latencies, hit_rate
+
+
+def report(label, sizes, live, old):
+    print(f"\n{label}:")
+    print(f"  article {sizes['article'] / 1e6:.1f} MB, article_archive {sizes['article_archive'] / 1e6:.1f} MB")
+    for name, (latencies, hit_rate) in (('recent', live), ('old', old)):
+        rate = f", cache hit rate {hit_rate:.1%}" if hit_rate is not None else ""
+        print(f"  get_article {name}: p50 {percentile(latencies, 50) * 1000:.2f}ms p95 {percentile(latencies, 95) * 1000:.2f}ms{rate}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sample', type=int, default=50, help="articles per language for the codec comparison")
+    parser.add_argument('--apply', action='store_true', help="archive the database and measure before and after")
+    parser.add_argument('--days', type=int, default=archive.ARCHIVE_AFTER_DAYS)
+    parser.add_argument('--reads', type=int, default=100, help="articles read per group")
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    app = create_app({'CREATE_TABLES_ON_STARTUP': False})
+    client = app.test_client()
+    with app.app_context():
+        db.create_all()
+        print("Codecs on a sample of articles:")
+        compare_codecs(args.sample, rng)
+        if not args.apply:
+            return
+
+        cutoff = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=args.days)
+        published = Article.query.filter_by(is_published=True)
+        old = [a.slug for a in published.filter(Article.created_at < cutoff).order_by(func.random()).limit(args.reads)]
+        live = [a.slug for a in published.filter(Article.created_at >= cutoff).order_by(func.random()).limit(args.reads)]
+        if not old or not live:
+            print("\nThe corpus needs articles on both sides of --days; seed it with benchmarks/seed_corpus.py.")
+            return
+        db.session.commit()
+
+        report("Before archiving", table_sizes(), measure_reads(client, live, args.rounds), measure_reads(client, old, args.rounds))
+        print()
+        archive.train_dictionaries()
+        archive.archive_old_articles(args.days)
+        archive.recompress_archive()
+        if db.engine.dialect.name == 'postgresql':
+            db.session.commit()
+            with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+                connection.execute(text("VACUUM FULL article")) # Give the freed TOAST space back, so sizes compare
+        report("After archiving", table_sizes(), measure_reads(client, live, args.rounds), measure_reads(client, old, args.rounds))
+
+
+if __name__ == '__main__':
+    main()
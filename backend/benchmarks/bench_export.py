@@ -0,0 +1,92 @@
+# /backend/benchmarks/bench_export.py
+"""
+Benchmarks the static snapshot export (export.py) against the live API.
+
+    DATABASE_URL=postgresql://localhost/blog_bench python benchmarks/seed_corpus.py --articles 20000 --reset
+    DATABASE_URL=postgresql://localhost/blog_bench python benchmarks/bench_export.py --workers 1 4 8
+
+For each --workers value it runs a full export into a temporary directory
+and reports the time and the bytes written raw, gzipped and as brotli. Then
+it compares get_article through Flask and the database with reading its
+snapshot from disk, which is an upper bound on what a CDN or nginx would
+spend per request. Needs brotli for the .br numbers.
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import export
+from app import create_app
+from models import Article
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def sizes(root):
+    totals = {'': 0, '.gz': 0, '.br': 0}
+    for directory, _, names in os.walk(root):
+        for name in names:
+            extension = os.path.splitext(name)[1]
+            totals[extension if extension in totals else ''] += os.path.getsize(os.path.join(directory, name))
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, export.WORKERS])
+    parser.add_argument('--reads', type=int, default=200, help="articles read for the latency comparison")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    app = create_app({'CREATE_TABLES_ON_STARTUP': False})
+    client = app.test_client()
+    root = tempfile.mkdtemp(prefix='snapshots-')
+    try:
+        with app.app_context():
+            for workers in args.workers:
+                shutil.rmtree(root, ignore_errors=True)
+                target = export.Target(root, os.path.join(root, 'manifest.json'), workers=workers)
+                started = time.perf_counter()
+                count = export.export(full=True, workers=workers, target=target)
+                elapsed = time.perf_counter() - started
+                export._process_pool.shutdown()
+                export._process_pool = None
+                os.remove(os.path.join(root, 'manifest.json'))
+                totals = sizes(root)
+                print(f"workers={workers}: {count} articles in {elapsed:.1f}s ({count / elapsed:.0f}/s), "
+                      f"{totals[''] / 1e6:.1f} MB raw, {totals['.gz'] / 1e6:.1f} MB gzip, {totals['.br'] / 1e6:.1f} MB brotli")
+
+            rng = random.Random(args.seed)
+            articles = [(a.lang, a.slug) for a in Article.query.filter_by(is_published=True).with_entities(Article.lang, Article.slug)]
+            sample = rng.sample(articles, min(args.reads, len(articles)))
+
+        live, static = [], []
+        for lang, slug in sample:
+            started = time.perf_counter()
+            response = client.get(f"/api/get-article/{slug}")
+            live.append(time.perf_counter() - started)
+            assert response.status_code == 200, slug
+            started = time.perf_counter()
+            with open(os.path.join(root, f"articles/{lang}/{slug}.json.gz"), 'rb') as f:
+                f.read()
+            static.append(time.perf_counter() - started)
+        for name, latencies in (('live API', live), ('snapshot', static)):
+            print(f"get_article {name}: p50 {percentile(latencies, 50) * 1000:.2f}ms p95 {percentile(latencies, 95) * 1000:.2f}ms")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,260 @@
+# /backend/benchmarks/bench_pipeline.py
+"""
+Runs the generation pipeline end to end against the fake providers and
+reports its throughput.
+
+    python benchmarks/bench_pipeline.py --articles 3
+    python benchmarks/bench_pipeline.py --jobs translations --translate-latency 2 --error-rate 0.1 --rate-limit 20
+
+For run_breaking_news_job, run_future_content_job and create_and_save_translations
+it reports articles per minute, the time spent sleeping (job pacing between
+articles, the LibreTranslate rate pacing, retry backoff) against the time spent
+working, and the provider calls per article, translations included.
+
+Pipeline sleeps are recorded and, with the default --sleep-scale 0, not
+actually waited for: the clock the pipeline sees is moved forward instead, so
+a run takes seconds and gives the same numbers every time for the same --seed.
+Articles per minute are computed on work time plus the requested sleep, which
+is what a real run would take. Use --sleep-scale 1 to wait for real. Sleeps
+made at the same time on different threads are added up, so sleep time is an
+upper bound when image calls back off concurrently.
+
+Uses a throwaway SQLite database and local image storage unless --database-url
+or --storage s3 (fake S3 endpoint, needs boto3) are given.
+"""
+import argparse
+import collections
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.fake_providers import provider_env, start_fake_providers
+
+JOBS = ['breaking', 'future', 'translations']
+
+
+class SleepClock:
+    """
+    Stands in for time.sleep and time.monotonic while the pipeline runs. Each
+    sleep is recorded by what asked for it, then only sleep * scale is waited;
+    the rest is added to monotonic() so rate pacing and circuit breakers still
+    see the time pass.
+    """
+
+    def __init__(self, scale):
+        self.scale = scale
+        self.requested = collections.Counter()
+        self.waited = 0.0
+        self.offset = 0.0
+        self._lock = threading.Lock()
+        self._sleep = time.sleep
+        self._monotonic = time.monotonic
+
+    def install(self):
+        time.sleep, time.monotonic = self.sleep, self.monotonic
+
+    def uninstall(self):
+        time.sleep, time.monotonic = self._sleep, self._monotonic
+
+    @staticmethod
+    def reason(frame):
+        module, function = frame.f_globals.get('__name__', ''), frame.f_code.co_name
+        if module == 'providers':
+            return 'rate pacing' if function == '_wait_for_turn' else 'retry backoff'
+        if module.startswith('botocore'):
+            return 'retry backoff' # boto3 retries S3 calls itself
+        if module.endswith('_worker'):
+            return 'job pacing'
+        return f'other ({module})'
+
+    def sleep(self, seconds):
+        seconds = max(0.0, seconds)
+        waited = seconds * self.scale
+        with self._lock:
+            self.requested[self.reason(sys._getframe(1))] += seconds
+            self.waited += waited
+            self.offset += seconds - waited
+        if waited:
+            self._sleep(waited)
+
+    def monotonic(self):
+        return self._monotonic() + self.offset
+
+    def snapshot(self):
+        with self._lock:
+            return collections.Counter(self.requested), self.waited
+
+
+def configure_environment(args, fake_url, tmp_dir):
+    """Points every provider, the database and storage at local stand-ins. Must run before the backend is imported."""
+    os.environ.update(provider_env(fake_url))
+    os.environ.update({
+        'DATABASE_URL': args.database_url or f"sqlite:///{os.path.join(tmp_dir, 'pipeline.db')}",
+        'LLM_CACHE_ENABLED': 'false',
+        'STORAGE_BACKEND': args.storage,
+        'LOCAL_STORAGE_DIR': os.path.join(tmp_dir, 'media'),
+        'LOCAL_STORAGE_URL': 'http://localhost:5001/media',
+    })
+
+
+def seed_originals(count):
+    """English articles for the translations job, shaped like the ones the pipeline saves."""
+    from models import db, Article
+    articles = []
+    for i in range(count):
+        article = Article(slug=f"translation-bench-{time.time_ns()}-{i}", lang='en',
+                          title=f"Translation benchmark article {i}",
+                          meta_description="An article written for the translation benchmark.",
+                          content="## Introduction\n\n" + "\n\n".join(
+                              f"Paragraph {p} of the benchmark article. " + "Lorem ipsum dolor sit amet. " * 30
+                              for p in range(12)),
+                          is_published=True)
+        db.session.add(article)
+        articles.append(article)
+    db.session.commit()
+    return [article.id for article in articles]
+
+
+def run_job(name, args, fake, clock):
+    """Runs one job and returns its measurements."""
+    import breaking_news_worker
+    import future_content_worker
+    from models import db, Article
+    from utils import create_and_save_translations
+
+    app = breaking_news_worker.app
+    with app.app_context():
+        originals_before = Article.query.filter(Article.original_article_id.is_(None)).count()
+        translations_before = Article.query.filter(Article.original_article_id.isnot(None)).count()
+        to_translate = seed_originals(args.articles) if name == 'translations' else []
+
+    calls_before = collections.Counter(fake.state.calls)
+    requested_before, waited_before = clock.snapshot()
+    started = time.perf_counter()
+
+    if name == 'breaking':
+        breaking_news_worker.ARTICLES_TO_GENERATE = args.articles
+        breaking_news_worker.run_breaking_news_job()
+    elif name == 'future':
+        fake.state.topics = args.articles
+        future_content_worker.run_future_content_job()
+    else:
+        with app.app_context():
+            for article_id in to_translate:
+                create_and_save_translations(db.session.get(Article, article_id))
+
+    wall = time.perf_counter() - started
+    requested_after, waited_after = clock.snapshot()
+    with app.app_context():
+        originals = Article.query.filter(Article.original_article_id.is_(None)).count() - originals_before
+        translations = Article.query.filter(Article.original_article_id.isnot(None)).count() - translations_before
+    pages = originals + translations
+    if name == 'translations':
+        originals = len(to_translate) # translated here, not created
+
+    sleep = requested_after - requested_before
+    slept = sum(sleep.values())
+    work = max(0.0, wall - (waited_after - waited_before))
+    effective = work + slept
+    calls = collections.Counter(fake.state.calls)
+    calls.subtract(calls_before)
+    calls_by_provider = collections.Counter()
+    errors_by_provider = collections.Counter()
+    for (provider, status), count in calls.items():
+        calls_by_provider[provider] += count
+        if status != 200 and count:
+            errors_by_provider[f"{provider} {status}"] += count
+
+    return {
+        'articles': originals,
+        'translations': translations,
+        'wall_s': round(wall, 2),
+        'work_s': round(work, 2),
+        'sleep_s': round(slept, 2),
+        'sleep_by_reason_s': {reason: round(seconds, 2) for reason, seconds in sleep.items() if seconds},
+        'articles_per_min': round(originals / effective * 60, 2) if effective else None,
+        'pages_per_min': round(pages / effective * 60, 2) if effective else None,
+        'calls_per_article': {provider: round(count / max(originals, 1), 2)
+                              for provider, count in sorted(calls_by_provider.items()) if count},
+        'failed_calls': dict(errors_by_provider),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--jobs', nargs='*', choices=JOBS, default=JOBS)
+    parser.add_argument('--articles', type=int, default=3, help="articles per job")
+    parser.add_argument('--sleep-scale', type=float, default=0.0, help="share of each pipeline sleep actually waited")
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds per call, for every provider")
+    parser.add_argument('--groq-latency', type=float)
+    parser.add_argument('--fireworks-latency', type=float)
+    parser.add_argument('--translate-latency', type=float)
+    parser.add_argument('--storage-latency', type=float)
+    parser.add_argument('--error-rate', type=float, default=0.0, help="share of provider calls answered with HTTP 500")
+    parser.add_argument('--rate-limit', type=int, default=None, help="calls per minute per provider before HTTP 429")
+    parser.add_argument('--storage', choices=['local', 's3'], default='local')
+    parser.add_argument('--database-url', default=None)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', help="also write the results to this JSON file")
+    parser.add_argument('--verbose', action='store_true', help="show the pipeline's own output")
+    args = parser.parse_args()
+
+    latencies = {provider: value for provider, value in [
+        ('groq', args.groq_latency), ('fireworks', args.fireworks_latency),
+        ('libretranslate', args.translate_latency), ('storage', args.storage_latency)] if value is not None}
+    fake, fake_url = start_fake_providers(latency=args.latency, latencies=latencies, error_rate=args.error_rate,
+                                          rate_limit=args.rate_limit, seed=args.seed)
+    tmp_dir = tempfile.mkdtemp(prefix='pipeline-bench-')
+    configure_environment(args, fake_url, tmp_dir)
+    random.seed(args.seed)
+
+    clock = SleepClock(args.sleep_scale)
+    clock.install()
+    results = {}
+    try:
+        import breaking_news_worker
+        from models import db
+        with breaking_news_worker.app.app_context():
+            db.create_all()
+
+        for name in args.jobs:
+            print(f"Running {name}...", flush=True)
+            stdout = sys.stdout
+            if not args.verbose:
+                sys.stdout = open(os.devnull, 'w')
+            try:
+                results[name] = run_job(name, args, fake, clock)
+            finally:
+                if sys.stdout is not stdout:
+                    sys.stdout.close()
+                    sys.stdout = stdout
+    finally:
+        clock.uninstall()
+        fake.shutdown()
+
+    print(f"\n{'job':<14} {'articles':>8} {'transl.':>8} {'work':>8} {'sleep':>9} {'articles/min':>13} {'pages/min':>10}")
+    for name, result in results.items():
+        print(f"{name:<14} {result['articles']:>8} {result['translations']:>8} {result['work_s']:>7.1f}s "
+              f"{result['sleep_s']:>8.1f}s {str(result['articles_per_min']):>13} {str(result['pages_per_min']):>10}")
+    for name, result in results.items():
+        print(f"\n{name}:")
+        print(f"  sleep:             {json.dumps(result['sleep_by_reason_s'])}")
+        print(f"  calls per article: {json.dumps(result['calls_per_article'])}")
+        if result['failed_calls']:
+            print(f"  failed calls:      {json.dumps(result['failed_calls'])}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'settings': vars(args), 'jobs': results}, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
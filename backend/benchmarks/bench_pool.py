@@ -0,0 +1,136 @@
+# /backend/benchmarks/bench_pool.py
+"""
+Drives many concurrent reader requests through the app's connection pool.
+
+    # Straight to Postgres, the default pool
+    python benchmarks/bench_pool.py --database-url postgresql://localhost/blog --concurrency 64
+
+    # Through a local PgBouncer in transaction mode
+    python benchmarks/bench_pool.py --database-url postgresql://localhost:6432/blog --pgbouncer \\
+        --count-url postgresql://localhost:5432/blog --concurrency 64
+
+Requests run in-process on --concurrency threads, like one gunicorn worker
+with that many threads. It reports throughput, request latency, how long
+checkouts waited for a connection (see db_pool.py), failed checkouts and, with
+--count-url pointing at Postgres itself, the most server connections the
+database had open at once. Without --database-url it uses a SQLite file.
+Seeds a few articles if the database has none. Exits non-zero on any error.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+CONNECTIONS_SQL = """
+    SELECT count(*) FROM pg_stat_activity
+    WHERE datname = current_database() AND backend_type = 'client backend' AND pid <> pg_backend_pid()
+"""
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def watch_connections(count_url, stop, peak):
+    """Polls the server's connection count until stop is set, keeping the highest seen."""
+    from sqlalchemy import create_engine, text
+    from sqlalchemy.pool import NullPool
+    engine = create_engine(count_url, poolclass=NullPool)
+    with engine.connect() as connection:
+        while not stop.is_set():
+            peak[0] = max(peak[0], connection.execute(text(CONNECTIONS_SQL)).scalar())
+            time.sleep(0.05)
+    engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', default=None)
+    parser.add_argument('--count-url', default=None, help="direct Postgres URL to count server connections on")
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--pool', choices=['queue', 'null'], default=None, help="DB_POOL, default per db_pool.py")
+    parser.add_argument('--pool-size', type=int, default=None, help="DB_POOL_SIZE")
+    parser.add_argument('--max-overflow', type=int, default=None, help="DB_MAX_OVERFLOW")
+    parser.add_argument('--pool-timeout', type=float, default=None, help="DB_POOL_TIMEOUT")
+    parser.add_argument('--no-pre-ping', action='store_true', help="DB_POOL_PRE_PING=false")
+    parser.add_argument('--pgbouncer', action='store_true', help="DB_PGBOUNCER=true")
+    args = parser.parse_args()
+
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='pool-bench-'), 'pool.db')}"
+    # Config reads the pool settings when it is imported
+    os.environ['DATABASE_URL'] = database_url
+    for name, value in [('DB_POOL', args.pool), ('DB_POOL_SIZE', args.pool_size), ('DB_MAX_OVERFLOW', args.max_overflow),
+                        ('DB_POOL_TIMEOUT', args.pool_timeout)]:
+        if value is not None:
+            os.environ[name] = str(value)
+    if args.no_pre_ping:
+        os.environ['DB_POOL_PRE_PING'] = 'false'
+    if args.pgbouncer:
+        os.environ['DB_PGBOUNCER'] = 'true'
+
+    import db_pool
+    from app import create_app
+    from models import db, Article
+
+    app = create_app({'CREATE_TABLES_ON_STARTUP': False, 'INSTRUMENTATION_ENABLED': False})
+    with app.app_context():
+        db.create_all()
+        if not Article.query.first():
+            for i in range(20):
+                db.session.add(Article(slug=f"pool-bench-{i}", title=f"Pool bench {i}", meta_description="Seeded.",
+                                       content="Some content. " * 200, is_breaking_news=i % 4 == 0))
+            db.session.commit()
+        slugs = [slug for (slug,) in db.session.query(Article.slug).filter_by(is_published=True).limit(20)]
+        print(f"Engine: {db.engine.url.render_as_string(hide_password=True)}, pool: {db.engine.pool.status()}")
+
+    checkouts, failures = [], []
+    db_pool.add_checkout_observer(lambda seconds, ok: (checkouts if ok else failures).append(seconds))
+    paths = ['/api/articles?limit=10', '/api/articles/breaking'] + [f"/api/get-article/{slug}" for slug in slugs]
+    local = threading.local()
+
+    def one_request(i):
+        if not hasattr(local, 'client'):
+            local.client = app.test_client()
+        started = time.perf_counter()
+        status = local.client.get(paths[i % len(paths)]).status_code
+        return time.perf_counter() - started, status
+
+    stop, peak = threading.Event(), [0]
+    watcher = None
+    if args.count_url:
+        watcher = threading.Thread(target=watch_connections, args=(args.count_url, stop, peak), daemon=True)
+        watcher.start()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(one_request, range(args.requests)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    if watcher:
+        watcher.join()
+
+    latencies = [latency for latency, _ in results]
+    errors = sum(1 for _, status in results if status >= 500)
+    print(f"\n{args.requests} requests on {args.concurrency} threads in {elapsed:.1f}s ({args.requests / elapsed:.0f} req/s)")
+    print(f"Request latency:  p50 {percentile(latencies, 50) * 1000:.1f}ms  p95 {percentile(latencies, 95) * 1000:.1f}ms  "
+          f"p99 {percentile(latencies, 99) * 1000:.1f}ms")
+    print(f"Checkout wait:    p50 {percentile(checkouts, 50) * 1000:.2f}ms  p95 {percentile(checkouts, 95) * 1000:.2f}ms  "
+          f"max {max(checkouts, default=0) * 1000:.2f}ms over {len(checkouts)} checkouts")
+    print(f"Failed checkouts: {len(failures)}    5xx responses: {errors}")
+    if args.count_url:
+        print(f"Peak server connections: {peak[0]}")
+    sys.exit(1 if errors or failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+# /backend/benchmarks/bench_startup.py
+"""
+Startup-time benchmark for the web app and the workers.
+
+    python benchmarks/bench_startup.py [--import-budget-ms 1500] [--first-request-budget-ms 2500]
+
+Measures, each in a fresh interpreter:
+  - `python -X importtime -c "import app"` (and the worker modules), listing the slowest imports
+  - create_app() plus the first GET /api/health through the test client
+
+Exits non-zero when a budget is exceeded, so CI can run it as a startup gate.
+Importing must not need the network or a database: the first-request check
+runs against an in-memory SQLite database, and DATABASE_URL defaults to one.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Binding the engine doesn't connect, but Flask-SQLAlchemy needs some database URL
+BENCH_ENV = {**os.environ, 'DATABASE_URL': os.getenv('DATABASE_URL') or 'sqlite://'}
+
+# Modules that must stay cheap to import, with the budget multiplier they get
+IMPORT_TARGETS = {
+    'app': 1.0,
+    'breaking_news_worker': 1.0,
+    'future_content_worker': 1.0,
+    'weekly_content_worker': 1.0,
+}
+
+FIRST_REQUEST_SNIPPET = """
+import json, time
+started = time.perf_counter()
+from app import create_app
+app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'SQLALCHEMY_ENGINE_OPTIONS': {}, 'CREATE_TABLES_ON_STARTUP': False})
+created = time.perf_counter()
+response = app.test_client().get('/api/health')
+finished = time.perf_counter()
+print(json.dumps({'status': response.status_code,
+                  'create_app_ms': (created - started) * 1000,
+                  'first_request_ms': (finished - created) * 1000,
+                  'total_ms': (finished - started) * 1000}))
+"""
+
+
+def measure_imports(module):
+    """Returns (cumulative import ms of module, [(self_ms, name)] of its slowest imports)."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=BACKEND_DIR, env=BENCH_ENV, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    total_ms, rows = 0.0, []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len('import time:'):].split('|'))
+        rows.append((int(self_us) / 1000, name))
+        if name == module:
+            total_ms = int(cumulative_us) / 1000
+    return total_ms, sorted(rows, reverse=True)[:10]
+
+
+def measure_first_request():
+    result = subprocess.run([sys.executable, '-c', FIRST_REQUEST_SNIPPET],
+                            cwd=BACKEND_DIR, env=BENCH_ENV, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"First request failed:\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--import-budget-ms', type=float, default=float(os.getenv('IMPORT_BUDGET_MS', '1500')))
+    parser.add_argument('--first-request-budget-ms', type=float, default=float(os.getenv('FIRST_REQUEST_BUDGET_MS', '2500')))
+    args = parser.parse_args()
+
+    failures = []
+    for module, multiplier in IMPORT_TARGETS.items():
+        budget = args.import_budget_ms * multiplier
+        total_ms, slowest = measure_imports(module)
+        verdict = 'ok' if total_ms <= budget else 'OVER BUDGET'
+        print(f"import {module:<24} {total_ms:8.1f}ms (budget {budget:.0f}ms) {verdict}")
+        for self_ms, name in slowest[:5]:
+            print(f"    {self_ms:8.1f}ms  {name}")
+        if total_ms > budget:
+            failures.append(f"import {module}")
+
+    timings = measure_first_request()
+    verdict = 'ok' if timings['total_ms'] <= args.first_request_budget_ms else 'OVER BUDGET'
+    print(f"create_app + first request     {timings['total_ms']:8.1f}ms (budget {args.first_request_budget_ms:.0f}ms) {verdict}")
+    print(f"    create_app {timings['create_app_ms']:.1f}ms, first GET /api/health {timings['first_request_ms']:.1f}ms (status {timings['status']})")
+    if timings['status'] != 200:
+        failures.append(f"health check returned {timings['status']}")
+    elif timings['total_ms'] > args.first_request_budget_ms:
+        failures.append("first request")
+
+    if failures:
+        print(f"FAILED: {', '.join(failures)}")
+        sys.exit(1)
+    print("All startup budgets met.")
+
+
+if __name__ == '__main__':
+    main()
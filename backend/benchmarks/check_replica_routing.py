@@ -0,0 +1,112 @@
+# /backend/benchmarks/check_replica_routing.py
+"""
+Checks that reads go to the replicas and fall back to the primary.
+
+    python benchmarks/check_replica_routing.py \\
+        --primary postgresql://localhost:5432/blog_primary \\
+        --replica postgresql://localhost:5433/blog_replica
+
+Run it against two independent local Postgres instances (not a streaming
+pair): it writes a different article to each, so which one answered is
+visible in the response. Without arguments it uses two SQLite files, which
+checks the routing but not the Postgres lag query. The tables in both
+databases are dropped and recreated. Exits non-zero if any check fails.
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import db_routing
+from app import create_app
+from models import db, Article, Category
+
+ADMIN_KEY = 'replica-check-admin'
+
+
+def make_app(primary, replicas, **overrides):
+    db_routing._health.clear()
+    return create_app({
+        'SQLALCHEMY_DATABASE_URI': primary,
+        'SQLALCHEMY_BINDS': db_routing.replica_binds(','.join(replicas)),
+        'ADMIN_SECRET_KEY': ADMIN_KEY,
+        'CREATE_TABLES_ON_STARTUP': False,
+        'REPLICA_CHECK_SECONDS': 60,
+        **overrides,
+    })
+
+
+def seed(app, bind_key, slug):
+    """Recreates the tables on one database and saves a single article to it."""
+    with app.app_context():
+        engine = db.engines[bind_key]
+        db.metadata.drop_all(bind=engine)
+        db.metadata.create_all(bind=engine)
+        with engine.begin() as connection:
+            connection.execute(Category.__table__.insert().values(name=slug, slug=slug))
+            connection.execute(Article.__table__.insert().values(
+                slug=slug, lang='en', title=slug, meta_description=slug, content=slug,
+                is_published=True, is_breaking_news=True))
+
+
+def article_slugs(client, headers=None):
+    return [a['slug'] for a in client.get('/api/articles', headers=headers or {}).get_json()['articles']]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--primary', help="Primary database URL (default: a temporary SQLite file)")
+    parser.add_argument('--replica', action='append', help="Replica database URL, repeatable (default: a temporary SQLite file)")
+    parser.add_argument('--unreachable', help="A URL nothing listens on, to check the fallback for a down replica")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix='replica-check-')
+    primary = args.primary or f"sqlite:///{os.path.join(tmp, 'primary.db')}"
+    replicas = args.replica or [f"sqlite:///{os.path.join(tmp, 'replica.db')}"]
+    unreachable = args.unreachable or (
+        'postgresql://127.0.0.1:1/none' if primary.startswith('postgres') else f"sqlite:///{tmp}/missing/none.db")
+
+    app = make_app(primary, replicas)
+    seed(app, None, 'primary-only')
+    for i in range(len(replicas)):
+        seed(app, f"{db_routing.REPLICA_BIND_PREFIX}{i}", 'replica-only')
+
+    failures = []
+    def check(name, ok):
+        print(f"{'ok  ' if ok else 'FAIL'} {name}")
+        if not ok:
+            failures.append(name)
+
+    client = app.test_client()
+    check("article list is read from a replica", article_slugs(client) == ['replica-only'])
+    check("categories are read from a replica", [c['slug'] for c in client.get('/api/categories').get_json()] == ['replica-only'])
+    check("breaking news is read from a replica", [a['slug'] for a in client.get('/api/articles/breaking').get_json()] == ['replica-only'])
+    check("a category page is read from a replica", client.get('/api/articles/category/replica-only').status_code == 200)
+    check("an article only on a replica is found", client.get('/api/get-article/replica-only').status_code == 200)
+    check("an article not yet on the replica falls back to the primary",
+          client.get('/api/get-article/primary-only').status_code == 200)
+    check("admin requests read from the primary",
+          article_slugs(client, {'x-admin-secret-key': ADMIN_KEY}) == ['primary-only'])
+    with app.app_context():
+        lag = db_routing.measure_lag(db.engines[f"{db_routing.REPLICA_BIND_PREFIX}0"])
+    check(f"replica lag can be measured ({lag:.1f}s)", lag >= 0)
+
+    lagging = make_app(primary, replicas, REPLICA_MAX_LAG_SECONDS=-1)
+    check("a replica over the lag limit is skipped", article_slugs(lagging.test_client()) == ['primary-only'])
+
+    down = make_app(primary, [unreachable] + replicas)
+    down_client = down.test_client()
+    check("a down replica is skipped for the next one",
+          all(article_slugs(down_client) == ['replica-only'] for _ in range(4)))
+    down_only = make_app(primary, [unreachable])
+    check("with every replica down, reads go to the primary", article_slugs(down_only.test_client()) == ['primary-only'])
+
+    print(f"\n{len(failures)} check(s) failed" if failures else "\nAll checks passed")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,341 @@
+# /backend/benchmarks/fake_providers.py
+"""
+Local stand-ins for every outbound provider, so benchmarks can run the real
+code paths without keys, cost or rate limits. One server answers for all of them:
+
+    Groq            GROQ_BASE_URL=<base>            (chat completions)
+    Fireworks       FIREWORKS_API_URL=<base>/fireworks/text_to_image
+    LibreTranslate  LIBRETRANSLATE_API_URL=<base>/translate
+    Image storage   STORAGE_BACKEND=s3 S3_ENDPOINT_URL=<base> S3_BUCKET=fake-bucket
+    RSS             RSS_FEEDS=<base>/rss.xml        (headlines dated today)
+
+Firebase Storage can't be pointed at a local server without real credentials,
+so storage is faked through the S3 API that storage.py also speaks.
+
+Every provider can be given its own latency, an error rate (HTTP 500) and a
+rate limit in calls per minute (HTTP 429 with Retry-After). GET /_stats
+returns the calls seen per provider and status.
+
+    python benchmarks/fake_providers.py --port 8900 --latency 15 --error-rate 0.05 --rate-limit 30
+"""
+import argparse
+import collections
+import datetime
+import hashlib
+import io
+import json
+import random
+import re
+import threading
+import time
+from email.utils import format_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from xml.sax.saxutils import escape
+
+PROVIDERS = ('groq', 'fireworks', 'libretranslate', 'storage', 'rss')
+FAKE_BUCKET = 'fake-bucket'
+CATEGORIES = ['Technology', 'Health', 'Science', 'Business', 'Culture', 'World News',
+              'Travel', 'Food', 'Finance', 'Education', 'Lifestyle', 'Entertainment']
+SUBJECTS = ['monsoon', 'chip', 'election', 'festival', 'satellite', 'vaccine', 'cricket', 'startup',
+            'tariff', 'museum', 'battery', 'airline', 'drought', 'cinema', 'telescope', 'robot']
+
+FAKE_ARTICLE = {
+    "title": "A Benchmark Article About Nothing In Particular",
+    "slug": "benchmark-article",
+    "meta_description": "Generated by the fake provider for load tests.",
+    "category": "Technology",
+    "authorName": "Bench Mark",
+    "authorBio": "Writes the same article every time.",
+    "content": "## Introduction\n\n" + "Lorem ipsum dolor sit amet. " * 200,
+}
+
+
+def chat_completion(model, content):
+    return {
+        "id": f"chatcmpl-fake-{time.time_ns()}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 500, "completion_tokens": 1500, "total_tokens": 2000},
+    }
+
+
+def fake_image(prompt, width, height):
+    """A small JPEG whose colours depend on the prompt, so different prompts give different files."""
+    from PIL import Image, ImageDraw
+    digest = hashlib.sha256(prompt.encode('utf-8')).digest()
+    image = Image.new('RGB', (width, height), tuple(digest[:3]))
+    draw = ImageDraw.Draw(image)
+    for i in range(8):
+        x, y = digest[3 + i] * width // 256, digest[11 + i] * height // 256
+        draw.ellipse([x, y, x + width // 4, y + height // 4], fill=tuple(digest[19 + i:22 + i]))
+    output = io.BytesIO()
+    image.save(output, 'JPEG', quality=80)
+    return output.getvalue()
+
+
+def _pause(seconds):
+    # Not time.sleep(): the pipeline benchmark patches it to account for the pipeline's own sleeps
+    if seconds > 0:
+        threading.Event().wait(seconds)
+
+
+class FakeProviderState:
+    """Latency, failure settings and call counts shared by all request threads."""
+
+    def __init__(self, latency=0.0, latencies=None, error_rate=0.0, rate_limit=None, seed=0, headlines=20, topics=10):
+        self.latencies = {provider: latency for provider in PROVIDERS}
+        self.latencies.update(latencies or {})
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit # calls per minute per provider, None for unlimited
+        self.headlines = headlines # items in the RSS feed
+        self.topics = topics # future topics the fake Groq predicts
+        self.random = random.Random(seed)
+        self.calls = collections.Counter()
+        self.objects = {}
+        self.counter = 0
+        self._recent = collections.defaultdict(collections.deque)
+        self._lock = threading.Lock()
+
+    def admit(self, provider):
+        """Decides the fate of one call: (status, retry_after). Storage and RSS are never rate limited."""
+        with self._lock:
+            status, retry_after = 200, None
+            if self.rate_limit and provider not in ('storage', 'rss'):
+                now = time.monotonic()
+                recent = self._recent[provider]
+                while recent and now - recent[0] >= 60:
+                    recent.popleft()
+                if len(recent) >= self.rate_limit:
+                    status, retry_after = 429, max(1, int(60 - (now - recent[0])) + 1)
+                else:
+                    recent.append(now)
+            if status == 200 and provider != 'rss' and self.random.random() < self.error_rate:
+                status = 500
+            self.calls[(provider, status)] += 1
+            return status, retry_after
+
+    def next_number(self):
+        with self._lock:
+            self.counter += 1
+            return self.counter
+
+    def pick(self, items, count):
+        with self._lock:
+            return self.random.sample(items, min(count, len(items)))
+
+    def stats(self):
+        """{provider: {status: calls}}"""
+        result = {}
+        for (provider, status), count in sorted(self.calls.items()):
+            result.setdefault(provider, {})[str(status)] = count
+        return result
+
+
+class FakeProviderHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1' # keep-alive, and "Expect: 100-continue" from boto3 is answered
+    state = None
+
+    def log_message(self, *args):
+        pass # Keep benchmark output readable
+
+    def _send(self, body, status=200, content_type='application/json', headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def _send_json(self, payload, status=200, headers=None):
+        self._send(json.dumps(payload).encode('utf-8'), status, headers=headers)
+
+    def _read_body(self):
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            body = self._read_chunks()
+        else:
+            body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if 'aws-chunked' in self.headers.get('Content-Encoding', ''):
+            body = self._decode_aws_chunked(body)
+        return body
+
+    def _read_chunks(self):
+        body = b''
+        while True:
+            size = int(self.rfile.readline().split(b';')[0].strip() or b'0', 16)
+            if size == 0:
+                while self.rfile.readline().strip(): # trailers
+                    pass
+                return body
+            body += self.rfile.read(size)
+            self.rfile.readline()
+
+    @staticmethod
+    def _decode_aws_chunked(body):
+        """Strips the chunk framing boto3 adds when it sends checksums as trailers."""
+        data, position = b'', 0
+        while position < len(body):
+            line_end = body.index(b'\r\n', position)
+            size = int(body[position:line_end].split(b';')[0], 16)
+            if size == 0:
+                break
+            data += body[line_end + 2:line_end + 2 + size]
+            position = line_end + 2 + size + 2
+        return data
+
+    def _provider(self):
+        path = urlparse(self.path).path
+        if path.endswith('/chat/completions'):
+            return 'groq'
+        if path.startswith('/fireworks/'):
+            return 'fireworks'
+        if path == '/translate':
+            return 'libretranslate'
+        if path.startswith(f'/{FAKE_BUCKET}'):
+            return 'storage'
+        if path == '/rss.xml':
+            return 'rss'
+        return None
+
+    def _handle(self):
+        provider = self._provider()
+        if provider is None:
+            if urlparse(self.path).path == '/_stats':
+                return self._send_json(self.state.stats())
+            return self._send_json({"error": f"Unknown fake endpoint {self.path}"}, 404)
+
+        body = self._read_body() if self.command in ('POST', 'PUT') else b''
+        _pause(self.state.latencies.get(provider, 0))
+        status, retry_after = self.state.admit(provider)
+        if status == 429:
+            return self._send_json({"error": {"message": "Rate limit reached (fake)", "type": "rate_limit"}},
+                                   429, headers={'Retry-After': str(retry_after)})
+        if status != 200:
+            return self._send_json({"error": {"message": "Internal error (fake)", "type": "server_error"}}, status)
+        getattr(self, f"_{provider}")(body)
+
+    do_GET = do_POST = do_PUT = do_HEAD = _handle
+
+    # --- GROQ ---
+    def _groq(self, body):
+        request = json.loads(body or b'{}')
+        prompt = '\n'.join(str(message.get('content', '')) for message in request.get('messages', []))
+        if '"selected_headlines"' in prompt:
+            match = re.search(r'select the (\d+)', prompt)
+            count = int(match.group(1)) if match else 5
+            headlines = re.findall(r'^\s*- (.+)$', prompt, re.MULTILINE)
+            content = json.dumps({"selected_headlines": self.state.pick(headlines, count)})
+        elif '"future_topics"' in prompt:
+            content = json.dumps({"future_topics": [self._topic() for _ in range(self.state.topics)]})
+        elif 'single key "keywords"' in prompt:
+            content = json.dumps({"keywords": ["benchmark", "load test", "latency"]})
+        elif 'professional translator' in prompt:
+            match = re.search(r"into the language with code '([^']+)'", prompt)
+            target = match.group(1) if match else 'xx'
+            content = f"[{target}] " + prompt.split('---\n', 1)[-1]
+        else:
+            content = json.dumps(self._article())
+        self._send_json(chat_completion(request.get('model', 'fake'), content))
+
+    def _topic(self):
+        subject, other = self.state.pick(SUBJECTS, 2)
+        return f"The {subject} {other} summit {self.state.next_number()}"
+
+    def _article(self):
+        number = self.state.next_number()
+        subject, other = self.state.pick(SUBJECTS, 2)
+        paragraphs = [f"Paragraph {i} about the {subject} story. " + "Lorem ipsum dolor sit amet. " * 30 for i in range(12)]
+        paragraphs.insert(2, f"[IMAGE: A news photo of a {subject} near a {other}, number {number}]")
+        paragraphs.insert(8, f"[IMAGE: A wide shot of the {other} at dusk, number {number}]")
+        return dict(FAKE_ARTICLE, title=f"Benchmark {subject} article {number}",
+                    slug=f"benchmark-article-{number}", category=self.state.pick(CATEGORIES, 1)[0],
+                    content="## Introduction\n\n" + "\n\n".join(paragraphs))
+
+    # --- FIREWORKS ---
+    def _fireworks(self, body):
+        request = json.loads(body or b'{}')
+        self._send(fake_image(request.get('prompt', ''), int(request.get('width', 1024)), int(request.get('height', 512))),
+                   content_type='image/jpeg')
+
+    # --- LIBRETRANSLATE ---
+    def _libretranslate(self, body):
+        request = json.loads(body or b'{}')
+        self._send_json({"translatedText": f"[{request.get('target')}] {request.get('q', '')}"})
+
+    # --- STORAGE (S3 API, path-style) ---
+    def _storage(self, body):
+        url = urlparse(self.path)
+        key = url.path[len(FAKE_BUCKET) + 2:]
+        if self.command == 'PUT':
+            self.state.objects[key] = (body, self.headers.get('Content-Type', 'application/octet-stream'))
+            return self._send(b'', headers={'ETag': f'"{hashlib.md5(body).hexdigest()}"'})
+        if key:
+            if key not in self.state.objects:
+                return self._send(b'<Error><Code>NoSuchKey</Code></Error>', 404, 'application/xml')
+            data, content_type = self.state.objects[key]
+            return self._send(data, content_type=content_type)
+        prefix = parse_qs(url.query).get('prefix', [''])[0]
+        keys = sorted(k for k in self.state.objects if k.startswith(prefix))
+        contents = ''.join(f"<Contents><Key>{escape(k)}</Key><Size>{len(self.state.objects[k][0])}</Size>"
+                           f"<LastModified>2026-01-01T00:00:00.000Z</LastModified><StorageClass>STANDARD</StorageClass></Contents>"
+                           for k in keys)
+        xml = (f'<?xml version="1.0" encoding="UTF-8"?><ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">'
+               f"<Name>{FAKE_BUCKET}</Name><Prefix>{escape(prefix)}</Prefix><KeyCount>{len(keys)}</KeyCount>"
+               f"<MaxKeys>1000</MaxKeys><IsTruncated>false</IsTruncated>{contents}</ListBucketResult>")
+        self._send(xml.encode('utf-8'), content_type='application/xml')
+
+    # --- RSS ---
+    def _rss(self, body):
+        now = datetime.datetime.now(datetime.timezone.utc)
+        items = ''.join(f"<item><title>Breaking: {escape(self._topic())} draws record crowds</title>"
+                        f"<pubDate>{format_datetime(now)}</pubDate></item>" for _ in range(self.state.headlines))
+        xml = f'<?xml version="1.0"?><rss version="2.0"><channel><title>Fake news</title>{items}</channel></rss>'
+        self._send(xml.encode('utf-8'), content_type='application/rss+xml')
+
+
+def start_fake_providers(port=0, latency=0.0, **settings):
+    """
+    Starts the fake server on a background thread. Returns (server, base_url);
+    server.state holds the settings and call counts. settings are passed to FakeProviderState.
+    """
+    state = FakeProviderState(latency=latency, **settings)
+    handler = type('Handler', (FakeProviderHandler,), {'state': state})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    server.state = state
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def provider_env(base_url):
+    """Environment variables that point the app and the workers at the fake providers."""
+    return {
+        'GROQ_BASE_URL': base_url, 'GROQ_API_KEY': 'fake-key',
+        'FIREWORKS_API_URL': f"{base_url}/fireworks/text_to_image", 'FIREWORKS_API_KEY': 'fake-key',
+        'LIBRETRANSLATE_API_URL': f"{base_url}/translate",
+        'RSS_FEEDS': f"{base_url}/rss.xml",
+        'S3_ENDPOINT_URL': base_url, 'S3_BUCKET': FAKE_BUCKET, 'S3_REGION': 'us-east-1',
+        'AWS_ACCESS_KEY_ID': 'fake', 'AWS_SECRET_ACCESS_KEY': 'fake',
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds to wait before answering")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="share of calls answered with HTTP 500")
+    parser.add_argument('--rate-limit', type=int, default=None, help="calls per minute per provider before HTTP 429")
+    args = parser.parse_args()
+    server, base_url = start_fake_providers(args.port, args.latency, error_rate=args.error_rate, rate_limit=args.rate_limit)
+    print(f"Fake providers listening on {base_url} (latency {args.latency}s). Ctrl+C to stop.")
+    for name, value in provider_env(base_url).items():
+        print(f"  {name}={value}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,164 @@
+# /backend/benchmarks/load_reader_latency.py
+"""
+Load-test scenario: reader latency must stay flat while generations are in flight.
+
+    python benchmarks/load_reader_latency.py [--generations 12] [--provider-latency 10]
+
+Starts a fake Groq API with a slow response, seeds a SQLite database (or uses
+--database-url), and runs gunicorn with gunicorn.conf.py. It then measures
+reader endpoints twice: once idle, and once while --generations slow
+/api/generate-content requests are in flight. Exits non-zero when reader p95
+under load is more than --max-slowdown times the idle p95 (plus 50ms of slack).
+
+Pass --gunicorn-args "--worker-class sync --workers 2 --threads 1" to see the
+starvation this configuration prevents. On SQLite the generations end in a 500
+when saving (internal linking needs Postgres full-text search), after the slow
+provider calls, so they still load the server for the whole scenario.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.fake_providers import start_fake_providers
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def seed_database(database_url, count=50):
+    env_before = os.environ.get('DATABASE_URL')
+    os.environ['DATABASE_URL'] = database_url
+    try:
+        from config import create_worker_app
+        from models import db, Article
+        app = create_worker_app({'SQLALCHEMY_DATABASE_URI': database_url})
+        with app.app_context():
+            db.create_all()
+            if Article.query.count() < count:
+                for i in range(count):
+                    db.session.add(Article(slug=f"seed-article-{i}", title=f"Seed article {i}",
+                                           meta_description="Seeded for the load test.",
+                                           content="Some content. " * 300))
+                db.session.commit()
+    finally:
+        if env_before is None:
+            os.environ.pop('DATABASE_URL', None)
+        else:
+            os.environ['DATABASE_URL'] = env_before
+
+
+def wait_until_up(base_url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"{base_url}/api/health", timeout=1).ok:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("gunicorn did not come up in time")
+
+
+def reader_phase(base_url, requests_total, concurrency):
+    """Hits the reader endpoints and returns the latencies in ms."""
+    session = requests.Session()
+    paths = ['/api/articles?page=1&limit=10', '/api/get-article/seed-article-1', '/api/categories', '/api/health']
+
+    errors = []
+
+    def one(i):
+        started = time.perf_counter()
+        try:
+            session.get(base_url + paths[i % len(paths)], timeout=30).raise_for_status()
+        except requests.RequestException as e:
+            errors.append(type(e).__name__) # a starved reader counts with its full wait
+        return (time.perf_counter() - started) * 1000
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(one, range(requests_total)))
+    if errors:
+        print(f"{len(errors)} reader requests failed: {sorted(set(errors))}")
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--generations', type=int, default=12, help="generation requests in flight")
+    parser.add_argument('--provider-latency', type=float, default=10.0, help="seconds per fake Groq call")
+    parser.add_argument('--reads', type=int, default=400)
+    parser.add_argument('--read-concurrency', type=int, default=4)
+    parser.add_argument('--max-slowdown', type=float, default=3.0)
+    parser.add_argument('--port', type=int, default=5099)
+    parser.add_argument('--database-url', default=None)
+    parser.add_argument('--gunicorn-args', default='', help="extra gunicorn arguments, e.g. to compare worker classes")
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp(prefix='load-test-')
+    database_url = args.database_url or f"sqlite:///{os.path.join(tmp_dir, 'load.db')}"
+    seed_database(database_url)
+
+    fake_server, fake_url = start_fake_providers(latency=args.provider_latency)
+    env = {**os.environ,
+           'DATABASE_URL': database_url, 'PORT': str(args.port),
+           'GROQ_BASE_URL': fake_url, 'GROQ_API_KEY': 'fake-key',
+           'LLM_CACHE_ENABLED': 'false', 'CREATE_TABLES_ON_STARTUP': 'false'}
+    if args.gunicorn_args:
+        env['GUNICORN_CMD_ARGS'] = args.gunicorn_args
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+                              cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        wait_until_up(base_url)
+        reader_phase(base_url, 20, args.read_concurrency) # warm up connections and caches
+        idle = reader_phase(base_url, args.reads, args.read_concurrency)
+
+        statuses = []
+        def generate(i):
+            try:
+                response = requests.post(f"{base_url}/api/generate-content",
+                                         json={'query': f"load test topic {i}"}, timeout=600)
+                statuses.append(str(response.status_code))
+            except requests.RequestException as e:
+                statuses.append(type(e).__name__)
+
+        generators = [threading.Thread(target=generate, args=(i,)) for i in range(args.generations)]
+        for thread in generators:
+            thread.start()
+        time.sleep(1) # let them reach the provider call
+        loaded = reader_phase(base_url, args.reads, args.read_concurrency)
+        for thread in generators:
+            thread.join()
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+        fake_server.shutdown()
+
+    print(f"{'phase':<28} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for name, values in [('idle', idle), (f'{args.generations} generations in flight', loaded)]:
+        print(f"{name:<28} {percentile(values, 50):7.1f}ms {percentile(values, 95):7.1f}ms {percentile(values, 99):7.1f}ms")
+    counts = {status: statuses.count(status) for status in set(statuses)}
+    print(f"generation responses: {counts} (503 = turned away by the generation slot cap)")
+
+    budget = percentile(idle, 95) * args.max_slowdown + 50
+    if percentile(loaded, 95) > budget:
+        print(f"FAILED: reader p95 under load {percentile(loaded, 95):.1f}ms exceeds {budget:.1f}ms")
+        sys.exit(1)
+    print("Reader latency stayed flat while generations were in flight.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+# /backend/benchmarks/seed_corpus.py
+"""
+Seeds a database with a synthetic article corpus for benchmarks.
+
+    DATABASE_URL=postgresql://localhost/blog_bench python benchmarks/seed_corpus.py --articles 100000 --reset
+
+--articles is the total number of article rows. They are spread over groups
+of one English original plus its translations in the other nine languages,
+as the pipeline produces them. Content lengths follow a log-normal
+distribution around the ~2000-word articles the prompts ask for. Each
+original gets one or two of the twelve pipeline categories. The same --seed
+always produces the same corpus.
+
+Never point this at a production database: --reset deletes every article.
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from slugify import slugify
+from sqlalchemy import func, text
+
+from config import create_worker_app
+from models import db, Article, Category, article_categories
+from utils import ALL_TARGET_LANGUAGES
+
+CATEGORIES = ['Technology', 'Health', 'Science', 'Business', 'Culture', 'World News',
+              'Travel', 'Food', 'Finance', 'Education', 'Lifestyle', 'Entertainment']
+
+# Words the benchmark's search queries draw from, so searches hit a realistic share of rows
+TOPIC_WORDS = [
+    'market', 'climate', 'election', 'startup', 'vaccine', 'battery', 'satellite', 'inflation',
+    'football', 'festival', 'recipe', 'airline', 'semiconductor', 'rainfall', 'cricket', 'museum',
+    'university', 'mortgage', 'wildfire', 'robotics', 'diet', 'tourism', 'cinema', 'bitcoin',
+    'hospital', 'telescope', 'drought', 'streaming', 'tariff', 'monsoon', 'smartphone', 'fusion',
+]
+FILLER_WORDS = (
+    "the of and to in a is that for it as was with be by on not he this are or his from at which "
+    "but have an they more one had you were her all she there would their we him been has when who "
+    "will no if out so said what up its about than into them can only other new some could time "
+    "these two may then do first any my now such like our over man me even most made after also "
+    "did many before must through back years where much your way well down should because each "
+    "just those people how too little state good very make world still own see men work long get "
+    "here between both life being under never day same another know while last might us great old"
+).split()
+
+BATCH_SIZE = 2000
+
+
+def make_paragraph(rng, topic):
+    words = [rng.choice(FILLER_WORDS) for _ in range(rng.randint(40, 90))]
+    for _ in range(rng.randint(1, 4)):
+        words.insert(rng.randrange(len(words)), topic)
+    words[0] = words[0].capitalize()
+    return ' '.join(words) + '.'
+
+
+def make_content(rng, topic, paragraphs):
+    """A Markdown article of roughly 2000 words with headings, like the generated ones."""
+    words = max(300, int(rng.lognormvariate(7.55, 0.35))) # median ~1900 words
+    blocks, count = [], 0
+    while count < words:
+        if len(blocks) % 5 == 0:
+            blocks.append(f"### {topic.capitalize()} {rng.choice(FILLER_WORDS)} {rng.choice(FILLER_WORDS)}")
+        paragraph = rng.choice(paragraphs[topic])
+        blocks.append(paragraph)
+        count += paragraph.count(' ') + 1
+    return '\n\n'.join(blocks)
+
+
+def reset(engine):
+    print("Deleting existing articles and categories...")
+    with engine.begin() as connection:
+        connection.execute(article_categories.delete())
+        connection.execute(text("DELETE FROM article_images"))
+        connection.execute(text("DELETE FROM article_archive"))
+        connection.execute(Article.__table__.update().values(original_article_id=None))
+        connection.execute(Article.__table__.delete())
+        connection.execute(Category.__table__.delete())
+
+
+def seed(total, rng, batch_size=BATCH_SIZE):
+    engine = db.engine
+    categories = {}
+    for name in CATEGORIES:
+        category = Category.query.filter_by(name=name).first()
+        if not category:
+            category = Category(name=name, slug=slugify(name))
+            db.session.add(category)
+        categories[name] = category
+    db.session.commit()
+    category_ids = [category.id for category in categories.values()]
+
+    # A pool of paragraphs per topic keeps generation fast even for a million rows
+    paragraphs = {topic: [make_paragraph(rng, topic) for _ in range(40)] for topic in TOPIC_WORDS}
+
+    next_id = (db.session.query(func.max(Article.id)).scalar() or 0) + 1
+    languages = ALL_TARGET_LANGUAGES
+    now = datetime.datetime.now(datetime.timezone.utc)
+    articles, links, written = [], [], 0
+    started = time.monotonic()
+
+    while written < total:
+        topic = rng.choice(TOPIC_WORDS)
+        title = f"{topic.capitalize()} {rng.choice(FILLER_WORDS)} {rng.choice(FILLER_WORDS)} {rng.choice(TOPIC_WORDS)} {next_id}"
+        created_at = now - datetime.timedelta(minutes=rng.randint(0, 2 * 365 * 24 * 60))
+        group_categories = rng.sample(category_ids, rng.choice([1, 1, 2]))
+        original_id = next_id
+
+        for lang in languages[:total - written]:
+            articles.append({
+                'id': next_id,
+                'slug': slugify(title) if lang == 'en' else f"{lang}-{slugify(title)}",
+                'lang': lang,
+                'title': title if lang == 'en' else f"[{lang}] {title}",
+                'meta_description': make_paragraph(rng, topic)[:150],
+                'content': make_content(rng, topic, paragraphs),
+                'image_url': f"https://example.com/images/{rng.getrandbits(64):016x}.jpg",
+                'is_published': rng.random() > 0.02,
+                'is_breaking_news': rng.random() < 0.1,
+                'author_name': 'Bench Author',
+                'author_bio': 'Writes synthetic articles.',
+                'original_article_id': None if lang == 'en' else original_id,
+                'created_at': created_at,
+                'updated_at': created_at,
+            })
+            links.extend({'article_id': next_id, 'category_id': category_id} for category_id in group_categories)
+            next_id += 1
+            written += 1
+
+        if len(articles) >= batch_size or written >= total:
+            with engine.begin() as connection:
+                connection.execute(Article.__table__.insert(), articles)
+                connection.execute(article_categories.insert(), links)
+            articles, links = [], []
+            rate = written / max(time.monotonic() - started, 1e-6)
+            print(f"  {written}/{total} articles ({rate:.0f}/s)", end='\r')
+
+    if engine.dialect.name == 'postgresql':
+        with engine.begin() as connection:
+            connection.execute(text("SELECT setval(pg_get_serial_sequence('article', 'id'), (SELECT MAX(id) FROM article))"))
+            connection.execute(text("ANALYZE article"))
+            connection.execute(text("ANALYZE article_categories"))
+    print(f"\nSeeded {written} articles in {time.monotonic() - started:.1f}s.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--articles', type=int, default=1000, help="total article rows to add (1k to 1M)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--reset', action='store_true', help="delete all articles and categories first")
+    args = parser.parse_args()
+
+    app = create_worker_app()
+    with app.app_context():
+        db.create_all()
+        if args.reset:
+            reset(db.engine)
+        seed(args.articles, random.Random(args.seed))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,54 +1,44 @@
 import os
-import requests
 import time
+import datetime
 import json
 import re
 from slugify import slugify
-from groq import Groq
-from app import app, db, Article, Category
+from config import create_worker_app
+from models import db, Article
 import feedparser
 from prompts import get_keyword_prompt
 import random
-import firebase_admin
-from firebase_admin import credentials, storage
+import llm_cache
+from image_pipeline import fill_article_images
+from model_router import route_chat
 from utils import create_and_save_translations
+from persistence import insert_article, upsert_categories
+from pipeline_state import start_run, run_step, complete_run, get_step, item_key
+from tracing import current_span, span, traced
 
 ## --- CONFIGURATION ---
 ARTICLES_TO_GENERATE = 5
-groq_client = Groq(api_key=os.getenv("GROQ_APISEC_KEY"))
-
-# --- IMAGE GENERATION CONFIG ---
-FIREWORKS_API_KEY = os.getenv("FIREWORKS_API_KEY")
-FIREWORKS_API_URL = "https://api.fireworks.ai/inference/v1/workflows/accounts/fireworks/models/flux-1-schnell-fp8/text_to_image"
-
-# --- ENSURE FIREBASE IS INITIALIZED ---
-if not firebase_admin._apps:
-    try:
-        BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-        CRED_PATH = os.path.join(BASE_DIR, "firebase-credentials.json")
-        cred = credentials.Certificate(CRED_PATH)
-        firebase_admin.initialize_app(cred, {
-            'storageBucket': os.getenv("FIREBASE_STORAGE_BUCKET")
-        })
-        print("Firebase Admin SDK initialized by worker.")
-    except Exception as e:
-        print(f"!!! CRITICAL: Worker failed to initialize Firebase: {e} !!!")
-
+RSS_FEEDS = [
+    'http://feeds.bbci.co.uk/news/world/rss.xml',
+    'https://timesofindia.indiatimes.com/rssfeedstopstories.cms',
+    'https://news.google.com/rss?gl=IN&hl=en-IN&ceid=IN:en',
+    'http://rss.cnn.com/rss/edition.rss',
+    'https://www.aljazeera.com/xml/rss/all.xml'
+]
+# A comma-separated list replaces the feeds above, e.g. to read from a local fake in benchmarks
+if os.getenv("RSS_FEEDS"):
+    RSS_FEEDS = [url.strip() for url in os.getenv("RSS_FEEDS").split(',') if url.strip()]
+# Database-only app: workers don't need the web app's routes, CORS or Firebase setup
+app = create_worker_app()
 
 ## --- STEP 1: GATHER TODAY'S HEADLINES FROM RSS ---
+@traced('rss.fetch')
 def fetch_headlines_from_rss():
     """
     Fetches headlines from RSS feeds and filters them to include only
     articles published on the current date.
     """
-    RSS_FEEDS = [
-        'http://feeds.bbci.co.uk/news/world/rss.xml',
-        'https://timesofindia.indiatimes.com/rssfeedstopstories.cms',
-        'https://news.google.com/rss?gl=IN&hl=en-IN&ceid=IN:en',
-        'http://rss.cnn.com/rss/edition.rss',
-        'https://www.aljazeera.com/xml/rss/all.xml'
-    ]
-    
     todays_headlines = []
     today = time.gmtime() # Get today's date in UTC
     
@@ -76,6 +66,7 @@ def fetch_headlines_from_rss():
     return unique_headlines
 
 ## --- STEP 2: AI CURATION OF HEADLINES ---
+@traced('headlines.select')
 def select_best_headlines_with_ai(headlines):
     """Asks the AI to act as an editor and select the best headlines from a list."""
     print("Asking AI editor to select the most important headlines...")
@@ -96,9 +87,8 @@ def select_best_headlines_with_ai(headlines):
     You MUST respond with ONLY a valid JSON object with a single key "selected_headlines", which is an array of the {ARTICLES_TO_GENERATE} headline strings you have chosen.
     """
     try:
-        chat_completion = groq_client.chat.completions.create(
+        chat_completion = route_chat('curation',
             messages=[{"role": "user", "content": prompt}],
-            model="llama-3.3-70b-versatile",
             temperature=0.2,
             response_format={"type": "json_object"},
         )
@@ -110,55 +100,7 @@ def select_best_headlines_with_ai(headlines):
         print(f"Error during AI headline selection: {e}")
         return []
 
-## --- IMAGE & PROMPT FUNCTIONS ---
-def generate_image(prompt):
-    """Calls the Fireworks.ai API to create an image."""
-    print(f"  -> Sending image generation request for: '{prompt}'")
-    try:
-        headers = {
-            "Accept": "image/jpeg", "Content-Type": "application/json",
-            "Authorization": f"Bearer {FIREWORKS_API_KEY}"
-        }
-        payload = {"prompt": f"{prompt}, cinematic, masterpiece, 8k", "height": 512, "width": 1024}
-        response = requests.post(FIREWORKS_API_URL, headers=headers, json=payload, timeout=90)
-        response.raise_for_status()
-        image_bytes = response.content
-        if image_bytes:
-            print("  -> Image generation successful.")
-            return image_bytes
-        return None
-    except requests.exceptions.RequestException as e:
-        print(f"  -> Image generation API call failed: {e}")
-        return None
-
-def upload_image_to_firebase(image_bytes, filename):
-    """Uploads image bytes to Firebase Storage."""
-    try:
-        bucket = storage.bucket()
-        blob = bucket.blob(f"images/{filename}")
-        blob.upload_from_string(image_bytes, content_type='image/jpeg')
-        blob.make_public()
-        print(f"  -> Image uploaded to Firebase: {blob.public_url}")
-        return blob.public_url
-    except Exception as e:
-        print(f"  -> Error uploading image to Firebase: {e}")
-        return None
-
-def get_random_fallback_image():
-    """Fetches a random image from Firebase Storage as a fallback."""
-    try:
-        print("--- Initiating fallback image search ---")
-        bucket = storage.bucket()
-        blobs = bucket.list_blobs(prefix='images/')
-        image_urls = [blob.public_url for blob in blobs if blob.name != 'images/']
-        if not image_urls: return None
-        random_url = random.choice(image_urls)
-        print(f"--- Fallback successful: {random_url} ---")
-        return random_url
-    except Exception as e:
-        print(f"--- Fallback failed with an error: {e} ---")
-        return None
-
+## --- PROMPT FUNCTIONS ---
 def get_news_generation_prompt(headline, keywords=None):
     """Creates a specialized prompt for generating a news article."""
     category_list = "['Technology', 'Health', 'Science', 'Business', 'Culture', 'World News', 'Travel', 'Food', 'Finance', 'Education', 'Lifestyle', 'Entertainment']"
@@ -189,62 +131,73 @@ You MUST naturally weave the following keywords into the article, especially in
     """
 
 ## --- STEP 3: FULL ARTICLE GENERATION PIPELINE ---
-def generate_article_with_groq_v2(headline):
-    """Generates and saves a news article using a dedicated, two-step Groq process."""
+@traced('keywords')
+def generate_keywords(headline):
+    keyword_prompt = get_keyword_prompt(headline)
+    keyword_completion = route_chat('keywords', messages=[{"role": "user", "content": keyword_prompt}], temperature=0.5, response_format={"type": "json_object"}, cache_ttl=llm_cache.KEYWORDS_TTL)
+    return json.loads(keyword_completion.choices[0].message.content).get("keywords", [])
+
+@traced('draft')
+def generate_draft(headline, seo_keywords):
+    prompt = get_news_generation_prompt(headline, seo_keywords)
+    chat_completion = route_chat('long_form', messages=[{"role": "user", "content": prompt}], temperature=0.6, response_format={"type": "json_object"}, cache_ttl=llm_cache.ARTICLE_TTL)
+    return json.loads(chat_completion.choices[0].message.content)
+
+@traced('db.save')
+def save_article(data):
+    """Saves the drafted article and returns its id, or marks it skipped if it already exists."""
+    slug = slugify(data['title'])
+    new_article, created = insert_article(
+        slug=slug, title=data['title'], meta_description=data['meta_description'], content=data['content'],
+        author_name=data.get('authorName'), author_bio=data.get('authorBio'), is_published=True, is_breaking_news=True
+    )
+    if not created:
+        print(f"  -> Article with slug '{slug}' already exists. Skipping.")
+        return {'article_id': new_article.id, 'skipped': True}
+
+    category_name = data.get('category')
+    if category_name:
+        new_article.categories.append(upsert_categories([category_name])[category_name])
+    
+    new_article.sync_images()
+    db.session.add(new_article)
+    db.session.commit()
+    print(f" -> Successfully saved article: '{new_article.title}'")
+    return {'article_id': new_article.id, 'skipped': False}
+
+@traced('article')
+def generate_article_with_groq_v2(headline, run):
+    """
+    Generates and saves a news article using a dedicated, two-step Groq process.
+    Every step is recorded in the run, so a rerun picks up where this one stopped.
+    """
     print(f"Initiating full pipeline for: '{headline}'")
+    current_span().set_attribute('headline', headline)
+    key = item_key(headline)
     try:
         # Step 3.1: Generate Keywords
         print(" -> Step A: Generating SEO keywords...")
-        keyword_prompt = get_keyword_prompt(headline)
-        keyword_completion = groq_client.chat.completions.create(messages=[{"role": "user", "content": keyword_prompt}], model="llama-3.1-8b-instant", temperature=0.5, response_format={"type": "json_object"})
-        seo_keywords = json.loads(keyword_completion.choices[0].message.content).get("keywords", [])
+        seo_keywords = run_step(run, f"{key}:keywords", lambda: generate_keywords(headline))
         print(f" -> Found Keywords: {seo_keywords}")
 
         # Step 3.2: Generate Article Text
         print(" -> Step B: Generating full article with keywords...")
-        prompt = get_news_generation_prompt(headline, seo_keywords)
-        chat_completion = groq_client.chat.completions.create(messages=[{"role": "user", "content": prompt}], model="llama-3.3-70b-versatile", temperature=0.6, response_format={"type": "json_object"})
-        data = json.loads(chat_completion.choices[0].message.content)
-        
-        # Step 3.3: Process Images
-        content_with_images, main_image_url = data['content'], None
-        image_placeholders = re.findall(r'\[IMAGE: (.*?)\]', content_with_images)
-        print(f" -> Step C: Found {len(image_placeholders)} image placeholders.")
-        for i, img_prompt in enumerate(image_placeholders):
-            image_url, image_bytes = None, generate_image(img_prompt)
-            if image_bytes:
-                filename = f"{slugify(data['title'])}-{time.time_ns()}-{i}.jpg"
-                image_url = upload_image_to_firebase(image_bytes, filename)
-            if not image_url:
-                image_url = get_random_fallback_image()
-            if image_url:
-                if main_image_url is None: main_image_url = image_url
-                content_with_images = content_with_images.replace(f"[IMAGE: {img_prompt}]", f"![{img_prompt}]({image_url})", 1)
-                print(f"   -> Replaced placeholder {i+1} with URL.")
-            else:
-                print(f"   -> CRITICAL: Image processing failed for '{img_prompt}'.")
-            time.sleep(5)
+        data = run_step(run, f"{key}:draft", lambda: generate_draft(headline, seo_keywords))
         
-        # Step 3.4: Save to Database
-        print(" -> Step D: Saving article to database...")
-        slug = slugify(data['title'])
-        if Article.query.filter_by(slug=slug, lang='en').first():
-            print(f"  -> Article with slug '{slug}' already exists. Skipping.")
+        # Step 3.3: Save to Database
+        print(" -> Step C: Saving article to database...")
+        saved = run_step(run, f"{key}:saved", lambda: save_article(data))
+        if saved['skipped']:
+            return None
+        new_article = Article.query.get(saved['article_id'])
+        if new_article is None:
+            print(f"  -> Article {saved['article_id']} no longer exists. Skipping.")
             return None
 
-        new_article = Article(
-            slug=slug, title=data['title'], meta_description=data['meta_description'], content=content_with_images, image_url=main_image_url,
-            author_name=data.get('authorName'), author_bio=data.get('authorBio'), is_published=True, is_breaking_news=True
-        )
-        category_name = data.get('category')
-        if category_name:
-            category = Category.query.filter_by(name=category_name).first() or Category(name=category_name, slug=slugify(category_name))
-            new_article.categories.append(category)
-        
-        db.session.add(new_article)
-        db.session.commit()
-        print(f" -> Successfully saved article: '{new_article.title}'")
-        create_and_save_translations(new_article)
+        # Step 3.4: Process Images
+        print(f" -> Step D: Found {len(new_article.images)} image placeholders.")
+        run_step(run, f"{key}:images", lambda: fill_article_images(new_article))
+        create_and_save_translations(new_article, run=run, key_prefix=key)
         
         return new_article
 
@@ -253,31 +206,40 @@ def generate_article_with_groq_v2(headline):
         return None
 
 ## --- MAIN JOB ORCHESTRATION ---
+@traced('job.breaking_news', summarize=True)
 def run_breaking_news_job():
     print("--- Starting Breaking News Job (RSS -> AI Editor -> Groq Writer) ---")
+    generated_count = 0
     with app.app_context():
-        raw_headlines = fetch_headlines_from_rss()
+        # An unfinished run from the last few hours is resumed instead of starting over
+        run = start_run('breaking_news', resume_within=datetime.timedelta(hours=6))
+        raw_headlines = run_step(run, 'headlines', fetch_headlines_from_rss)
         if not raw_headlines:
             print("No raw headlines found from RSS. Exiting job.")
+            complete_run(run)
             return
 
-        selected_headlines = select_best_headlines_with_ai(raw_headlines)
+        selected_headlines = run_step(run, 'selected', lambda: select_best_headlines_with_ai(raw_headlines))
         if not selected_headlines:
             print("AI editor did not select any headlines. Exiting job.")
+            complete_run(run)
             return
 
-        generated_count = 0
         random.shuffle(selected_headlines)
         for headline in selected_headlines:
-            if Article.query.filter(Article.title.like(f"%{headline[:50]}%")).first():
+            already_started = get_step(run, f"{item_key(headline)}:saved") is not None
+            if not already_started and Article.query.filter(Article.title.like(f"%{headline[:50]}%")).first():
                 print(f"Skipping headline as a similar article already exists: '{headline}'")
                 continue
 
-            if generate_article_with_groq_v2(headline):
+            if generate_article_with_groq_v2(headline, run):
                 generated_count += 1
-                time.sleep(20)
+                with span('pacing'):
+                    time.sleep(20)
             else:
-                time.sleep(5)
+                with span('pacing'):
+                    time.sleep(5)
+        complete_run(run) # Stays open when a step failed, so the next run retries it
     print(f"--- Breaking News Job Finished. Generated {generated_count} articles. ---")
     
 if __name__ == '__main__':
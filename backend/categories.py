@@ -0,0 +1,64 @@
+# /backend/categories.py
+"""
+The category list with article counts, cached in each process.
+
+/api/categories is on every page of the frontend. The list and its counts
+come from category_stats (see persistence.py) with two queries, at most
+once per CATEGORY_CACHE_TTL seconds. A commit in this process that changes
+category_stats clears the cache right away; other processes pick the change
+up when their copy expires.
+"""
+import os
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import db, Category, CategoryStat
+
+# --- CONFIGURATION ---
+CACHE_TTL = int(os.getenv("CATEGORY_CACHE_TTL", "60"))
+
+_cache = {'categories': None, 'loaded_at': 0.0}
+_cache_lock = threading.Lock()
+
+
+def load_categories():
+    """Every category by name, with its published article count per language and newest article."""
+    stats = {}
+    for stat in CategoryStat.query.all():
+        stats.setdefault(stat.category_id, []).append(stat)
+    categories = []
+    for category in Category.query.order_by(Category.name.asc()).all():
+        rows = stats.get(category.id, [])
+        latest = max((row.latest_article_at for row in rows if row.latest_article_at), default=None)
+        categories.append({
+            **category.to_dict(),
+            'article_count': sum(row.published_count for row in rows),
+            'article_counts': {row.lang: row.published_count for row in rows},
+            'latest_article_at': latest.isoformat() if latest else None,
+        })
+    return categories
+
+
+def get_categories():
+    """The cached result of load_categories(). Treat it as read-only; it is shared between threads."""
+    with _cache_lock:
+        if _cache['categories'] is not None and time.monotonic() - _cache['loaded_at'] < CACHE_TTL:
+            return _cache['categories']
+    categories = load_categories()
+    with _cache_lock:
+        _cache['categories'], _cache['loaded_at'] = categories, time.monotonic()
+    return categories
+
+
+def invalidate():
+    with _cache_lock:
+        _cache['categories'] = None
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_on_change(session):
+    if session.info.pop('category_stats_changed', False):
+        invalidate()
@@ -0,0 +1,80 @@
+# /backend/change_log.py
+"""
+A log of changed articles, for jobs that keep derived files up to date
+(sitemaps and feeds in feeds.py, JSON snapshots in export.py) without
+rebuilding everything.
+
+Every commit that adds, edits, (un)publishes or deletes an article, or
+changes one of its images, adds article_changes rows in the same
+transaction (see the session hooks in persistence.py). A job reads the ids
+changed since its cursor, rebuilds what depends on them and then moves its
+cursor, so a crash part way through only means the same ids are read again.
+
+Ids are drawn just before commit, so a transaction can commit a lower id
+than one already visible. Changes younger than SETTLE_SECONDS are left for
+the next run, so the cursor never moves past one still being committed.
+"""
+import datetime
+
+from sqlalchemy import func
+
+from models import db, ArticleChange, ChangeCursor
+
+SETTLE_SECONDS = 5
+# Every job that reads the log (feeds.CONSUMER, export.CONSUMER). prune()
+# keeps all changes until each of them has a cursor, so one that hasn't run yet
+# still gets the history from the first change.
+CONSUMERS = ('feeds', 'export')
+
+
+def log_changes(session, article_ids):
+    """Adds a change row per article id; called by the commit hook in persistence.py."""
+    now = datetime.datetime.now(datetime.timezone.utc)
+    session.execute(ArticleChange.__table__.insert(),
+                    [{'article_id': article_id, 'changed_at': now} for article_id in sorted(article_ids)])
+
+
+def read_changes(consumer, limit=None):
+    """
+    Returns (article ids, last change id) for the changes the consumer hasn't
+    processed yet, oldest first. Pass the last change id to advance() when done.
+    """
+    cursor = db.session.get(ChangeCursor, consumer)
+    after = cursor.last_change_id if cursor else 0
+    settled = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=SETTLE_SECONDS)
+    query = db.session.query(ArticleChange.id, ArticleChange.article_id)\
+        .filter(ArticleChange.id > after, ArticleChange.changed_at <= settled)\
+        .order_by(ArticleChange.id)
+    if limit:
+        query = query.limit(limit)
+    rows = query.all()
+    if not rows:
+        return set(), after
+    return {article_id for _, article_id in rows}, rows[-1][0]
+
+
+def advance(consumer, last_change_id):
+    """Marks every change up to last_change_id as processed by the consumer, and commits."""
+    cursor = db.session.get(ChangeCursor, consumer)
+    if cursor is None:
+        db.session.add(ChangeCursor(consumer=consumer, last_change_id=last_change_id))
+    elif last_change_id > cursor.last_change_id:
+        cursor.last_change_id = last_change_id
+    db.session.commit()
+
+
+def latest_change_id():
+    return db.session.query(func.max(ArticleChange.id)).scalar() or 0
+
+
+def prune():
+    """Deletes the changes every consumer has processed. Returns the number of rows deleted."""
+    cursors = dict(db.session.query(ChangeCursor.consumer, ChangeCursor.last_change_id))
+    waiting = [consumer for consumer in CONSUMERS if consumer not in cursors]
+    if waiting:
+        print(f"Not pruning the change log: {', '.join(waiting)} hasn't run yet.")
+        return 0
+    oldest = min(cursors.values())
+    deleted = ArticleChange.query.filter(ArticleChange.id <= oldest).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
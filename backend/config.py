@@ -0,0 +1,64 @@
+# /backend/config.py
+"""
+Settings for the web app and the workers, read from the environment.
+
+Workers and scripts use create_worker_app(), a bare Flask app with only the
+database bound, so they can use the models without importing the web app.
+"""
+import os
+
+from dotenv import load_dotenv
+from flask import Flask
+
+from db_pool import engine_options
+from db_routing import replica_binds
+from models import db
+
+load_dotenv()
+
+
+class Config:
+    SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL')
+    # Pool size, timeouts and PgBouncer mode come from the DB_* variables (see db_pool.py)
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Comma-separated read replica URLs for the public read endpoints (see db_routing.py)
+    SQLALCHEMY_BINDS = replica_binds(os.getenv("DATABASE_REPLICA_URLS"))
+    REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+    REPLICA_CHECK_SECONDS = float(os.getenv("REPLICA_CHECK_SECONDS", "5"))
+
+    FRONTEND_URL = os.getenv("FRONTEND_URL")
+    ADMIN_SECRET_KEY = os.getenv("ADMIN_SECRET_KEY")
+
+    # Generation requests one process serves at once; unset means no cap (see app.generation_slot)
+    GENERATION_SLOTS = int(os.getenv("GENERATION_SLOTS")) if os.getenv("GENERATION_SLOTS") else None
+
+    # Per-request timings, /api/metrics, slow query logs and the X-Profile profiler (see instrumentation.py)
+    INSTRUMENTATION_ENABLED = os.getenv("INSTRUMENTATION_ENABLED", "false").lower() == "true"
+    SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+    PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles"))
+    PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+
+    # db.create_all() costs a round trip per table on every start, so tables come
+    # from migrations (flask db upgrade on deploy). Only the dev server
+    # (FLASK_DEBUG or python app.py) creates them by default.
+    CREATE_TABLES_ON_STARTUP = os.getenv("CREATE_TABLES_ON_STARTUP", os.getenv("FLASK_DEBUG", "false")).lower() in ("true", "1")
+
+
+def load_config(app, config=None):
+    """Applies Config, then any overrides given as a dict."""
+    app.config.from_object(Config)
+    if config:
+        app.config.from_mapping(config)
+        if 'SQLALCHEMY_DATABASE_URI' in config and 'SQLALCHEMY_ENGINE_OPTIONS' not in config:
+            # The pool options depend on the database, e.g. none for in-memory SQLite
+            app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(config['SQLALCHEMY_DATABASE_URI'])
+
+
+def create_worker_app(config=None):
+    """Returns a minimal app for workers: no routes, CORS, Firebase or table creation."""
+    app = Flask(__name__)
+    load_config(app, config)
+    db.init_app(app)
+    return app
@@ -1,11 +1,10 @@
 # /backend/daily_content_worker.py
 import os
-import requests
 import time
 import json
 from slugify import slugify
-import random
-from groq import Groq
+import providers
+from model_router import route_chat
 
 # --- CONFIGURATION ---
 
@@ -37,10 +36,6 @@ TOPICS_PER_REGION = 3
 
 # The public URL of your live Render backend's generation endpoint
 GENERATION_API_URL = os.getenv("GENERATION_API_URL")
-LIBRETRANSLATE_API_URL = "https://libretranslate.de/translate"
-
-# --- SETUP ---
-groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))
 
 # --- FUNCTIONS ---
 
@@ -57,9 +52,8 @@ def get_ai_generated_topics_for_region(country_name):
         You MUST respond with ONLY a valid JSON array of {TOPICS_PER_REGION} strings and nothing else.
         Example format: ["Topic 1", "Topic 2", "Topic 3"]
         """
-        chat_completion = groq_client.chat.completions.create(
+        chat_completion = route_chat('topics',
             messages=[{"role": "user", "content": prompt}],
-            model="llama-3.1-8b-instant",
             temperature=1.2,
             response_format={"type": "json_object"},
         )
@@ -96,29 +90,23 @@ def generate_initial_article(keyword, language_code):
     print(f"   - Generating article for: '{keyword}' in language '{language_code}'...")
     try:
         query_with_lang = f"{keyword} (write in {language_code})"
-        response = requests.post(GENERATION_API_URL, json={'query': query_with_lang}, timeout=300)
-        response.raise_for_status()
+        response = providers.post('backend', GENERATION_API_URL, json={'query': query_with_lang})
         print("     - Article generated successfully.")
         return response.json()
-    except requests.exceptions.RequestException as e:
+    except providers.ProviderError as e:
         print(f"     - Error generating article: {e}")
         return None
 
 def translate_text(text, target_language, source_language):
-    """Translates text using LibreTranslate with a polite delay."""
+    """Translates text using LibreTranslate; the provider client keeps a polite gap between calls."""
     if not text or source_language == target_language:
         return text
     
-    time.sleep(1 + random.random()) # Polite 1-2 second delay
-    
     print(f"       - Translating from '{source_language}' to '{target_language}'...")
-    payload = {'q': text, 'source': source_language, 'target': target_language, 'format': 'text'}
     
     try:
-        response = requests.post(LIBRETRANSLATE_API_URL, json=payload, timeout=60)
-        response.raise_for_status()
-        return response.json().get('translatedText', text)
-    except requests.exceptions.RequestException as e:
+        return providers.translate(text, target_language, source_language) or text
+    except providers.ProviderError as e:
         print(f"         - Translation failed: {e}. Returning original text.")
         return text # Return original on failure
 
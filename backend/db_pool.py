@@ -0,0 +1,100 @@
+# /backend/db_pool.py
+"""
+Connection pool settings, read from the environment.
+
+    DB_POOL             'queue' (default) keeps up to DB_POOL_SIZE connections
+                        open per process; 'null' opens one per checkout and
+                        closes it after, for when a pooler like PgBouncer
+                        already holds the server connections
+    DB_POOL_SIZE        connections kept open (gunicorn.conf.py sets it to the thread count)
+    DB_MAX_OVERFLOW     extra connections allowed under bursts, closed when returned
+    DB_POOL_TIMEOUT     seconds a checkout waits for a free connection before failing
+    DB_POOL_RECYCLE     seconds before an idle connection is replaced
+    DB_POOL_PRE_PING    test each connection on checkout (one round trip per request)
+    DB_PGBOUNCER        'true' when DATABASE_URL points at PgBouncer in transaction
+                        mode: the pool defaults to 'null' and drivers that would
+                        prepare statements server-side (psycopg 3) don't, since
+                        the next transaction may run on another server connection
+
+Checkouts are timed, so waiting on a full pool shows up in the metrics
+(see instrumentation.py) instead of as unexplained request latency.
+"""
+import os
+import time
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import NullPool, QueuePool
+
+_checkout_observers = []
+
+
+def add_checkout_observer(observer):
+    """Registers observer(seconds, ok), called after every pool checkout."""
+    if observer not in _checkout_observers:
+        _checkout_observers.append(observer)
+
+
+def _notify(started, ok):
+    elapsed = time.perf_counter() - started
+    for observer in _checkout_observers:
+        try:
+            observer(elapsed, ok)
+        except Exception as e:
+            print(f"Pool checkout observer failed: {e}")
+
+
+class _TimedCheckout:
+    """Times getting a connection from the pool, including opening a new one."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except BaseException:
+            _notify(started, False)
+            raise
+        _notify(started, True)
+        return connection
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class TimedNullPool(_TimedCheckout, NullPool):
+    pass
+
+
+def _env_flag(name, default):
+    return os.getenv(name, default).lower() == 'true'
+
+
+def engine_options(database_url=None):
+    """SQLALCHEMY_ENGINE_OPTIONS for the primary and the replicas, from the DB_* variables."""
+    database_url = database_url or os.getenv('DATABASE_URL') or ''
+    pgbouncer = _env_flag('DB_PGBOUNCER', 'false')
+    pool = os.getenv('DB_POOL', 'null' if pgbouncer else 'queue').lower()
+
+    if database_url.startswith('sqlite') and make_url(database_url).database in (None, '', ':memory:'):
+        # Flask-SQLAlchemy keeps an in-memory SQLite database on one shared connection
+        return {}
+    if pool == 'null':
+        # A fresh connection per checkout has nothing stale to ping or recycle
+        options = {'poolclass': TimedNullPool}
+    elif pool == 'queue':
+        options = {
+            'poolclass': TimedQueuePool,
+            'pool_pre_ping': _env_flag('DB_POOL_PRE_PING', 'true'),
+            'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', '300')),
+            'pool_timeout': float(os.getenv('DB_POOL_TIMEOUT', '30')),
+        }
+        if os.getenv('DB_POOL_SIZE'):
+            options['pool_size'] = int(os.getenv('DB_POOL_SIZE'))
+            options['max_overflow'] = int(os.getenv('DB_MAX_OVERFLOW', '2'))
+    else:
+        raise ValueError(f"DB_POOL must be 'queue' or 'null', not '{pool}'.")
+
+    if pgbouncer and database_url.startswith('postgresql+psycopg:'):
+        # psycopg2 (the default driver) never prepares server-side; psycopg 3 does after 5 runs
+        options['connect_args'] = {'prepare_threshold': None}
+    return options
@@ -0,0 +1,178 @@
+# /backend/db_routing.py
+"""
+Routes the public read-only endpoints to read replicas.
+
+Replicas are listed in DATABASE_REPLICA_URLS and become the SQLALCHEMY_BINDS
+'replica_0', 'replica_1', ... No model uses them; create tables with
+db.create_all(bind_key=None), since the default connects to every bind. A
+view wrapped in @replica_reads runs its queries on one replica, chosen
+round-robin per request; its writes and locking reads (SELECT ... FOR
+UPDATE) still go to the primary. Everything else - generation, the workers,
+the admin routes - stays on the primary, and so does any request that
+carries the admin key, so an admin sees their own writes right away.
+
+A replica is skipped while it lags the primary by more than
+REPLICA_MAX_LAG_SECONDS or can't be reached; its lag is checked at most once
+per REPLICA_CHECK_SECONDS. With no usable replica, reads go to the primary.
+"""
+import functools
+import itertools
+import threading
+import time
+
+from flask import current_app, g, has_app_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, exc, text
+
+REPLICA_BIND_PREFIX = 'replica_'
+
+# 0 when the replica has replayed everything it received (an idle primary
+# doesn't make a caught-up replica look behind), else seconds since the last replayed commit.
+LAG_SQL = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+_health = {} # bind key -> {'usable': bool, 'lag': float, 'checked_at': float}
+_health_lock = threading.Lock()
+_next_replica = itertools.count()
+
+
+def replica_binds(urls):
+    """The SQLALCHEMY_BINDS for a comma-separated list of replica URLs."""
+    urls = [url.strip() for url in (urls or '').split(',') if url.strip()]
+    return {f"{REPLICA_BIND_PREFIX}{i}": url for i, url in enumerate(urls)}
+
+
+def replica_keys(app):
+    return sorted(key for key in (app.config.get('SQLALCHEMY_BINDS') or {})
+                  if key.startswith(REPLICA_BIND_PREFIX))
+
+
+def is_plain_read(clause):
+    """A SELECT without FOR UPDATE/SHARE. Writes, locking reads and raw SQL stay on the primary."""
+    return clause is not None and clause.is_select and getattr(clause, '_for_update_arg', None) is None
+
+
+class RoutingSession(Session):
+    """Sends reads to the replica picked for the current request, if any."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        key = g.get('db_replica') if has_app_context() else None
+        if key is not None and bind is None and not self._flushing and is_plain_read(clause):
+            return self._db.engines[key]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+# --- REPLICA HEALTH ---
+def measure_lag(engine):
+    """Seconds the replica is behind the primary. Only Postgres reports it; others count as current."""
+    with engine.connect() as connection:
+        if engine.dialect.name != 'postgresql':
+            connection.execute(text("SELECT 1"))
+            return 0.0
+        return float(connection.execute(LAG_SQL).scalar() or 0)
+
+
+def is_usable(app, key):
+    """Whether the replica is reachable and within the lag limit, rechecked every REPLICA_CHECK_SECONDS."""
+    now = time.monotonic()
+    with _health_lock:
+        state = _health.get(key)
+        if state and now - state['checked_at'] < app.config['REPLICA_CHECK_SECONDS']:
+            return state['usable']
+        # Claim the check so other threads keep using the last result meanwhile
+        _health[key] = dict(state or {'usable': False, 'lag': None}, checked_at=now)
+
+    from models import db
+    try:
+        lag = measure_lag(db.engines[key])
+        usable = lag <= app.config['REPLICA_MAX_LAG_SECONDS']
+        if not usable:
+            print(f"[replica] {key} is {lag:.1f}s behind the primary, reading from the primary")
+    except Exception as e:
+        lag, usable = None, False
+        print(f"[replica] {key} is unreachable, reading from the primary: {e}")
+    with _health_lock:
+        _health[key] = {'usable': usable, 'lag': lag, 'checked_at': now}
+    return usable
+
+
+def mark_unusable(key, error):
+    """Takes a replica out of rotation until its next check."""
+    with _health_lock:
+        _health[key] = {'usable': False, 'lag': None, 'checked_at': time.monotonic()}
+    print(f"[replica] {key} failed a query, reading from the primary: {error}")
+
+
+def choose_replica(app):
+    """The bind key of a usable replica, round-robin, or None for the primary."""
+    keys = replica_keys(app)
+    if not keys:
+        return None
+    start = next(_next_replica)
+    for i in range(len(keys)):
+        key = keys[(start + i) % len(keys)]
+        if is_usable(app, key):
+            return key
+    return None
+
+
+def _on_replica_error(context):
+    """
+    Engine error hook: a lost connection or another operational error on a
+    replica (e.g. a query cancelled by a recovery conflict) takes it out of rotation.
+    """
+    failed = context.is_disconnect or isinstance(context.sqlalchemy_exception, exc.OperationalError)
+    if failed and has_app_context() and g.get('db_replica'):
+        g.replica_failed = True
+        mark_unusable(g.db_replica, context.original_exception)
+
+
+# --- VIEWS ---
+def replica_reads(view):
+    """
+    Runs a read-only view against a replica. If the replica fails mid-request,
+    or the view answers 404 (the row may not have replicated yet), the view
+    runs again on the primary.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        app = current_app._get_current_object()
+        admin_key = app.config.get('ADMIN_SECRET_KEY')
+        if admin_key and request.headers.get('x-admin-secret-key') == admin_key:
+            return view(*args, **kwargs)
+        key = choose_replica(app)
+        if key is None:
+            return view(*args, **kwargs)
+
+        from models import db
+        g.db_replica = key
+        try:
+            response = app.make_response(view(*args, **kwargs))
+        except Exception as e:
+            if not g.get('replica_failed'):
+                raise
+            response = None
+            print(f"[replica] Retrying {request.path} on the primary after: {e}")
+        finally:
+            g.pop('db_replica', None)
+        if response is not None and not g.get('replica_failed') and response.status_code != 404:
+            return response
+        g.pop('replica_failed', None)
+        db.session.rollback() # Leave the replica's connection before rerunning on the primary
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def init_app(app):
+    """Hooks connection failures on the replica engines. Call after db.init_app()."""
+    from models import db
+    with app.app_context():
+        for key in replica_keys(app):
+            engine = db.engines[key]
+            if not event.contains(engine, 'handle_error', _on_replica_error):
+                event.listen(engine, 'handle_error', _on_replica_error)
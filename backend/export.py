@@ -0,0 +1,317 @@
+# /backend/export.py
+"""
+Static snapshots of the public API, for serving from a CDN or bucket.
+
+    python export.py                # export what changed since the last run (cron, every minute or so)
+    python export.py --full         # export everything
+    python export.py --workers 8    # parallel workers (EXPORT_WORKERS, default 4)
+
+Articles barely change once their images are filled in, yet each view costs
+a Flask and Postgres round trip. This writes the same JSON the read
+endpoints return, serialized once, to EXPORT_TARGET:
+
+  articles/<lang>/<slug>.json     /api/get-article/<slug>, per language
+  articles/page-<n>.json          /api/articles?page=<n> (the first EXPORT_LIST_PAGES pages)
+  articles/all.json               /api/articles?all=true
+  articles/breaking.json          /api/articles/breaking
+  categories.json                 /api/categories
+  categories/<slug>.json          /api/articles/category/<slug>
+
+Each file is written as is, gzipped (.gz) and, when the brotli package is
+installed, as brotli (.br). A web server or CDN then serves the copy that
+matches Accept-Encoding, e.g. nginx with gzip_static and brotli_static.
+EXPORT_TARGET is a directory (default backend/snapshots), or 'storage' for
+the STORAGE_BACKEND bucket under snapshots/. In a bucket, the .gz and .br
+objects carry their Content-Encoding.
+
+Runs are incremental: the articles changed since the last run (change_log.py)
+are rewritten or removed, along with the category pages they are on and the
+lists. A manifest of what was written (EXPORT_MANIFEST) holds a hash per
+file, so unchanged files are never uploaded again, the categories of every
+exported article, so removals reach the right pages, and the list entry of
+every published article, so the lists are updated from the changed articles
+alone. Without the manifest, run --full.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from flask import current_app
+from sqlalchemy.orm import defer, selectinload
+
+import change_log
+from categories import load_categories
+from models import db, Article, Category, article_categories
+from storage import LocalStorage, get_storage
+
+# --- CONFIGURATION ---
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+EXPORT_TARGET = os.getenv("EXPORT_TARGET", os.path.join(BASE_DIR, "snapshots")) # a directory, or 'storage'
+EXPORT_PREFIX = "snapshots/" # Key prefix in the storage bucket
+MANIFEST_PATH = os.getenv("EXPORT_MANIFEST", os.path.join(BASE_DIR, "snapshots-manifest.json"))
+CACHE_CONTROL = os.getenv("EXPORT_CACHE_CONTROL", "public, max-age=60, stale-while-revalidate=600")
+BROTLI_QUALITY = int(os.getenv("EXPORT_BROTLI_QUALITY", "11"))
+LARGE_FILE_QUALITY = 9 # Over LARGE_FILE_BYTES, quality 11 takes seconds per MB for a few % smaller files
+LARGE_FILE_BYTES = 1024 * 1024
+WORKERS = int(os.getenv("EXPORT_WORKERS", "4"))
+LIST_PAGES = int(os.getenv("EXPORT_LIST_PAGES", "10"))
+PAGE_SIZE = 10 # The default limit of /api/articles
+BREAKING_LIMIT = 5 # The default limit of /api/articles/breaking
+CHUNK_SIZE = 200 # Articles per worker task
+CONSUMER = 'export'
+ENCODINGS = ('', '.gz', '.br')
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+_process_pool = None
+_pool_lock = threading.Lock()
+
+# What Article.to_dict() reads, loaded in a few queries per batch instead of several per article
+ARTICLE_OPTIONS = (selectinload(Article.translations), selectinload(Article.images), selectinload(Article.archive))
+
+
+def category_articles(category):
+    """The published articles of a category, ready for to_dict()."""
+    return Article.query.join(article_categories)\
+        .filter(article_categories.c.category_id == category.id, Article.is_published == True)\
+        .options(*ARTICLE_OPTIONS)\
+        .order_by(Article.id)\
+        .all()
+
+
+# --- FILES ---
+def compress_copies(data):
+    """
+    The gzip and brotli copies of some JSON, as [(extension, bytes, content
+    encoding)]. Runs inside the process pool: brotli holds the GIL while it works.
+    """
+    copies = [('.gz', gzip.compress(data, 9, mtime=0), 'gzip')]
+    if brotli is not None:
+        quality = BROTLI_QUALITY if len(data) <= LARGE_FILE_BYTES else min(BROTLI_QUALITY, LARGE_FILE_QUALITY)
+        copies.append(('.br', brotli.compress(data, quality=quality), 'br'))
+    return copies
+
+
+def _get_process_pool(workers=WORKERS):
+    global _process_pool
+    with _pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(max_workers=max(1, workers))
+        return _process_pool
+
+
+class Target:
+    """Where snapshots go: a LocalStorage directory or the storage bucket, and the manifest of what is there."""
+
+    def __init__(self, target=EXPORT_TARGET, manifest_path=MANIFEST_PATH, workers=WORKERS):
+        if target == 'storage':
+            self.storage, self.prefix = get_storage(), EXPORT_PREFIX
+        else:
+            self.storage, self.prefix = LocalStorage(root=target), ''
+        self.manifest_path = manifest_path
+        self.workers = workers
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            manifest = {}
+        self.files = manifest.get('files', {}) # key -> sha256 of the JSON
+        self.articles = manifest.get('articles', {}) # article id (str) -> {'key', 'categories'}
+        self.list_entries = manifest.get('list') # article id (str) -> to_list_dict() of every published article
+
+    def publish(self, key, payload):
+        """Writes the payload and its compressed copies unless the same JSON is there already. Returns its hash."""
+        # Serialized the way jsonify() does outside debug mode, so the bytes match the API
+        data = (current_app.json.dumps(payload, separators=(',', ':')) + '\n').encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        if self.files.get(key) == digest:
+            return digest
+        copies = _get_process_pool(self.workers).submit(compress_copies, data).result()
+        for extension, body, encoding in [('', data, None)] + copies:
+            self.storage.put(self.prefix + key + extension, body, 'application/json',
+                             cache_control=CACHE_CONTROL, content_encoding=encoding)
+        return digest
+
+    def remove(self, key):
+        for extension in ENCODINGS:
+            self.storage.delete(self.prefix + key + extension)
+        self.files.pop(key, None)
+
+    def save_manifest(self):
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'files': self.files, 'articles': self.articles, 'list': self.list_entries}, f)
+        os.replace(tmp_path, self.manifest_path)
+
+
+def article_key(article):
+    return f"articles/{article.lang}/{article.slug}.json"
+
+
+def category_key(category):
+    return f"categories/{category.slug}.json"
+
+
+# --- WORKERS ---
+def _export_articles(app, target, article_ids):
+    """Exports a batch of published articles. Returns {id: (key, category ids, hash)}."""
+    with app.app_context():
+        results = {}
+        articles = Article.query.filter(Article.id.in_(article_ids), Article.is_published == True)\
+            .options(*ARTICLE_OPTIONS).all()
+        for article in articles:
+            key = article_key(article)
+            results[article.id] = (key, [category.id for category in article.categories],
+                                   target.publish(key, article.to_dict()))
+        return results
+
+
+def _export_category(app, target, category_id):
+    """Exports a category page. Returns (key, hash), or None if the category is gone."""
+    with app.app_context():
+        category = db.session.get(Category, category_id)
+        if category is None:
+            return None
+        payload = {"category": category.to_dict(), "articles": [a.to_dict() for a in category_articles(category)]}
+        return category_key(category), target.publish(category_key(category), payload)
+
+
+def list_entries(target, changed=None):
+    """
+    The list form of every published article, kept in the manifest. With the
+    changed article ids, only those are reloaded; otherwise (or without a
+    manifest) all of them are.
+    """
+    query = Article.query.filter_by(is_published=True).options(defer(Article._content))
+    if changed is None or target.list_entries is None:
+        entries = {}
+    else:
+        entries = dict(target.list_entries)
+        for article_id in changed:
+            entries.pop(str(article_id), None)
+        query = query.filter(Article.id.in_(changed))
+    for article in query:
+        entries[str(article.id)] = article.to_list_dict()
+    target.list_entries = entries
+    return entries
+
+
+def export_lists(target, changed=None):
+    """The article lists and categories, updated for the changed article ids (all when None). Returns {key: hash}."""
+    written = {}
+    articles = sorted(list_entries(target, changed).values(), key=lambda entry: entry['id'], reverse=True)
+    for page in range(1, LIST_PAGES + 1):
+        key = f"articles/page-{page}.json"
+        items = articles[(page - 1) * PAGE_SIZE:page * PAGE_SIZE]
+        if not items and page > 1:
+            if key in target.files: # Fewer articles than at the last run
+                target.remove(key)
+            continue
+        written[key] = target.publish(key, {"articles": items, "has_more": len(articles) > page * PAGE_SIZE})
+    written["articles/all.json"] = target.publish("articles/all.json", {"articles": articles, "has_more": False})
+    breaking = Article.query.filter_by(is_published=True, is_breaking_news=True).options(defer(Article._content))\
+        .order_by(Article.id.desc()).limit(BREAKING_LIMIT)
+    written["articles/breaking.json"] = target.publish("articles/breaking.json", [a.to_list_dict() for a in breaking])
+    written["categories.json"] = target.publish("categories.json", load_categories())
+    return written
+
+
+# --- EXPORT ---
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def export(full=False, workers=WORKERS, target=None):
+    """Exports what changed since the last run (everything with full=True). Returns the number of articles written."""
+    started = time.perf_counter()
+    app = current_app._get_current_object()
+    target = target or Target(workers=workers)
+    if full:
+        changed, last_change = None, change_log.latest_change_id()
+    else:
+        changed, last_change = change_log.read_changes(CONSUMER)
+        if not changed:
+            print("Snapshots are up to date.")
+            return 0
+
+    # Articles to write: the published ones among the changed, plus the originals
+    # of changed translations, whose files list their translations
+    query = db.session.query(Article.id, Article.original_article_id, Article.is_published)
+    if changed is not None:
+        query = query.filter(Article.id.in_(changed))
+    rows = query.all()
+    publish_ids = {row.id for row in rows if row.is_published}
+    publish_ids.update(row.original_article_id for row in rows if row.original_article_id)
+    gone = set(target.articles) - {str(i) for i in publish_ids} if changed is None else \
+        {str(i) for i in changed} - {str(row.id) for row in rows if row.is_published}
+
+    category_ids = set()
+    for article_id in gone:
+        entry = target.articles.pop(article_id, None)
+        if entry:
+            target.remove(entry['key'])
+            category_ids.update(entry['categories'])
+
+    written = set()
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='export') as executor:
+        futures = [executor.submit(_export_articles, app, target, chunk)
+                   for chunk in _chunks(sorted(publish_ids), CHUNK_SIZE)]
+        for future in as_completed(futures):
+            for article_id, (key, categories, digest) in future.result().items():
+                previous = target.articles.get(str(article_id))
+                if previous:
+                    category_ids.update(previous['categories'])
+                    if previous['key'] != key: # A new slug
+                        target.remove(previous['key'])
+                category_ids.update(categories)
+                target.articles[str(article_id)] = {'key': key, 'categories': categories}
+                target.files[key] = digest
+                written.add(key)
+
+        if changed is None:
+            category_ids = {category_id for (category_id,) in db.session.query(Category.id)}
+        futures = [executor.submit(_export_category, app, target, category_id) for category_id in sorted(category_ids)]
+        for future in as_completed(futures):
+            result = future.result()
+            if result:
+                target.files[result[0]] = result[1]
+                written.add(result[0])
+
+    for key, digest in export_lists(target, None if changed is None else set(changed) | publish_ids).items():
+        target.files[key] = digest
+        written.add(key)
+
+    if changed is None:
+        # Files of categories, slugs or list pages that no longer exist
+        for key in set(target.files) - written:
+            target.remove(key)
+    target.save_manifest()
+    change_log.advance(CONSUMER, last_change)
+    if brotli is None:
+        print("  (brotli is not installed, so no .br copies were written. Run: pip install brotli)")
+    print(f"Exported {len(publish_ids)} articles, removed {len(gone)}, "
+          f"rewrote {len(category_ids)} category pages and the lists in {time.perf_counter() - started:.1f}s.")
+    return len(publish_ids)
+
+
+if __name__ == '__main__':
+    from config import create_worker_app
+
+    parser = argparse.ArgumentParser(description="Writes static JSON snapshots of published articles and lists.")
+    parser.add_argument('--full', action='store_true', help="export everything, not just what changed")
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    parser.add_argument('--target', default=EXPORT_TARGET, help="a directory, or 'storage' for the storage bucket")
+    args = parser.parse_args()
+
+    with create_worker_app().app_context():
+        export(full=args.full, workers=args.workers, target=Target(args.target, workers=args.workers))
+        change_log.prune()
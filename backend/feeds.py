@@ -0,0 +1,331 @@
+# /backend/feeds.py
+"""
+Sitemaps and RSS/Atom feeds, written ahead of time as static files.
+
+    python feeds.py            # rebuild what changed since the last run (cron, every few minutes)
+    python feeds.py --full     # rebuild everything
+
+Files go to FEEDS_DIR, each with a gzip copy next to it (file.xml.gz):
+  - sitemap.xml: the index of the shards below
+  - sitemap-N.xml: published articles with ids N*50000 to N*50000+49999 (at
+    most the 50,000 URLs a sitemap may hold), each with hreflang links to
+    its other languages
+  - feeds/<lang>/rss.xml, feeds/<lang>/atom.xml: the newest articles in a language
+  - feeds/<lang>/category/<slug>/rss.xml (and atom.xml): the same per category
+
+Runs are incremental: the articles changed since the last run (change_log.py)
+decide which shards and feeds are rewritten. A manifest (FEEDS_MANIFEST) keeps
+the language and categories of every published article as of the last run,
+so the feeds an article has just left, by a recategorization, an unpublish
+or a delete, are rewritten too. Without the manifest, a run rebuilds everything. A file whose content didn't
+change is left alone, so its ETag stays valid. The app serves the files at
+/sitemap.xml, /sitemap-N.xml and /feeds/..., or point nginx at FEEDS_DIR
+with gzip_static on.
+"""
+import argparse
+import collections
+import datetime
+import gzip
+import json
+import os
+import time
+from email.utils import format_datetime
+from xml.sax.saxutils import escape, quoteattr
+
+from sqlalchemy import or_
+
+import change_log
+from models import db, Article, Category, article_categories
+
+# --- CONFIGURATION ---
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+FEEDS_DIR = os.getenv("FEEDS_DIR", os.path.join(BASE_DIR, "static_feeds"))
+MANIFEST_PATH = os.getenv("FEEDS_MANIFEST", os.path.join(BASE_DIR, "feeds-manifest.json"))
+SITE_URL = (os.getenv("SITE_URL") or os.getenv("FRONTEND_URL") or "http://localhost:3000").rstrip('/')
+ARTICLE_PATH = os.getenv("ARTICLE_URL_PATH", "/blog/{slug}")
+CATEGORY_PATH = os.getenv("CATEGORY_URL_PATH", "/category/{slug}")
+SITE_TITLE = os.getenv("SITE_TITLE", "AI Blog")
+URLS_PER_SITEMAP = 50000
+FEED_ITEMS = 50
+CACHE_CONTROL = "public, max-age=300" # Feeds change every few minutes at most
+CONSUMER = 'feeds'
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def article_url(slug):
+    return SITE_URL + ARTICLE_PATH.format(slug=slug)
+
+
+def _aware(value):
+    """Timestamps from SQLite come back naive; they are stored in UTC."""
+    if value is None:
+        return EPOCH
+    return value if value.tzinfo else value.replace(tzinfo=datetime.timezone.utc)
+
+
+# --- FILES ---
+def write_file(relative_path, content):
+    """
+    Writes content and a gzip copy atomically. Returns False, touching
+    nothing, when the file already holds exactly this content.
+    """
+    path = os.path.join(FEEDS_DIR, relative_path)
+    data = content.encode('utf-8')
+    try:
+        with open(path, 'rb') as f:
+            if f.read() == data:
+                return False
+    except FileNotFoundError:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    for target, payload in ((path + '.gz', gzip.compress(data, 9, mtime=0)), (path, data)):
+        with open(target + '.tmp', 'wb') as f:
+            f.write(payload)
+        os.replace(target + '.tmp', target)
+    return True
+
+
+def remove_file(relative_path):
+    path = os.path.join(FEEDS_DIR, relative_path)
+    for target in (path, path + '.gz'):
+        if os.path.exists(target):
+            os.remove(target)
+
+
+# --- SITEMAPS ---
+def sitemap_shards():
+    """The shard numbers that exist on disk."""
+    shards = []
+    for name in os.listdir(FEEDS_DIR) if os.path.isdir(FEEDS_DIR) else []:
+        if name.startswith('sitemap-') and name.endswith('.xml'):
+            shards.append(int(name[len('sitemap-'):-len('.xml')]))
+    return sorted(shards)
+
+
+def write_sitemap_shard(shard):
+    """Rewrites one shard from the database. Returns its newest lastmod, or None when it is empty."""
+    first, last = shard * URLS_PER_SITEMAP, (shard + 1) * URLS_PER_SITEMAP - 1
+    articles = db.session.query(Article.id, Article.slug, Article.lang, Article.original_article_id,
+                                Article.created_at, Article.updated_at)\
+        .filter(Article.is_published == True, Article.id.between(first, last))\
+        .order_by(Article.id)\
+        .all()
+    if not articles:
+        remove_file(f"sitemap-{shard}.xml")
+        return None
+
+    # Every published language of each article, for the hreflang links
+    groups = {a.original_article_id or a.id for a in articles}
+    languages = collections.defaultdict(list)
+    for group_id in _chunks(sorted(groups), 1000):
+        for member in db.session.query(Article.id, Article.slug, Article.lang, Article.original_article_id)\
+                .filter(Article.is_published == True)\
+                .filter(or_(Article.id.in_(group_id), Article.original_article_id.in_(group_id))):
+            languages[member.original_article_id or member.id].append(member)
+
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+             '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9" xmlns:xhtml="http://www.w3.org/1999/xhtml">']
+    newest = EPOCH
+    for a in articles:
+        lastmod = _aware(a.updated_at or a.created_at)
+        newest = max(newest, lastmod)
+        lines.append(f"  <url><loc>{escape(article_url(a.slug))}</loc><lastmod>{lastmod.date().isoformat()}</lastmod>")
+        members = languages.get(a.original_article_id or a.id, [])
+        if len(members) > 1:
+            for member in sorted(members, key=lambda m: m.lang):
+                lines.append(f'    <xhtml:link rel="alternate" hreflang={quoteattr(member.lang)} href={quoteattr(article_url(member.slug))}/>')
+            original = next((m for m in members if m.original_article_id is None), None)
+            if original:
+                lines.append(f'    <xhtml:link rel="alternate" hreflang="x-default" href={quoteattr(article_url(original.slug))}/>')
+        lines.append('  </url>')
+    lines.append('</urlset>')
+    write_file(f"sitemap-{shard}.xml", '\n'.join(lines) + '\n')
+    return newest
+
+
+def write_sitemap_index(lastmods):
+    """lastmods is {shard: newest lastmod}; shards missing from it keep the date in the current index."""
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+             '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">']
+    for shard in sitemap_shards():
+        lastmod = lastmods.get(shard) or datetime.datetime.fromtimestamp(
+            os.path.getmtime(os.path.join(FEEDS_DIR, f"sitemap-{shard}.xml")), datetime.timezone.utc)
+        lines.append(f"  <sitemap><loc>{escape(SITE_URL)}/sitemap-{shard}.xml</loc>"
+                     f"<lastmod>{lastmod.date().isoformat()}</lastmod></sitemap>")
+    lines.append('</sitemapindex>')
+    write_file("sitemap.xml", '\n'.join(lines) + '\n')
+
+
+# --- FEEDS ---
+def feed_path(lang, category_slug=None, kind='rss'):
+    base = f"feeds/{lang}" if category_slug is None else f"feeds/{lang}/category/{category_slug}"
+    return f"{base}/{kind}.xml"
+
+
+def write_feed(lang, category=None):
+    """Rewrites the RSS and Atom feeds of a language, or of one category in it."""
+    query = Article.query.filter_by(is_published=True, lang=lang)
+    if category is not None:
+        query = query.join(article_categories).filter(article_categories.c.category_id == category.id)
+    articles = query.options(db.defer(Article._content)).order_by(Article.created_at.desc(), Article.id.desc()).limit(FEED_ITEMS).all()
+    slug = category.slug if category is not None else None
+    if not articles:
+        remove_file(feed_path(lang, slug, 'rss'))
+        remove_file(feed_path(lang, slug, 'atom'))
+        return
+
+    title = f"{SITE_TITLE} - {category.name}" if category is not None else SITE_TITLE
+    link = SITE_URL + (CATEGORY_PATH.format(slug=slug) if category is not None else '/')
+    updated = max(_aware(a.updated_at or a.created_at) for a in articles)
+    rss_url, atom_url = f"{SITE_URL}/{feed_path(lang, slug, 'rss')}", f"{SITE_URL}/{feed_path(lang, slug, 'atom')}"
+
+    rss = ['<?xml version="1.0" encoding="UTF-8"?>',
+           '<rss version="2.0" xmlns:atom="http://www.w3.org/2005/Atom"><channel>',
+           f"  <title>{escape(title)}</title>", f"  <link>{escape(link)}</link>",
+           f"  <description>{escape(title)}</description>", f"  <language>{escape(lang)}</language>",
+           f"  <lastBuildDate>{format_datetime(updated)}</lastBuildDate>",
+           f'  <atom:link href={quoteattr(rss_url)} rel="self" type="application/rss+xml"/>']
+    atom = ['<?xml version="1.0" encoding="UTF-8"?>',
+            f'<feed xmlns="http://www.w3.org/2005/Atom" xml:lang={quoteattr(lang)}>',
+            f"  <title>{escape(title)}</title>", f'  <link href={quoteattr(link)}/>',
+            f'  <link rel="self" href={quoteattr(atom_url)}/>', f"  <id>{escape(atom_url)}</id>",
+            f"  <updated>{updated.isoformat()}</updated>"]
+    for a in articles:
+        url = article_url(a.slug)
+        published = _aware(a.created_at)
+        categories = ''.join(f"<category>{escape(c.name)}</category>" for c in a.categories)
+        rss.append(f"  <item><title>{escape(a.title)}</title><link>{escape(url)}</link>"
+                   f"<guid isPermaLink=\"true\">{escape(url)}</guid><pubDate>{format_datetime(published)}</pubDate>"
+                   f"<description>{escape(a.meta_description)}</description>{categories}</item>")
+        atom.append(f"  <entry><title>{escape(a.title)}</title><link href={quoteattr(url)}/><id>{escape(url)}</id>"
+                    f"<published>{published.isoformat()}</published>"
+                    f"<updated>{_aware(a.updated_at or a.created_at).isoformat()}</updated>"
+                    f"<author><name>{escape(a.author_name or SITE_TITLE)}</name></author>"
+                    f"<summary>{escape(a.meta_description)}</summary></entry>")
+    rss.append('</channel></rss>')
+    atom.append('</feed>')
+    write_file(feed_path(lang, slug, 'rss'), '\n'.join(rss) + '\n')
+    write_file(feed_path(lang, slug, 'atom'), '\n'.join(atom) + '\n')
+
+
+# --- BUILD ---
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+# --- MANIFEST ---
+def manifest_entry(lang, group_id, category_ids):
+    return {'lang': lang, 'group': group_id, 'categories': sorted(category_ids)}
+
+
+def load_manifest():
+    """{article id (str): entry} of the published articles at the last run, or None."""
+    try:
+        with open(MANIFEST_PATH) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_manifest(manifest):
+    tmp_path = MANIFEST_PATH + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+
+def full_manifest():
+    """The manifest entries of every published article, from two queries."""
+    categories = collections.defaultdict(list)
+    for article_id, category_id in db.session.query(article_categories.c.article_id, article_categories.c.category_id):
+        categories[article_id].append(category_id)
+    rows = db.session.query(Article.id, Article.lang, Article.original_article_id).filter(Article.is_published == True)
+    return {str(row.id): manifest_entry(row.lang, row.original_article_id or row.id, categories[row.id]) for row in rows}
+
+
+def affected(article_ids, manifest):
+    """
+    The sitemap shards and feeds ({lang: {category id or None}}) that the
+    changed articles appear in now or did at the last run, and updates the
+    manifest to now.
+    """
+    found = {}
+    for chunk in _chunks(sorted(article_ids), 1000):
+        for article in Article.query.options(db.defer(Article._content)).filter(Article.id.in_(chunk)):
+            found[article.id] = article
+
+    entries = []
+    for article_id in article_ids:
+        previous = manifest.pop(str(article_id), None)
+        if previous:
+            entries.append(previous)
+        article = found.get(article_id)
+        if article is not None:
+            entry = manifest_entry(article.lang, article.original_article_id or article.id,
+                                   [category.id for category in article.categories])
+            entries.append(entry)
+            if article.is_published:
+                manifest[str(article_id)] = entry
+
+    shards, feeds = {article_id // URLS_PER_SITEMAP for article_id in article_ids}, collections.defaultdict(set)
+    groups = {entry['group'] for entry in entries}
+    for chunk in _chunks(sorted(groups), 1000):
+        # Translations list each other, so every member of a changed article's group is affected
+        for (member_id,) in db.session.query(Article.id).filter(or_(Article.id.in_(chunk), Article.original_article_id.in_(chunk))):
+            shards.add(member_id // URLS_PER_SITEMAP)
+    for entry in entries:
+        feeds[entry['lang']].add(None)
+        feeds[entry['lang']].update(entry['categories'])
+    return shards, feeds
+
+
+def build(full=False):
+    """Rewrites the files affected by articles changed since the last run (all with full=True)."""
+    started = time.perf_counter()
+    manifest = None if full else load_manifest()
+    if manifest is None:
+        if not full:
+            print("No feeds manifest yet, rebuilding everything.")
+        changed, last_change = None, change_log.latest_change_id()
+        shards, feeds = None, None
+        manifest = full_manifest()
+    else:
+        changed, last_change = change_log.read_changes(CONSUMER)
+        if not changed:
+            print("Sitemaps and feeds are up to date.")
+            return
+        shards, feeds = affected(changed, manifest)
+
+    if shards is None:
+        max_id = db.session.query(db.func.max(Article.id)).scalar() or 0
+        shards = set(range(max_id // URLS_PER_SITEMAP + 1)) | set(sitemap_shards())
+    lastmods = {shard: write_sitemap_shard(shard) for shard in sorted(shards)}
+    write_sitemap_index(lastmods)
+
+    categories = {category.id: category for category in Category.query.all()}
+    if feeds is None:
+        feeds = {lang: {None, *categories} for (lang,) in db.session.query(Article.lang).distinct()}
+    count = 0
+    for lang, category_ids in sorted(feeds.items()):
+        for category_id in sorted(category_ids, key=lambda c: (c is not None, c or 0)):
+            if category_id is not None and category_id not in categories:
+                continue # A deleted category
+            write_feed(lang, categories.get(category_id) if category_id is not None else None)
+            count += 1
+
+    save_manifest(manifest)
+    change_log.advance(CONSUMER, last_change)
+    print(f"Rebuilt {len(shards)} sitemap shard(s) and {count} feed(s) "
+          f"for {'all' if changed is None else len(changed)} changed articles in {time.perf_counter() - started:.1f}s.")
+
+
+if __name__ == '__main__':
+    from config import create_worker_app
+
+    parser = argparse.ArgumentParser(description="Writes sitemaps and RSS/Atom feeds to FEEDS_DIR.")
+    parser.add_argument('--full', action='store_true', help="rebuild everything, not just what changed")
+    args = parser.parse_args()
+
+    with create_worker_app().app_context():
+        build(full=args.full)
+        change_log.prune()
@@ -0,0 +1,78 @@
+# /backend/gunicorn.conf.py
+"""
+Production server settings:
+
+    gunicorn -c gunicorn.conf.py app:app
+
+The generation endpoints (/api/generate-*) spend 60-300s waiting on Groq and
+Fireworks. With sync workers a few of them occupy every worker and reads stall.
+Workers here are threaded (gthread): a thread waiting on a provider costs
+almost nothing, and the GIL is released while it waits.
+
+SERVER_ROLE picks a profile:
+  - all (default): one pool serves everything. Each worker caps in-flight
+    generations at GENERATION_SLOTS, so some threads are always left for readers.
+  - reader / generation: run two pools and send /api/generate-* to the second
+    one from the proxy, e.g.
+        SERVER_ROLE=reader     PORT=8000 gunicorn -c gunicorn.conf.py app:app
+        SERVER_ROLE=generation PORT=8001 gunicorn -c gunicorn.conf.py app:app
+    and in nginx: location /api/generate- { proxy_pass http://127.0.0.1:8001; }
+
+WEB_CONCURRENCY and GUNICORN_THREADS override the worker and thread counts.
+"""
+import multiprocessing
+import os
+
+ROLE = os.getenv("SERVER_ROLE", "all")
+
+# workers, threads per worker, generation slots per worker, graceful timeout (s), max_requests
+PROFILES = {
+    'all':        {'workers': min(multiprocessing.cpu_count() * 2 + 1, 4), 'threads': 8,
+                   'generation_slots': 4, 'graceful_timeout': 330, 'max_requests': 1000},
+    'reader':     {'workers': multiprocessing.cpu_count() * 2 + 1, 'threads': 4,
+                   'generation_slots': 0, 'graceful_timeout': 30, 'max_requests': 2000},
+    'generation': {'workers': 2, 'threads': 16,
+                   'generation_slots': 16, 'graceful_timeout': 330, 'max_requests': 200},
+}
+profile = PROFILES[ROLE]
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5001')}"
+worker_class = 'gthread'
+workers = int(os.getenv("WEB_CONCURRENCY", profile['workers']))
+threads = int(os.getenv("GUNICORN_THREADS", profile['threads']))
+
+# With gthread the worker heartbeat runs on its own loop, so this only catches
+# a truly hung worker; long provider calls do not trip it.
+timeout = 60
+# On restart or recycling, let in-flight generations finish (the backend allows 300s)
+graceful_timeout = profile['graceful_timeout']
+keepalive = 5
+
+# Recycle workers now and then to bound memory growth, staggered so they don't all restart together
+max_requests = profile['max_requests']
+max_requests_jitter = max_requests // 10
+
+# Build the app once in the master; workers fork with the imports already done
+preload_app = True
+
+# The heartbeat file lives on tmpfs when available (Docker's /tmp can be slow disk)
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+accesslog = '-'
+errorlog = '-'
+
+# Read by config.Config when the app is loaded, so every process gets a
+# connection pool sized to its threads and the role's generation cap. Behind
+# PgBouncer (DB_PGBOUNCER=true) there is no per-process pool and these go unused.
+os.environ.setdefault("DB_POOL_SIZE", str(threads))
+os.environ.setdefault("DB_MAX_OVERFLOW", "2")
+os.environ.setdefault("GENERATION_SLOTS", str(min(profile['generation_slots'], threads)))
+
+
+def post_fork(server, worker):
+    """Drops database connections inherited from the master; each worker opens its own."""
+    from app import app as flask_app
+    from models import db
+    with flask_app.app_context():
+        db.engine.dispose(close=False)
@@ -0,0 +1,198 @@
+# /backend/image_library.py
+"""
+A library of every generated image, so near-identical prompts reuse an
+existing image instead of paying for a new Fireworks render.
+
+Each image is stored with its prompt's shingles (normalized words and word
+pairs) and a perceptual hash of its pixels. Before generating, find_reusable()
+compares the new prompt against the library by Jaccard similarity; a close
+enough match is reused. Fallbacks use the same search with a lower bar, so a
+failed render falls back to a related picture rather than a random one.
+
+Nothing here commits: changes are flushed into the caller's transaction, so
+they are saved together with the article that uses the image.
+"""
+import io
+import os
+import re
+import threading
+import time
+
+from sqlalchemy import func
+
+from models import db, LibraryImage
+from storage import get_random_fallback_image
+
+# --- CONFIGURATION ---
+# Minimum Jaccard similarity between prompts to reuse an image instead of generating one
+REUSE_THRESHOLD = float(os.getenv("IMAGE_REUSE_THRESHOLD", "0.6"))
+# Lower bar for picking a fallback when generation failed
+FALLBACK_THRESHOLD = float(os.getenv("IMAGE_FALLBACK_THRESHOLD", "0.15"))
+# Stop reusing an image once it appears this many times, so the site doesn't look repetitive
+MAX_REUSE = int(os.getenv("IMAGE_MAX_REUSE", "5"))
+# Images whose perceptual hashes differ in at most this many bits count as duplicates
+DUPLICATE_DISTANCE = 4
+# The shingle index is held in memory and reloaded after this many seconds
+INDEX_TTL = 600
+
+# Words that say nothing about what is in the picture
+STOPWORDS = {
+    'a', 'an', 'the', 'of', 'in', 'on', 'at', 'to', 'for', 'with', 'and', 'or', 'by', 'from', 'into',
+    'is', 'are', 'its', 'as', 'that', 'this', 'over', 'under', 'near', 'showing', 'shows', 'depicting',
+    'image', 'photo', 'photograph', 'picture', 'illustration', 'cinematic', 'detailed', 'realistic',
+    'photorealistic', 'high', 'quality', 'resolution', 'hd', '4k', '8k', 'style', 'shot', 'view',
+    'relevant', 'news', 'journalistic', 'professional', 'stunning', 'beautiful', 'vibrant',
+}
+
+# rows: [(id, frozenset(shingles))] of reusable images;
+# hashes: {(band, bits): [(id, phash)]} of every image, see _hash_bands()
+_index = {'loaded_at': 0, 'rows': [], 'hashes': {}}
+_index_lock = threading.Lock()
+
+
+def prompt_shingles(prompt):
+    """Normalized words and adjacent word pairs of a prompt."""
+    words = [w for w in re.findall(r'[a-z0-9]+', prompt.lower()) if w not in STOPWORDS and len(w) > 1]
+    words = [w[:-1] if len(w) > 3 and w.endswith('s') and not w.endswith('ss') else w for w in words]
+    return sorted(set(words) | {f"{a} {b}" for a, b in zip(words, words[1:])})
+
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def perceptual_hash(image_bytes):
+    """64-bit difference hash: compares neighbouring pixels of a 9x8 grayscale thumbnail."""
+    from PIL import Image
+    image = Image.open(io.BytesIO(image_bytes)).convert('L').resize((9, 8), Image.LANCZOS)
+    pixels = list(image.getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            value = (value << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    # Stored in a signed BIGINT column
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def hamming_distance(a, b):
+    return bin((a ^ b) & ((1 << 64) - 1)).count('1')
+
+
+def _hash_bands(phash):
+    """
+    Splits a hash into DUPLICATE_DISTANCE + 1 bands. Two hashes that differ in
+    at most DUPLICATE_DISTANCE bits are equal in at least one band, so only
+    images sharing a band need comparing.
+    """
+    value, bands = phash & ((1 << 64) - 1), DUPLICATE_DISTANCE + 1
+    width = -(-64 // bands)
+    return [(band, (value >> (band * width)) & ((1 << width) - 1)) for band in range(bands)]
+
+
+def _add_hash(hashes, image_id, phash):
+    for key in _hash_bands(phash):
+        hashes.setdefault(key, []).append((image_id, phash))
+
+
+def _get_index():
+    with _index_lock:
+        if time.monotonic() - _index['loaded_at'] <= INDEX_TTL:
+            return _index
+    # Loaded without holding the lock, so other threads keep using the old index meanwhile
+    rows = db.session.query(LibraryImage.id, LibraryImage.shingles, LibraryImage.use_count, LibraryImage.phash).all()
+    hashes = {}
+    for row_id, _, _, phash in rows:
+        if phash is not None:
+            _add_hash(hashes, row_id, phash)
+    reusable = [(row_id, frozenset(shingles)) for row_id, shingles, use_count, _ in rows if use_count < MAX_REUSE]
+    with _index_lock:
+        _index.update(rows=reusable, hashes=hashes, loaded_at=time.monotonic())
+        return _index
+
+
+def find_duplicate(phash):
+    """The id of a library image whose pixels are a near-duplicate of the hash, or None."""
+    hashes = _get_index()['hashes']
+    for key in _hash_bands(phash):
+        for existing_id, existing_hash in hashes.get(key, ()):
+            if hamming_distance(phash, existing_hash) <= DUPLICATE_DISTANCE:
+                return existing_id
+    return None
+
+
+def find_similar(prompt, threshold=REUSE_THRESHOLD, exclude_urls=()):
+    """Returns (image, similarity) of the closest library image above threshold, or (None, 0)."""
+    shingles = frozenset(prompt_shingles(prompt))
+    scored = sorted(((jaccard(shingles, row_shingles), row_id) for row_id, row_shingles in _get_index()['rows']), reverse=True)
+    for similarity, row_id in scored[:10]:
+        if similarity < threshold:
+            break
+        image = db.session.get(LibraryImage, row_id)
+        if image is not None and image.url not in exclude_urls and image.use_count < MAX_REUSE:
+            return image, similarity
+    return None, 0.0
+
+
+def _mark_used(image):
+    """Counts a reuse in the caller's transaction."""
+    LibraryImage.query.filter_by(id=image.id)\
+        .update({'use_count': LibraryImage.use_count + 1, 'last_used_at': func.now()}, synchronize_session=False)
+
+
+def find_reusable(prompt, exclude_urls=()):
+    """Returns a library image similar enough to stand in for prompt, counting the reuse, or None."""
+    try:
+        # A savepoint, so a failure here doesn't roll back the caller's unsaved work
+        with db.session.begin_nested():
+            image, similarity = find_similar(prompt, REUSE_THRESHOLD, exclude_urls)
+            if image is None:
+                return None
+            _mark_used(image)
+        print(f"  -> Reusing library image ({similarity:.2f} similar to '{image.prompt[:60]}').")
+        return image
+    except Exception as e:
+        print(f"  -> Image library lookup failed: {e}")
+        return None
+
+
+def add_to_library(prompt, url, image_bytes=None, variants=None):
+    """
+    Records a freshly generated image in the caller's transaction. A
+    pixel-level duplicate of an existing image is not added twice.
+    """
+    try:
+        phash = perceptual_hash(image_bytes) if image_bytes else None
+        if phash is not None:
+            duplicate_id = find_duplicate(phash)
+            if duplicate_id is not None:
+                print(f"  -> Image is a near-duplicate of library image {duplicate_id}; not adding it.")
+                return
+        with db.session.begin_nested():
+            if LibraryImage.query.filter_by(url=url).first():
+                return
+            image = LibraryImage(prompt=prompt, shingles=prompt_shingles(prompt), phash=phash, url=url, variants=variants)
+            db.session.add(image)
+        # If the caller rolls back, the id is simply not found later
+        with _index_lock:
+            _index['rows'].append((image.id, frozenset(image.shingles)))
+            if phash is not None:
+                _add_hash(_index['hashes'], image.id, phash)
+    except Exception as e:
+        print(f"  -> Could not add image to the library: {e}")
+
+
+def get_relevant_fallback_image(prompt, exclude_urls=()):
+    """The most related library image for a failed render, else any stored image. Returns (url, variants)."""
+    try:
+        with db.session.begin_nested():
+            image, similarity = find_similar(prompt, FALLBACK_THRESHOLD, exclude_urls)
+            if image is not None:
+                _mark_used(image)
+        if image is not None:
+            print(f"--- Fallback: related library image ({similarity:.2f} similar). ---")
+            return image.url, image.variants
+    except Exception as e:
+        print(f"--- Library fallback failed: {e} ---")
+    return get_random_fallback_image(), None
@@ -0,0 +1,97 @@
+# /backend/image_pipeline.py
+"""
+Fills the image placeholders of articles written by the workers.
+
+Each [IMAGE: ...] placeholder has an article_images row (see
+Article.sync_images). fill_article_images() reuses a similar library image
+where it can (image_library.py), renders the rest concurrently with
+Fireworks, stores them with their responsive variants, and falls back to a
+related library image when a render fails. Nothing here commits until the
+article's images are all settled, so a crash never leaves half of them saved.
+"""
+import providers
+from image_library import add_to_library, find_reusable, get_relevant_fallback_image
+from image_processing import process_image
+from models import db
+from providers import map_concurrently
+from storage import upload_image
+from tracing import span, traced
+
+
+@traced('image.generate')
+def generate_image(prompt):
+    """Calls the Fireworks.ai API to create an image."""
+    print(f"  -> Sending image generation request for: '{prompt}'")
+    try:
+        image_bytes = providers.generate_image(prompt)
+        print("  -> Image generation successful.")
+        return image_bytes
+    except providers.ProviderError as e:
+        print(f"  -> Image generation API call failed: {e}")
+        return None
+
+
+@traced('image.upload')
+def store_image(image_bytes):
+    """Stores image bytes under their content hash in the configured storage backend."""
+    try:
+        return upload_image(image_bytes)
+    except Exception as e:
+        print(f"  -> Error storing image: {e}")
+        return None
+
+
+@traced('image')
+def render_and_upload_image(job):
+    """Generates, stores and renders variants of one image; runs on the shared provider thread pool."""
+    slug, index, prompt = job
+    image_bytes = generate_image(prompt)
+    if image_bytes:
+        image_url = store_image(image_bytes)
+        if image_url:
+            with span('image.variants'):
+                variants = process_image(image_bytes)
+            return image_url, variants, image_bytes
+    return None, None, None
+
+
+@traced('images')
+def fill_article_images(article):
+    """
+    Fills every pending placeholder: similar images from the library are
+    reused, the rest are generated concurrently. Each one is stored on its
+    own article_images row.
+    """
+    pending = [image for image in article.images if image.status != 'ready']
+    # Don't show the same picture twice in one article
+    used_urls = {image.url for image in article.images if image.url}
+
+    def fill(image, image_url, variants):
+        image.url, image.status, image.variants = image_url, 'ready', variants
+        used_urls.add(image_url)
+        if article.image_url is None:
+            article.image_url, article.image_variants = image_url, variants
+        print(f"   -> Filled placeholder {image.index + 1} with URL.")
+
+    to_generate = []
+    for image in pending:
+        reusable = find_reusable(image.prompt, exclude_urls=used_urls)
+        if reusable is not None:
+            fill(image, reusable.url, reusable.variants)
+        else:
+            to_generate.append(image)
+
+    jobs = [(article.slug, image.index, image.prompt) for image in to_generate]
+    for image, (image_url, variants, image_bytes) in zip(to_generate, map_concurrently(render_and_upload_image, jobs)):
+        if image_url:
+            add_to_library(image.prompt, image_url, image_bytes, variants)
+        else:
+            image_url, variants = get_relevant_fallback_image(image.prompt, exclude_urls=used_urls)
+        if image_url:
+            fill(image, image_url, variants)
+        else:
+            image.status = 'failed'
+            print(f"   -> CRITICAL: Image processing failed for '{image.prompt}'.")
+    # The library updates above were only flushed; they commit with the article
+    db.session.commit()
+    return {'filled': sum(1 for image in pending if image.status == 'ready')}
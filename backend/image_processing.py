@@ -0,0 +1,133 @@
+# /backend/image_processing.py
+"""
+Turns a generated image into responsive variants: several widths in AVIF,
+WebP and JPEG, each stored through storage.py.
+
+Resizing and encoding are CPU-bound, so they run in a process pool. The web
+app hands finished images to process_image_later(), which does the work in
+the background and attaches the variants to the image row afterwards. The
+workers are batch jobs and call process_image() directly.
+
+Variants are stored as {"avif": [{"width", "height", "url"}, ...], "webp": [...], "jpeg": [...]},
+smallest first, ready to be turned into a srcset with build_srcset().
+"""
+import io
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from storage import VARIANT_PREFIX, get_storage
+
+# --- CONFIGURATION ---
+VARIANT_WIDTHS = [int(w) for w in os.getenv("IMAGE_VARIANT_WIDTHS", "320,640,1024").split(",")]
+# Pillow format name and encoder options per output format; qualities are tuned for photos
+VARIANT_FORMATS = {
+    'avif': ('AVIF', {'quality': 50, 'speed': 6}),
+    'webp': ('WEBP', {'quality': 75, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 80, 'optimize': True, 'progressive': True}),
+}
+PROCESS_WORKERS = int(os.getenv("IMAGE_PROCESS_WORKERS", "2"))
+
+_process_pool = None
+_background = None
+_pool_lock = threading.Lock()
+
+
+def build_srcset(variants, image_format='webp'):
+    """Returns a srcset string ("url 320w, url 640w") for one format, or None."""
+    entries = (variants or {}).get(image_format) or []
+    return ", ".join(f"{v['url']} {v['width']}w" for v in entries) or None
+
+
+def render_variants(image_bytes, widths=None, formats=None):
+    """
+    Resizes and encodes one image. Runs inside the process pool, so it only
+    takes and returns plain bytes. Returns [(format, width, height, bytes)].
+    """
+    from PIL import Image, features
+
+    widths = widths or VARIANT_WIDTHS
+    formats = formats or list(VARIANT_FORMATS)
+
+    source = Image.open(io.BytesIO(image_bytes))
+    source.load()
+    if source.mode not in ('RGB', 'L'):
+        source = source.convert('RGB')
+
+    # Never upscale: widths above the original collapse into the original width
+    target_widths = sorted({min(width, source.width) for width in widths})
+    rendered = []
+    for width in target_widths:
+        height = round(source.height * width / source.width)
+        resized = source if width == source.width else source.resize((width, height), Image.LANCZOS)
+        for image_format in formats:
+            pil_format, options = VARIANT_FORMATS[image_format]
+            if image_format == 'avif' and not features.check('avif'):
+                continue # Older Pillow builds can't encode AVIF
+            buffer = io.BytesIO()
+            resized.save(buffer, pil_format, **options)
+            rendered.append((image_format, width, height, buffer.getvalue()))
+    return rendered
+
+
+def _get_process_pool():
+    global _process_pool
+    with _pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(max_workers=PROCESS_WORKERS)
+        return _process_pool
+
+
+def process_image(image_bytes):
+    """Renders and stores all variants of an image. Returns the variants dict, or None on failure."""
+    try:
+        rendered = _get_process_pool().submit(render_variants, image_bytes).result()
+        storage = get_storage()
+        variants = {}
+        for image_format, width, height, data in rendered:
+            url = storage.save(data, prefix=VARIANT_PREFIX)
+            variants.setdefault(image_format, []).append({'width': width, 'height': height, 'url': url})
+        original_size = len(image_bytes)
+        smallest = min((len(data) for *_, data in rendered), default=original_size)
+        print(f"  -> Stored {len(rendered)} image variants ({original_size // 1024}KB original, smallest {smallest // 1024}KB).")
+        return variants
+    except Exception as e:
+        print(f"  -> Image processing failed, keeping only the original: {e}")
+        return None
+
+
+def _process_and_attach(app, image_id, image_url, image_bytes):
+    variants = process_image(image_bytes)
+    if not variants:
+        return
+    from models import db, Article, ArticleImage, LibraryImage
+    from persistence import mark_articles_changed
+    with app.app_context():
+        try:
+            # Articles whose image or hero image get the variants (bulk updates skip the change log hooks)
+            changed = {article_id for (article_id,) in db.session.query(Article.id).filter_by(image_url=image_url)}
+            changed.update(article_id for (article_id,) in
+                           db.session.query(ArticleImage.article_id).filter_by(id=image_id, url=image_url))
+            # Only attach if the image still has this URL, in case it was regenerated meanwhile
+            ArticleImage.query.filter_by(id=image_id, url=image_url)\
+                .update({'variants': variants}, synchronize_session=False)
+            Article.query.filter_by(image_url=image_url)\
+                .update({'image_variants': variants}, synchronize_session=False)
+            LibraryImage.query.filter_by(url=image_url)\
+                .update({'variants': variants}, synchronize_session=False)
+            mark_articles_changed(db.session, changed)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"  -> Could not save image variants: {e}")
+        finally:
+            db.session.remove()
+
+
+def process_image_later(app, image_id, image_url, image_bytes):
+    """Processes an image in the background and attaches its variants once they are stored."""
+    global _background
+    with _pool_lock:
+        if _background is None:
+            _background = ThreadPoolExecutor(max_workers=PROCESS_WORKERS, thread_name_prefix='image-variants')
+    _background.submit(_process_and_attach, app, image_id, image_url, image_bytes)
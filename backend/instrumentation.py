@@ -0,0 +1,279 @@
+# /backend/instrumentation.py
+"""
+Opt-in request instrumentation for benchmarks and profiling.
+
+With INSTRUMENTATION_ENABLED=true:
+  - every response carries X-DB-Queries, X-DB-Time-Ms and a Server-Timing
+    header splitting the request into pool (waiting for a connection), db,
+    provider, serialize and app time, which browser dev tools show under Timing
+  - statements slower than SLOW_QUERY_MS are printed with their SQL text
+  - /api/metrics serves request, query and provider counters in the
+    Prometheus text format. Numbers are per process, so with several
+    gunicorn workers each scrape sees the worker that answered it.
+  - a request sent with an "X-Profile: 1" header (and the admin key, as for
+    the admin routes) is profiled by sampling its thread's stack every
+    PROFILE_INTERVAL_MS. The collapsed stacks are written to PROFILE_DIR as
+    <time>-<endpoint>.folded, ready for flamegraph.pl or speedscope.
+
+It is off by default and then adds no hooks at all.
+"""
+import collections
+import datetime
+import os
+import re
+import sys
+import threading
+import time
+
+from flask import g, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import event
+
+import db_pool
+import providers
+from models import db
+
+# Upper bounds in seconds of the request duration histogram
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+METRICS_HELP = {
+    'http_requests_total': ('counter', "Requests answered, by endpoint, method and status."),
+    'http_request_duration_seconds': ('histogram', "Time to produce a response, streaming excluded."),
+    'db_queries_total': ('counter', "SQL statements run while handling requests."),
+    'db_query_seconds_total': ('counter', "Time spent in SQL statements while handling requests."),
+    'db_slow_queries_total': ('counter', "SQL statements slower than SLOW_QUERY_MS."),
+    'db_pool_checkout_seconds': ('histogram', "Time to get a database connection from the pool, connecting included."),
+    'db_pool_checkout_failures_total': ('counter', "Pool checkouts that failed, e.g. timed out on a full pool."),
+    'provider_calls_total': ('counter', "Outbound provider calls by outcome, after retries."),
+    'provider_retries_total': ('counter', "Retries of outbound provider calls."),
+    'provider_call_seconds_total': ('counter', "Time spent in outbound provider calls, backoff included."),
+}
+
+
+# --- METRICS ---
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Metrics:
+    """Thread-safe counters and histograms, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = collections.Counter()
+        self.histograms = {}
+
+    def inc(self, name, value=1, **labels):
+        with self._lock:
+            self.counters[(name, tuple(sorted(labels.items())))] += value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            buckets, total = self.histograms.get(key, ([0] * len(DURATION_BUCKETS), [0.0, 0]))
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if value <= bound:
+                    buckets[i] += 1
+            total[0] += value
+            total[1] += 1
+            self.histograms[key] = (buckets, total)
+
+    @staticmethod
+    def _labels(labels, extra=()):
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs) + '}'
+
+    def render(self):
+        with self._lock:
+            counters = dict(self.counters)
+            histograms = {key: (list(b), list(t)) for key, (b, t) in self.histograms.items()}
+
+        lines = []
+        for name, (kind, help_text) in METRICS_HELP.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == 'counter':
+                for (metric, labels), value in sorted(counters.items()):
+                    if metric == name:
+                        lines.append(f"{name}{self._labels(labels)} {value:g}")
+            else:
+                for (metric, labels), (buckets, (total, count)) in sorted(histograms.items()):
+                    if metric != name:
+                        continue
+                    for bound, bucket_count in zip(DURATION_BUCKETS, buckets):
+                        lines.append(f"{name}_bucket{self._labels(labels, [('le', f'{bound:g}')])} {bucket_count}")
+                    lines.append(f"{name}_bucket{self._labels(labels, [('le', '+Inf')])} {count}")
+                    lines.append(f"{name}_sum{self._labels(labels)} {total:g}")
+                    lines.append(f"{name}_count{self._labels(labels)} {count}")
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+_settings = {'slow_query_ms': 100.0}
+
+
+# --- SQL QUERIES ---
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('query_started')
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    if elapsed * 1000 >= _settings['slow_query_ms']:
+        metrics.inc('db_slow_queries_total')
+        where = f"{request.method} {request.path}" if has_request_context() else "outside a request"
+        print(f"[slow query] {elapsed * 1000:.1f}ms {where}: {' '.join(statement.split())[:1000]}")
+    if has_request_context():
+        g.db_queries = g.get('db_queries', 0) + 1
+        g.db_time = g.get('db_time', 0.0) + elapsed
+
+
+def _record_pool_checkout(seconds, ok):
+    metrics.observe('db_pool_checkout_seconds', seconds)
+    if not ok:
+        metrics.inc('db_pool_checkout_failures_total')
+    if has_request_context():
+        g.pool_wait = g.get('pool_wait', 0.0) + seconds
+
+
+# --- PROVIDER CALLS ---
+def _record_provider_call(provider, seconds, ok, attempts):
+    metrics.inc('provider_calls_total', provider=provider, outcome='ok' if ok else 'error')
+    metrics.inc('provider_retries_total', attempts - 1, provider=provider)
+    metrics.inc('provider_call_seconds_total', seconds, provider=provider)
+    if has_request_context():
+        g.provider_time = g.get('provider_time', 0.0) + seconds
+
+
+# --- SERIALIZATION ---
+class TimedJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider, adding the time spent serializing to the request."""
+
+    def dumps(self, obj, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            if has_request_context():
+                g.serialize_time = g.get('serialize_time', 0.0) + (time.perf_counter() - started)
+
+
+# --- SAMPLING PROFILER ---
+class StackSampler:
+    """Samples one thread's stack at a fixed interval and counts the collapsed stacks."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path):
+        """Writes the stacks in the collapsed 'frame;frame;frame count' format."""
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _profiling_requested(app):
+    return (request.headers.get('X-Profile', '').lower() in ('1', 'true')
+            and request.headers.get('x-admin-secret-key') == app.config['ADMIN_SECRET_KEY'])
+
+
+def _finish_profile(app, response=None):
+    sampler = g.pop('sampler', None)
+    if sampler is None:
+        return
+    sampler.stop()
+    os.makedirs(app.config['PROFILE_DIR'], exist_ok=True)
+    endpoint = re.sub(r'[^A-Za-z0-9_.-]', '_', request.endpoint or 'unknown')
+    filename = f"{datetime.datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{endpoint}.folded"
+    sampler.write(os.path.join(app.config['PROFILE_DIR'], filename))
+    print(f"[profile] {request.method} {request.path}: {sum(sampler.stacks.values())} samples in {filename}")
+    if response is not None:
+        response.headers['X-Profile-File'] = filename
+
+
+# --- REQUEST HOOKS ---
+def init_app(app):
+    """Registers the hooks and /api/metrics if the app has INSTRUMENTATION_ENABLED."""
+    if not app.config.get('INSTRUMENTATION_ENABLED'):
+        return
+    _settings['slow_query_ms'] = app.config['SLOW_QUERY_MS']
+    with app.app_context():
+        engines = list(db.engines.values()) # The primary and any read replicas
+    for engine in engines:
+        if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    db_pool.add_checkout_observer(_record_pool_checkout)
+    providers.add_call_observer(_record_provider_call)
+    app.json = TimedJSONProvider(app)
+
+    @app.before_request
+    def start_timing():
+        g.request_started = time.perf_counter()
+        if _profiling_requested(app):
+            g.sampler = StackSampler(threading.get_ident(), app.config['PROFILE_INTERVAL_MS'] / 1000).start()
+
+    @app.after_request
+    def add_timing(response):
+        _finish_profile(app, response)
+        total = time.perf_counter() - g.get('request_started', time.perf_counter())
+        queries, db_time = g.get('db_queries', 0), g.get('db_time', 0.0)
+        provider_time, serialize_time = g.get('provider_time', 0.0), g.get('serialize_time', 0.0)
+        pool_wait = g.get('pool_wait', 0.0)
+        app_time = max(0.0, total - pool_wait - db_time - provider_time - serialize_time)
+
+        response.headers['X-DB-Queries'] = str(queries)
+        response.headers['X-DB-Time-Ms'] = f"{db_time * 1000:.1f}"
+        response.headers['Server-Timing'] = ', '.join([
+            f'pool;dur={pool_wait * 1000:.1f}',
+            f'db;dur={db_time * 1000:.1f};desc="{queries} queries"',
+            f'provider;dur={provider_time * 1000:.1f}',
+            f'serialize;dur={serialize_time * 1000:.1f}',
+            f'app;dur={app_time * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ])
+
+        endpoint = request.endpoint or 'unknown'
+        metrics.inc('http_requests_total', endpoint=endpoint, method=request.method, status=response.status_code)
+        metrics.observe('http_request_duration_seconds', total, endpoint=endpoint)
+        metrics.inc('db_queries_total', queries, endpoint=endpoint)
+        metrics.inc('db_query_seconds_total', db_time, endpoint=endpoint)
+        return response
+
+    @app.teardown_request
+    def stop_profile(error=None):
+        # after_request is skipped when the request fails, but the sampler must still stop
+        if g.get('sampler') is not None:
+            _finish_profile(app)
+
+    @app.route('/api/metrics')
+    def prometheus_metrics():
+        return metrics.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
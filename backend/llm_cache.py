@@ -0,0 +1,216 @@
+# /backend/llm_cache.py
+"""
+A content-addressed cache of LLM completions stored in SQLite.
+
+Completions are keyed by (model, prompt hash, temperature, response format),
+so repeated keyword prompts and retried topics reuse an earlier completion
+instead of paying for a new one. Identical requests that are in flight at
+the same time share a single call (single-flight).
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from types import SimpleNamespace
+
+# --- CONFIGURATION ---
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(BASE_DIR, "llm_cache.sqlite3"))
+CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+
+# Default lifetimes, in seconds, for the kinds of completions we cache
+KEYWORDS_TTL = int(os.getenv("LLM_CACHE_KEYWORDS_TTL", str(7 * 24 * 3600)))
+ARTICLE_TTL = int(os.getenv("LLM_CACHE_ARTICLE_TTL", str(24 * 3600)))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS completions (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    content TEXT NOT NULL,
+    prompt_tokens INTEGER NOT NULL DEFAULT 0,
+    completion_tokens INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    tokens_saved INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+_schema_ready = False
+_schema_lock = threading.Lock()
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+class _InFlight:
+    """A completion that one thread is fetching while others wait for it."""
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def _connect():
+    global _schema_ready
+    connection = sqlite3.connect(CACHE_PATH, timeout=10)
+    if not _schema_ready:
+        with _schema_lock:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(_SCHEMA)
+            connection.commit()
+            _schema_ready = True
+    return connection
+
+
+def make_key(model, messages, temperature=None, response_format=None):
+    """Hashes everything that changes the completion into a stable cache key."""
+    normalized = [
+        {'role': m.get('role'), 'content': " ".join(str(m.get('content', '')).split())}
+        for m in messages
+    ]
+    payload = json.dumps(
+        {'model': model, 'messages': normalized, 'temperature': temperature, 'response_format': response_format},
+        sort_keys=True, ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _as_completion(model, content, prompt_tokens, completion_tokens, cached):
+    """Builds an object shaped like a Groq completion, so callers don't care where it came from."""
+    return SimpleNamespace(
+        model=model,
+        cached=cached,
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content), finish_reason='stop')],
+        usage=SimpleNamespace(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=prompt_tokens + completion_tokens,
+        ),
+    )
+
+
+def lookup(key):
+    """Returns the cached completion for key, counting the hit, or None."""
+    try:
+        with _connect() as connection:
+            row = connection.execute(
+                "SELECT model, content, prompt_tokens, completion_tokens FROM completions WHERE key = ? AND expires_at > ?",
+                (key, time.time()),
+            ).fetchone()
+            if row is None:
+                return None
+            connection.execute(
+                "UPDATE completions SET hits = hits + 1, tokens_saved = tokens_saved + ? WHERE key = ?",
+                (row[2] + row[3], key),
+            )
+        return _as_completion(row[0], row[1], row[2], row[3], cached=True)
+    except sqlite3.Error as e:
+        print(f"  -> LLM cache lookup failed: {e}")
+        return None
+
+
+def store(key, completion, ttl):
+    """Saves a completion under key for ttl seconds."""
+    usage = getattr(completion, 'usage', None)
+    now = time.time()
+    try:
+        with _connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO completions (key, model, content, prompt_tokens, completion_tokens, created_at, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key, getattr(completion, 'model', ''), completion.choices[0].message.content,
+                    getattr(usage, 'prompt_tokens', 0) or 0, getattr(usage, 'completion_tokens', 0) or 0,
+                    now, now + ttl,
+                ),
+            )
+    except sqlite3.Error as e:
+        print(f"  -> LLM cache store failed: {e}")
+
+
+def invalidate(key):
+    """Drops a cached completion, e.g. when a caller finds it unusable."""
+    try:
+        with _connect() as connection:
+            connection.execute("DELETE FROM completions WHERE key = ?", (key,))
+    except sqlite3.Error as e:
+        print(f"  -> LLM cache invalidate failed: {e}")
+
+
+def purge_expired():
+    """Deletes expired completions and returns how many were removed."""
+    with _connect() as connection:
+        return connection.execute("DELETE FROM completions WHERE expires_at <= ?", (time.time(),)).rowcount
+
+
+def cache_stats():
+    """Returns how often the cache was hit and how many tokens that saved."""
+    with _connect() as connection:
+        entries, hits, tokens_saved = connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(hits), 0), COALESCE(SUM(tokens_saved), 0) FROM completions"
+        ).fetchone()
+    return {'entries': entries, 'hits': hits, 'tokens_saved': tokens_saved}
+
+
+def _default_validator(response_format):
+    """JSON-mode completions are only worth caching if they actually parse."""
+    if response_format and response_format.get('type') == 'json_object':
+        return lambda content: json.loads(content, strict=False)
+    return None
+
+
+def cached_completion(create, ttl, validate=None, **kwargs):
+    """
+    Returns a completion for kwargs from the cache, or calls create(**kwargs).
+    Concurrent identical requests wait for the first one instead of calling
+    the model again. Completions that fail validate(content) are not cached.
+    """
+    if not CACHE_ENABLED or not ttl:
+        return create(**kwargs)
+
+    key = make_key(kwargs.get('model'), kwargs.get('messages', []), kwargs.get('temperature'), kwargs.get('response_format'))
+    cached = lookup(key)
+    if cached is not None:
+        print(f"  -> LLM cache hit ({cached.usage.total_tokens} tokens saved).")
+        return cached
+
+    with _inflight_lock:
+        flight = _inflight.get(key)
+        leader = flight is None
+        if leader:
+            flight = _inflight[key] = _InFlight()
+
+    if not leader:
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        print("  -> Shared an in-flight LLM completion.")
+        return flight.result
+
+    try:
+        completion = create(**kwargs)
+        validate = validate or _default_validator(kwargs.get('response_format'))
+        try:
+            if validate:
+                validate(completion.choices[0].message.content)
+            store(key, completion, ttl)
+        except Exception as e:
+            print(f"  -> Not caching completion that failed validation: {e}")
+        flight.result = completion
+        return completion
+    except Exception as e:
+        flight.error = e
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+        flight.done.set()
+
+
+if __name__ == '__main__':
+    removed = purge_expired()
+    stats = cache_stats()
+    print(f"Purged {removed} expired completions.")
+    print(f"{stats['entries']} cached completions, {stats['hits']} hits, {stats['tokens_saved']} tokens saved.")
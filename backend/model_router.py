@@ -0,0 +1,150 @@
+# /backend/model_router.py
+"""
+Picks the LLM for each kind of task, falls back to the next model when one
+is rate limited or failing, and records tokens, latency and cost of every
+call in the llm_call_metrics table.
+"""
+import datetime
+import json
+import os
+import time
+
+from flask import has_app_context
+from sqlalchemy import func
+
+from models import db, LLMCallMetric
+from providers import CircuitOpenError, ProviderError, groq_chat
+
+# --- CONFIGURATION ---
+# Models to try for each task, best first. Override with MODEL_ROUTES, e.g.
+# MODEL_ROUTES='{"long_form": ["llama-3.3-70b-versatile"]}'
+MODEL_ROUTES = {
+    'keywords':    ["llama-3.1-8b-instant", "llama-3.3-70b-versatile"],
+    'topics':      ["llama-3.1-8b-instant", "llama-3.3-70b-versatile"],
+    'curation':    ["llama-3.3-70b-versatile", "llama-3.1-8b-instant"],
+    'long_form':   ["llama-3.3-70b-versatile", "llama-3.1-8b-instant"],
+    'repair':      ["llama-3.1-8b-instant", "llama-3.3-70b-versatile"],
+    'planning':    ["llama-3.3-70b-versatile", "llama-3.1-8b-instant"],
+    'translation': ["llama-3.3-70b-versatile", "llama-3.1-8b-instant"],
+}
+MODEL_ROUTES.update(json.loads(os.getenv("MODEL_ROUTES", "{}")))
+
+# USD per million (input, output) tokens
+MODEL_PRICES = {
+    "llama-3.1-8b-instant":    (0.05, 0.08),
+    "llama-3.3-70b-versatile": (0.59, 0.79),
+}
+
+# Errors worth trying another model for: rate limits and server-side failures
+FALLBACK_STATUSES = {429, 500, 502, 503, 504}
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens):
+    input_price, output_price = MODEL_PRICES.get(model, (0, 0))
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+
+def record_call(task, model, status, latency_ms, usage=None, error=None):
+    """Writes one metrics row in its own transaction, so it never commits the caller's session."""
+    prompt_tokens = getattr(usage, 'prompt_tokens', 0) or 0
+    completion_tokens = getattr(usage, 'completion_tokens', 0) or 0
+    cost = 0 if status != 'ok' else estimate_cost(model, prompt_tokens, completion_tokens)
+    print(f"  -> [{task}] {model}: {status}, {latency_ms}ms, {prompt_tokens}+{completion_tokens} tokens, ${cost:.5f}")
+
+    if not has_app_context():
+        return
+    try:
+        with db.engine.begin() as connection:
+            connection.execute(LLMCallMetric.__table__.insert().values(
+                task=task, model=model, status=status, error=(str(error)[:500] if error else None),
+                prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                latency_ms=latency_ms, cost_usd=cost,
+            ))
+    except Exception as e:
+        print(f"  -> Could not record LLM metrics: {e}")
+
+
+def route_chat(task, **kwargs):
+    """
+    Runs a chat completion for a task on the first model in its route that
+    succeeds. Takes the same arguments as providers.groq_chat, minus model.
+    """
+    models = MODEL_ROUTES[task]
+    last_error = None
+
+    for position, model in enumerate(models):
+        started = time.monotonic()
+        try:
+            # A rate-limited model is better skipped than waited for when another one is left
+            completion = groq_chat(model=model, retry_rate_limits=position == len(models) - 1, **kwargs)
+        except ProviderError as e:
+            latency_ms = int((time.monotonic() - started) * 1000)
+            record_call(task, model, 'error', latency_ms, error=e)
+            last_error = e
+            if isinstance(e, CircuitOpenError) or e.status_code is None or e.status_code in FALLBACK_STATUSES:
+                print(f"  -> {model} unavailable for '{task}', falling back to the next model...")
+                continue
+            raise
+
+        latency_ms = int((time.monotonic() - started) * 1000)
+        if kwargs.get('stream'):
+            return _recorded_stream(completion, task, model, started)
+        else:
+            status = 'cached' if getattr(completion, 'cached', False) else 'ok'
+            record_call(task, model, status, latency_ms, usage=completion.usage)
+        return completion
+
+    raise last_error or ProviderError('groq', f"No models configured for task '{task}'")
+
+
+def _stream_usage(chunk):
+    """Token usage from the last chunk of a stream: Groq sends it in x_groq.usage, OpenAI-style APIs in usage."""
+    usage = getattr(chunk, 'usage', None)
+    if usage is None:
+        usage = getattr(getattr(chunk, 'x_groq', None), 'usage', None)
+    return usage
+
+
+def _recorded_stream(stream, task, model, started):
+    """Yields the chunks of a stream and records the call, with its token usage, once it ends."""
+    usage, status, error = None, 'ok', None
+    try:
+        for chunk in stream:
+            usage = _stream_usage(chunk) or usage
+            yield chunk
+    except Exception as e:
+        status, error = 'error', e
+        raise
+    finally:
+        record_call(task, model, status, int((time.monotonic() - started) * 1000), usage=usage, error=error)
+
+
+def route_model(task):
+    """Returns the preferred model for a task."""
+    return MODEL_ROUTES[task][0]
+
+
+def summarize(days=7):
+    """Aggregates the last days of metrics per task and model."""
+    since = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=days)
+    rows = db.session.query(
+        LLMCallMetric.task, LLMCallMetric.model, LLMCallMetric.status,
+        func.count(), func.avg(LLMCallMetric.latency_ms),
+        func.sum(LLMCallMetric.prompt_tokens + LLMCallMetric.completion_tokens),
+        func.sum(LLMCallMetric.cost_usd),
+    ).filter(LLMCallMetric.created_at >= since)\
+        .group_by(LLMCallMetric.task, LLMCallMetric.model, LLMCallMetric.status)\
+        .order_by(LLMCallMetric.task, LLMCallMetric.model).all()
+    return [
+        {'task': task, 'model': model, 'status': status, 'calls': calls,
+         'avg_latency_ms': int(avg_latency or 0), 'tokens': int(tokens or 0), 'cost_usd': float(cost or 0)}
+        for task, model, status, calls, avg_latency, tokens, cost in rows
+    ]
+
+
+if __name__ == '__main__':
+    from config import create_worker_app
+    with create_worker_app().app_context():
+        for row in summarize():
+            print(f"{row['task']:<12} {row['model']:<26} {row['status']:<7} {row['calls']:>6} calls "
+                  f"{row['avg_latency_ms']:>7}ms avg {row['tokens']:>10} tokens ${row['cost_usd']:.4f}")
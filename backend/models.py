@@ -1,9 +1,17 @@
 # backend/models.py
 from flask_sqlalchemy import SQLAlchemy
 import datetime
+import itertools
+import re
 from sqlalchemy import func
+from sqlalchemy.ext.hybrid import hybrid_property
+from image_processing import build_srcset
+from db_routing import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession}) # Reads may go to a replica, see db_routing.py
+
+# Matches the "[IMAGE: prompt]" placeholders the AI writes into article content
+IMAGE_PLACEHOLDER_RE = re.compile(r'\[IMAGE: (.*?)\]')
 
 article_categories = db.Table('article_categories',
     db.Column('article_id', db.Integer, db.ForeignKey('article.id'), primary_key=True),
@@ -19,14 +27,27 @@ class Category(db.Model):
         return {'name': self.name, 'slug': self.slug}
 
 
+class CategoryStat(db.Model):
+    """Published articles per category and language, kept current by persistence.py."""
+    __tablename__ = 'category_stats'
+
+    category_id = db.Column(db.Integer, db.ForeignKey('category.id', ondelete='CASCADE'), primary_key=True)
+    lang = db.Column(db.String(10), primary_key=True)
+    published_count = db.Column(db.Integer, nullable=False, default=0)
+    latest_article_at = db.Column(db.DateTime(timezone=True), nullable=True) # created_at of its newest article
+
+
 class Article(db.Model):
+    __table_args__ = (db.UniqueConstraint('slug', 'lang', name='uq_article_slug_lang'),)
+
     id = db.Column(db.Integer, primary_key=True)
-    slug = db.Column(db.String(255), nullable=False, index=True) # Slugs may not be unique across languages
+    slug = db.Column(db.String(255), nullable=False, index=True) # Unique per language, not across languages
     lang = db.Column(db.String(10), nullable=False, default='en') # Language code (e.g., 'en', 'es', 'hi')
     title = db.Column(db.String(500), nullable=False)
     meta_description = db.Column(db.String(1000), nullable=False)
-    content = db.Column(db.Text, nullable=False)
+    _content = db.Column('content', db.Text, nullable=False) # '' once moved to the archive, use .content
     image_url = db.Column(db.String(500), nullable=True)
+    image_variants = db.Column(db.JSON, nullable=True) # Responsive variants of image_url, see image_processing.py
     is_published = db.Column(db.Boolean, default=True, nullable=False)
     is_breaking_news = db.Column(db.Boolean, default=False, nullable=False)
     author_name = db.Column(db.String(255), nullable=True)
@@ -37,9 +58,35 @@ class Article(db.Model):
     # Link translations together
     original_article_id = db.Column(db.Integer, db.ForeignKey('article.id'), nullable=True)
     translations = db.relationship('Article', backref=db.backref('original_article', remote_side=[id]), lazy=True)
+    images = db.relationship('ArticleImage', backref='article', lazy=True, order_by='ArticleImage.index',
+        cascade='all, delete-orphan')
+    archive = db.relationship('ArticleArchive', uselist=False, lazy=True, cascade='all, delete-orphan')
     created_at = db.Column(db.DateTime(timezone=True), server_default=func.now())
     updated_at = db.Column(db.DateTime(timezone=True), onupdate=func.now())
 
+    @hybrid_property
+    def content(self):
+        """The article body; for an archived article it is loaded and decompressed on first access."""
+        if self._content or self.archive is None:
+            return self._content
+        # to_dict() and sync_images() each read it; decompress once per loaded instance
+        if self.__dict__.get('_archived_text') is None:
+            self._archived_text = self.archive.text()
+        return self._archived_text
+
+    @content.inplace.setter
+    def _content_setter(self, value):
+        # New content brings the article back from the archive
+        self._content = value
+        self._archived_text = None
+        if self.archive is not None:
+            self.archive = None
+
+    @content.inplace.expression
+    @classmethod
+    def _content_expression(cls):
+        return cls._content
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -47,8 +94,8 @@ class Article(db.Model):
             'lang': self.lang,
             'title': self.title,
             'meta_description': self.meta_description,
-            'content': self.content,
-            'image_url': self.image_url,
+            'content': self.render_content(),
+            **self.image_fields(),
             'is_published': self.is_published,
             'is_breaking_news': self.is_breaking_news,
             'authorName': self.author_name,
@@ -59,6 +106,64 @@ class Article(db.Model):
             'updatedAt': self.updated_at.isoformat() if self.updated_at else None, 
         }
 
+    def to_list_dict(self):
+        """The short form used by article lists; it never touches the content."""
+        return {
+            'id': self.id,
+            'slug': self.slug,
+            'title': self.title,
+            'meta_description': self.meta_description,
+            **self.image_fields(),
+        }
+
+    def image_fields(self):
+        """The hero image with its responsive variants, for API responses."""
+        return {
+            'image_url': self.image_url,
+            'image_variants': self.image_variants,
+            'image_srcset': build_srcset(self.image_variants),
+        }
+
+    def sync_images(self):
+        """
+        Keeps one ArticleImage row per [IMAGE: ...] placeholder in the content.
+        Call this whenever the content is saved or edited.
+        """
+        prompts = IMAGE_PLACEHOLDER_RE.findall(self.content or '')
+        existing = {image.index: image for image in self.images}
+        for index, prompt in enumerate(prompts):
+            image = existing.get(index)
+            if image is None:
+                self.images.append(ArticleImage(index=index, prompt=prompt))
+            elif image.prompt != prompt:
+                image.prompt, image.url, image.status = prompt, None, 'pending'
+        for index, image in existing.items():
+            if index >= len(prompts):
+                self.images.remove(image)
+
+    def replace_image_prompt(self, index, prompt):
+        """Rewrites the prompt of the placeholder at the given position."""
+        counter = itertools.count()
+        def rewrite(match):
+            return f"[IMAGE: {prompt}]" if next(counter) == index else match.group(0)
+        self.content = IMAGE_PLACEHOLDER_RE.sub(rewrite, self.content)
+
+    def render_content(self):
+        """Returns the content with every ready image merged into its placeholder."""
+        # Most articles have no placeholders left, so skip loading the images entirely
+        if not self.content or '[IMAGE: ' not in self.content:
+            return self.content
+
+        ready = {image.index: image.display_url for image in self.images if image.status == 'ready' and image.url}
+        if not ready:
+            return self.content
+
+        counter = itertools.count()
+        def merge(match):
+            url = ready.get(next(counter))
+            return f"![{match.group(1)}]({url})" if url else match.group(0)
+        return IMAGE_PLACEHOLDER_RE.sub(merge, self.content)
+
     def to_admin_dict(self):
         # This is a lightweight version for the admin list
         return {
@@ -67,4 +172,131 @@ class Article(db.Model):
             'is_published': self.is_published,
             'is_breaking_news': self.is_breaking_news,
             'lang': self.lang,
-        }
\ No newline at end of file
+        }
+
+
+class ArticleImage(db.Model):
+    __tablename__ = 'article_images'
+    __table_args__ = (db.UniqueConstraint('article_id', 'index', name='uq_article_images_article_id_index'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    article_id = db.Column(db.Integer, db.ForeignKey('article.id', ondelete='CASCADE'), nullable=False, index=True)
+    index = db.Column(db.Integer, nullable=False) # Position of the placeholder in the article content
+    prompt = db.Column(db.Text, nullable=False)
+    url = db.Column(db.String(500), nullable=True)
+    status = db.Column(db.String(20), nullable=False, default='pending') # 'pending', 'ready' or 'failed'
+    variants = db.Column(db.JSON, nullable=True) # Responsive variants of url, see image_processing.py
+
+    @property
+    def display_url(self):
+        """The largest WebP variant if there is one; much lighter than the original for inline images."""
+        webp = (self.variants or {}).get('webp')
+        return webp[-1]['url'] if webp else self.url
+
+    def to_dict(self):
+        return {'index': self.index, 'prompt': self.prompt, 'url': self.url, 'status': self.status,
+                'variants': self.variants, 'srcset': build_srcset(self.variants)}
+
+
+class ArticleArchive(db.Model):
+    """The compressed content of an old article, moved out of the article table. See archive.py."""
+    __tablename__ = 'article_archive'
+
+    article_id = db.Column(db.Integer, db.ForeignKey('article.id', ondelete='CASCADE'), primary_key=True)
+    codec = db.Column(db.String(20), nullable=False) # How content is compressed: 'zstd' or 'zlib'
+    dictionary_id = db.Column(db.Integer, db.ForeignKey('compression_dictionaries.id'), nullable=True) # zstd only
+    content = db.Column(db.LargeBinary, nullable=False)
+    original_size = db.Column(db.Integer, nullable=False) # Bytes of UTF-8 text before compression
+    archived_at = db.Column(db.DateTime(timezone=True), server_default=func.now())
+
+    def text(self):
+        from archive import decompress
+        return decompress(self.codec, self.content, self.dictionary_id)
+
+
+class CompressionDictionary(db.Model):
+    """A zstd dictionary trained on one language's articles. Rows are never changed, only added."""
+    __tablename__ = 'compression_dictionaries'
+
+    id = db.Column(db.Integer, primary_key=True)
+    lang = db.Column(db.String(10), nullable=False, index=True)
+    data = db.Column(db.LargeBinary, nullable=False)
+    sample_count = db.Column(db.Integer, nullable=False) # Articles it was trained on
+    created_at = db.Column(db.DateTime(timezone=True), server_default=func.now())
+
+
+class ArticleChange(db.Model):
+    """One row per commit that changed an article (or its images), for incremental jobs. See change_log.py."""
+    __tablename__ = 'article_changes'
+    __table_args__ = {'sqlite_autoincrement': True} # Ids must never be reused below a cursor after prune()
+
+    id = db.Column(db.Integer, primary_key=True)
+    article_id = db.Column(db.Integer, nullable=False, index=True) # No foreign key: deletions are logged too
+    changed_at = db.Column(db.DateTime(timezone=True), server_default=func.now())
+
+
+class ChangeCursor(db.Model):
+    """How far each incremental job has read article_changes."""
+    __tablename__ = 'change_cursors'
+
+    consumer = db.Column(db.String(50), primary_key=True) # e.g. 'feeds'
+    last_change_id = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class LLMCallMetric(db.Model):
+    __tablename__ = 'llm_call_metrics'
+
+    id = db.Column(db.Integer, primary_key=True)
+    task = db.Column(db.String(50), nullable=False, index=True) # e.g. 'keywords', 'long_form'
+    model = db.Column(db.String(100), nullable=False)
+    status = db.Column(db.String(20), nullable=False) # 'ok', 'cached' or 'error'
+    error = db.Column(db.String(500), nullable=True)
+    prompt_tokens = db.Column(db.Integer, nullable=False, default=0)
+    completion_tokens = db.Column(db.Integer, nullable=False, default=0)
+    latency_ms = db.Column(db.Integer, nullable=False, default=0)
+    cost_usd = db.Column(db.Numeric(12, 6), nullable=False, default=0)
+    created_at = db.Column(db.DateTime(timezone=True), server_default=func.now(), index=True)
+
+
+class PipelineRun(db.Model):
+    __tablename__ = 'pipeline_runs'
+    __table_args__ = (db.UniqueConstraint('job_name', 'run_key', name='uq_pipeline_runs_job_name_run_key'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_name = db.Column(db.String(100), nullable=False) # e.g. 'future_content'
+    run_key = db.Column(db.String(100), nullable=False) # e.g. '2026-W42'
+    status = db.Column(db.String(20), nullable=False, default='running') # 'running' or 'completed'
+    created_at = db.Column(db.DateTime(timezone=True), server_default=func.now())
+    updated_at = db.Column(db.DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    steps = db.relationship('PipelineStep', backref='run', lazy=True, cascade='all, delete-orphan')
+
+
+class PipelineStep(db.Model):
+    __tablename__ = 'pipeline_steps'
+
+    id = db.Column(db.Integer, primary_key=True)
+    run_id = db.Column(db.Integer, db.ForeignKey('pipeline_runs.id', ondelete='CASCADE'), nullable=False, index=True)
+    idempotency_key = db.Column(db.String(255), nullable=False, unique=True)
+    name = db.Column(db.String(100), nullable=False) # e.g. 'keywords', 'draft', 'translations:fr'
+    status = db.Column(db.String(20), nullable=False, default='pending') # 'running', 'completed' or 'failed'
+    result = db.Column(db.JSON, nullable=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text, nullable=True)
+    updated_at = db.Column(db.DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+
+class LibraryImage(db.Model):
+    """Every generated image with its prompt, so similar prompts can reuse it. See image_library.py."""
+    __tablename__ = 'library_images'
+
+    id = db.Column(db.Integer, primary_key=True)
+    prompt = db.Column(db.Text, nullable=False)
+    shingles = db.Column(db.JSON, nullable=False) # Normalized words and word pairs of the prompt
+    phash = db.Column(db.BigInteger, nullable=True) # 64-bit difference hash of the pixels
+    url = db.Column(db.String(500), nullable=False, unique=True)
+    variants = db.Column(db.JSON, nullable=True)
+    use_count = db.Column(db.Integer, nullable=False, default=1)
+    created_at = db.Column(db.DateTime(timezone=True), server_default=func.now())
+    last_used_at = db.Column(db.DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
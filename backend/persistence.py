@@ -0,0 +1,202 @@
+# /backend/persistence.py
+"""
+Set-based writes for the pipeline: categories and translations are saved
+with a few multi-row statements instead of one query and one commit per row.
+
+Inserts use INSERT ... ON CONFLICT DO NOTHING (Postgres, and SQLite for
+local runs), so a row another worker saved first is skipped, not an error.
+Articles are unique per (slug, lang), so concurrent pipelines can't save the
+same article twice. Nothing here commits except save_translations(); callers
+commit with the rest of their changes.
+
+category_stats (published articles per category and language) is refreshed
+in the same transaction as any change to it: session hooks note the
+categories of articles added, deleted, (un)published or recategorized through
+the ORM, and their rows are recomputed just before the commit. Core inserts
+like save_translations() call mark_categories_stale() instead. The same hooks
+log every changed article to article_changes (see change_log.py).
+"""
+from slugify import slugify
+from sqlalchemy import delete, event, func, inspect, or_, select
+from sqlalchemy.orm import Session
+
+from change_log import log_changes
+from models import db, Article, ArticleImage, Category, CategoryStat, article_categories
+
+
+def dialect_insert(table, session=None):
+    """An INSERT for the session's database that supports ON CONFLICT (Postgres, SQLite)."""
+    dialect = (session or db.session).get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise RuntimeError(f"INSERT ... ON CONFLICT is not supported on '{dialect}'.")
+    return insert(table)
+
+
+def insert_ignore(table, index_elements=None):
+    """
+    An INSERT ... ON CONFLICT DO NOTHING statement for the session's database.
+    With index_elements, only a conflict on that unique index is ignored.
+    """
+    return dialect_insert(table).on_conflict_do_nothing(index_elements=index_elements)
+
+
+def insert_article(**fields):
+    """
+    Inserts an article unless one with the same (slug, lang) exists, and
+    returns (article, created). The unique index decides, so two pipelines
+    saving the same article at once get one row, and a new article costs a
+    single round trip instead of a lookup and an insert.
+    """
+    fields.setdefault('lang', 'en')
+    statement = insert_ignore(Article.__table__, index_elements=['slug', 'lang']).values(**fields).returning(Article.id)
+    article_id = db.session.execute(statement).scalar()
+    if article_id is None:
+        return Article.query.filter_by(slug=fields['slug'], lang=fields['lang']).one(), False
+    mark_articles_changed(db.session, [article_id])
+    return db.session.get(Article, article_id), True
+
+
+def upsert_categories(names):
+    """
+    Returns {name: Category} for the given names, creating the missing ones
+    in one INSERT. A name whose slug is already taken maps to that category.
+    """
+    names = list(dict.fromkeys(name for name in names if name))
+    if not names:
+        return {}
+    found = {category.name: category for category in Category.query.filter(Category.name.in_(names))}
+    missing = [name for name in names if name not in found]
+    if missing:
+        slugs = {name: slugify(name) for name in missing}
+        db.session.execute(insert_ignore(Category.__table__),
+                           [{'name': name, 'slug': slugs[name]} for name in missing])
+        created = Category.query.filter(or_(Category.name.in_(missing), Category.slug.in_(slugs.values()))).all()
+        by_slug = {category.slug: category for category in created}
+        for category in created:
+            found.setdefault(category.name, category)
+        for name in missing:
+            if name not in found and slugs[name] in by_slug:
+                found[name] = by_slug[slugs[name]]
+    return found
+
+
+def existing_translation_langs(original_article_id):
+    """The languages an article already has translations in, from one query."""
+    rows = db.session.query(Article.lang).filter(Article.original_article_id == original_article_id).all()
+    return {lang for (lang,) in rows}
+
+
+def save_translations(original_article, translations):
+    """
+    Inserts the translations ({lang: fields from translate_article_fields()})
+    of an article and their category links in two statements and one commit.
+    A translated slug that another article already uses in that language gets
+    the original's id appended. Returns the languages that were inserted; ones
+    that already existed are skipped.
+    """
+    if not translations:
+        return []
+    rows = [{
+        'slug': fields['slug'], 'lang': lang, 'title': fields['title'],
+        'meta_description': fields['meta_description'], 'content': fields['content'],
+        'image_url': original_article.image_url, 'image_variants': original_article.image_variants,
+        'is_published': True, 'is_breaking_news': original_article.is_breaking_news,
+        'author_name': original_article.author_name, 'author_bio': original_article.author_bio,
+        'original_article_id': original_article.id,
+    } for lang, fields in translations.items()]
+    category_ids = [category.id for category in original_article.categories]
+
+    statement = insert_ignore(Article.__table__, index_elements=['slug', 'lang']).returning(Article.id, Article.lang)
+    inserted = db.session.execute(statement, rows).all()
+    saved = {lang for _, lang in inserted} | existing_translation_langs(original_article.id)
+    retry = [dict(row, slug=f"{row['slug']}-{original_article.id}") for row in rows if row['lang'] not in saved]
+    if retry:
+        inserted += db.session.execute(statement, retry).all()
+    links = [{'article_id': article_id, 'category_id': category_id}
+             for article_id, _ in inserted for category_id in category_ids]
+    if links:
+        db.session.execute(insert_ignore(article_categories), links)
+        mark_categories_stale(db.session, category_ids)
+    mark_articles_changed(db.session, [article_id for article_id, _ in inserted])
+    db.session.commit()
+    return [lang for _, lang in inserted]
+
+
+# --- CATEGORY STATS ---
+def refresh_category_stats(session, category_ids=None):
+    """
+    Recomputes the category_stats rows of the given categories (all when None)
+    from the articles, without committing. Deleting first makes a concurrent
+    refresh of the same category wait, so the last one to commit counts last.
+    """
+    stats = CategoryStat.__table__
+    if category_ids is not None and not category_ids:
+        return
+    clear = delete(stats)
+    counts = select(article_categories.c.category_id, Article.lang, func.count(), func.max(Article.created_at))\
+        .join(Article, Article.id == article_categories.c.article_id)\
+        .where(Article.is_published == True)\
+        .group_by(article_categories.c.category_id, Article.lang)
+    if category_ids is not None:
+        clear = clear.where(stats.c.category_id.in_(category_ids))
+        counts = counts.where(article_categories.c.category_id.in_(category_ids))
+    session.execute(clear)
+    insert = dialect_insert(stats, session)
+    session.execute(insert.from_select(['category_id', 'lang', 'published_count', 'latest_article_at'], counts)
+                    .on_conflict_do_update(index_elements=['category_id', 'lang'], set_={
+                        'published_count': insert.excluded.published_count,
+                        'latest_article_at': insert.excluded.latest_article_at,
+                    }))
+    session.info['category_stats_changed'] = True
+
+
+def mark_categories_stale(session, category_ids):
+    """Refreshes these categories' stats when the session commits."""
+    session.info.setdefault('stale_category_ids', set()).update(category_ids)
+
+
+def mark_articles_changed(session, article_ids):
+    """Logs these articles to article_changes when the session commits."""
+    session.info.setdefault('changed_article_ids', set()).update(article_ids)
+
+
+@event.listens_for(Session, 'after_flush')
+def _note_changes(session, flush_context):
+    stale, changed = set(), set()
+    for obj in session.new | session.deleted:
+        if isinstance(obj, Article):
+            stale.update(category.id for category in obj.categories)
+            changed.add(obj.id)
+        elif isinstance(obj, ArticleImage):
+            changed.add(obj.article_id)
+    for obj in session.dirty:
+        if isinstance(obj, ArticleImage) and session.is_modified(obj):
+            changed.add(obj.article_id)
+        if not isinstance(obj, Article) or not session.is_modified(obj):
+            continue
+        changed.add(obj.id)
+        state = inspect(obj)
+        published, categories = state.attrs.is_published.history, state.attrs.categories.history
+        if published.has_changes() or categories.has_changes():
+            stale.update(category.id for category in obj.categories)
+            stale.update(category.id for category in categories.deleted or ())
+    if stale:
+        mark_categories_stale(session, stale)
+    changed.discard(None)
+    if changed:
+        mark_articles_changed(session, changed)
+
+
+@event.listens_for(Session, 'before_commit')
+def _write_before_commit(session):
+    session.flush() # Pending ORM changes are only noted once flushed
+    stale = session.info.pop('stale_category_ids', None)
+    if stale:
+        refresh_category_stats(session, sorted(stale))
+    changed = session.info.pop('changed_article_ids', None)
+    if changed:
+        log_changes(session, changed)
@@ -0,0 +1,145 @@
+# /backend/pipeline_state.py
+"""
+Durable, resumable state for worker jobs.
+
+A job run is a PipelineRun, and every unit of paid work (keywords, draft,
+images, each translation...) is a PipelineStep with an idempotency key.
+A completed step's result is stored in the database, so when a job is cut
+off and rerun, finished steps return their stored result and work resumes
+at the first incomplete step. A run with a failed step is left open, so
+the next run of the job resumes it and retries that step (up to
+MAX_STEP_ATTEMPTS attempts in all).
+"""
+import datetime
+import hashlib
+
+from models import db, PipelineRun, PipelineStep
+
+# --- CONFIGURATION ---
+# A failed step is retried on later runs until it has been attempted this many times
+MAX_STEP_ATTEMPTS = 3
+
+_failed_runs = set() # Ids of runs with a step that failed in this process since start_run()
+
+
+class StepExhausted(Exception):
+    """Raised when a step has already failed MAX_STEP_ATTEMPTS times."""
+
+
+def item_key(text):
+    """A short, stable key for a topic or headline, used inside idempotency keys."""
+    return hashlib.sha1(text.strip().lower().encode('utf-8')).hexdigest()[:12]
+
+
+def start_run(job_name, run_key=None, resume_within=datetime.timedelta(hours=24)):
+    """
+    Returns the run to work on: the run with run_key if given, otherwise the
+    latest unfinished run of this job started within resume_within, otherwise
+    a new run.
+    """
+    if run_key is not None:
+        run = PipelineRun.query.filter_by(job_name=job_name, run_key=run_key).first()
+    else:
+        since = datetime.datetime.now(datetime.timezone.utc) - resume_within
+        run = PipelineRun.query.filter_by(job_name=job_name, status='running')\
+            .filter(PipelineRun.created_at >= since)\
+            .order_by(PipelineRun.id.desc()).first()
+        run_key = datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%S')
+
+    if run is not None:
+        print(f"Resuming {job_name} run '{run.run_key}' (id {run.id}).")
+        _failed_runs.discard(run.id)
+        return run
+
+    run = PipelineRun(job_name=job_name, run_key=run_key, status='running')
+    db.session.add(run)
+    db.session.commit()
+    print(f"Started {job_name} run '{run.run_key}' (id {run.id}).")
+    return run
+
+
+def keep_open(run):
+    """Makes complete_run() leave the run open, for work that failed outside a step."""
+    _failed_runs.add(run.id)
+
+
+def complete_run(run):
+    """
+    Marks the run completed, unless one of its steps failed since start_run():
+    it then stays open, and the next run resumes it. Returns whether it was completed.
+    """
+    if run.id in _failed_runs:
+        print(f"Leaving run '{run.run_key}' open: failed steps are retried on the next run.")
+        return False
+    run.status = 'completed'
+    db.session.commit()
+    return True
+
+
+def get_step(run, key):
+    return PipelineStep.query.filter_by(idempotency_key=f"{run.job_name}:{run.run_key}:{key}").first()
+
+
+def run_step(run, key, func, name=None):
+    """
+    Runs func() once per idempotency key and returns its JSON-serializable result.
+    A completed step returns its stored result without calling func again.
+    """
+    idempotency_key = f"{run.job_name}:{run.run_key}:{key}"
+    step = PipelineStep.query.filter_by(idempotency_key=idempotency_key).first()
+
+    if step is not None and step.status == 'completed':
+        print(f"  -> Step '{key}' already completed, reusing its result.")
+        return step.result
+    if step is not None and step.attempts >= MAX_STEP_ATTEMPTS:
+        raise StepExhausted(f"Step '{key}' failed {step.attempts} times: {step.error}")
+
+    if step is None:
+        step = PipelineStep(run_id=run.id, idempotency_key=idempotency_key, name=name or key.rsplit(':', 1)[-1])
+        db.session.add(step)
+    step.status = 'running'
+    step.attempts = (step.attempts or 0) + 1
+    db.session.commit()
+
+    try:
+        result = func()
+    except Exception as e:
+        # Don't commit whatever the failed step left half-done in the session
+        db.session.rollback()
+        step.status, step.error = 'failed', str(e)[:2000]
+        db.session.commit()
+        if step.attempts < MAX_STEP_ATTEMPTS:
+            _failed_runs.add(run.id)
+        raise
+
+    step.status, step.result, step.error = 'completed', result, None
+    db.session.commit()
+    return result
+
+
+def track_step(run, key, func, name=None):
+    """
+    Like run_step(), for work that saves its own result: the step row is only
+    added to the session, and commits with the caller's next commit. No result
+    is stored, and a completed step returns None without calling func.
+    """
+    idempotency_key = f"{run.job_name}:{run.run_key}:{key}"
+    step = PipelineStep.query.filter_by(idempotency_key=idempotency_key).first()
+    if step is not None and step.status == 'completed':
+        return None
+    if step is not None and step.attempts >= MAX_STEP_ATTEMPTS:
+        raise StepExhausted(f"Step '{key}' failed {step.attempts} times: {step.error}")
+    if step is None:
+        step = PipelineStep(run_id=run.id, idempotency_key=idempotency_key, name=name or key.rsplit(':', 1)[-1])
+        db.session.add(step)
+    step.attempts = (step.attempts or 0) + 1
+
+    try:
+        result = func()
+    except Exception as e:
+        step.status, step.error = 'failed', str(e)[:2000]
+        if step.attempts < MAX_STEP_ATTEMPTS:
+            _failed_runs.add(run.id)
+        raise
+    step.status, step.error = 'completed', None
+    return result
@@ -164,6 +164,58 @@ Generate a single, valid JSON object containing the complete blog post.
 """
 
 
+def get_field_repair_prompt(query, field, article_so_far):
+    """Asks for a single missing field of an article whose other fields already exist."""
+    known_fields = "\n".join(f'- "{key}": {value}' for key, value in article_so_far.items())
+    return f"""
+You are completing a blog post about "{query}" that was cut off before every field was written.
+
+**Fields written so far:**
+{known_fields or "- (none)"}
+
+**Your Task:**
+Write ONLY the missing "{field}" field, consistent with the fields above and following the same rules as the original brief:
+- "title": 50-60 characters, SEO-optimized and highly clickable.
+- "slug": A URL-friendly slug of the title.
+- "meta_description": 140-155 characters with a call-to-action.
+- "category": MUST BE ONE from ['Technology', 'Health', 'Science', 'Business', 'Culture', 'World News', 'Travel', 'Food', 'Finance', 'Education', 'Lifestyle', 'Entertainment'].
+- "content": The full blog post in Markdown format.
+
+You MUST respond with ONLY a valid JSON object with the single key "{field}".
+"""
+
+
+def get_content_continuation_prompt(query, title, partial_content):
+    """Asks the AI to finish an article body that was truncated mid-stream."""
+    # Only the tail is needed to continue seamlessly; it keeps the prompt small
+    tail = partial_content[-3000:]
+    return f"""
+You are finishing a long Markdown blog post titled "{title}" about "{query}". The draft was cut off mid-way.
+
+**The draft ends with:**
+---
+{tail}
+---
+
+**Your Task:**
+Continue the article EXACTLY where the draft stops, without repeating any of it. Keep the same tone and structure, finish any remaining sections, end with a powerful **Conclusion** and a **"Frequently Asked Questions (FAQ)"** section.
+Respond with ONLY the Markdown continuation. Do not wrap it in JSON or code fences.
+"""
+
+
+def get_translation_prompt(text, target_language, source_language):
+    """Used when LibreTranslate is unavailable; the text is usually Markdown."""
+    return f"""
+You are a professional translator. Translate the following text from the language with code '{source_language}' into the language with code '{target_language}'.
+
+Keep all Markdown formatting, links, image tags and line breaks exactly as they are. Translate only the human-readable text.
+Respond with ONLY the translated text and nothing else.
+
+---
+{text}
+"""
+
+
 def get_ebook_outline_prompt():
     return """
     You are an expert author and content strategist tasked with outlining a compelling, non-fiction ebook for beginners on a popular topic.
@@ -0,0 +1,384 @@
+# /backend/providers.py
+"""
+One shared client layer for every outbound provider call (Groq, Fireworks,
+LibreTranslate, Firebase and our own backend API).
+
+Each provider gets a single keep-alive connection pool, its own timeout,
+retries with jittered exponential backoff and a circuit breaker, so that
+app.py and the workers reuse warm connections instead of opening a new
+TCP/TLS connection for every request.
+"""
+import contextvars
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# --- CONFIGURATION ---
+FIREWORKS_API_URL = os.getenv(
+    "FIREWORKS_API_URL",
+    "https://api.fireworks.ai/inference/v1/workflows/accounts/fireworks/models/flux-1-schnell-fp8/text_to_image",
+)
+LIBRETRANSLATE_API_URL = os.getenv("LIBRETRANSLATE_API_URL", "https://libretranslate.de/translate")
+
+# Connections kept open per provider, and threads used by map_concurrently()
+POOL_SIZE = int(os.getenv("PROVIDER_POOL_SIZE", "10"))
+CONCURRENCY = int(os.getenv("PROVIDER_CONCURRENCY", "4"))
+
+# timeout: seconds per attempt, retries: extra attempts after the first one,
+# backoff: base delay in seconds before a retry (doubled per attempt, plus jitter),
+# min_interval: polite minimum gap between two calls to the same provider,
+# retry_statuses: only these statuses are retried (default: any transient failure).
+PROVIDER_SETTINGS = {
+    'groq':           {'timeout': 120, 'retries': 2, 'backoff': 2.0,  'min_interval': 0},
+    'fireworks':      {'timeout': 90,  'retries': 2, 'backoff': 3.0,  'min_interval': 0},
+    'libretranslate': {'timeout': 60,  'retries': 2, 'backoff': 10.0, 'min_interval': 10},
+    # Generation isn't idempotent: only a 503 from generation_slot (nothing was started) is retried
+    'backend':        {'timeout': 300, 'retries': 3, 'backoff': 5.0,  'min_interval': 0, 'retry_statuses': {503}},
+    'gumroad':        {'timeout': 120, 'retries': 0, 'backoff': 5.0,  'min_interval': 0},
+    'otlp':           {'timeout': 10,  'retries': 1, 'backoff': 1.0,  'min_interval': 0},
+}
+
+# HTTP statuses worth retrying: rate limits and server-side failures
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+
+# A provider's circuit opens after this many consecutive failures and stays open for the cooldown
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("PROVIDER_BREAKER_THRESHOLD", "5"))
+BREAKER_COOLDOWN = float(os.getenv("PROVIDER_BREAKER_COOLDOWN", "60"))
+
+
+class ProviderError(Exception):
+    """Raised when a provider call fails after all retries."""
+    def __init__(self, provider, message, status_code=None):
+        super().__init__(f"{provider}: {message}")
+        self.provider = provider
+        self.status_code = status_code
+
+
+class CircuitOpenError(ProviderError):
+    """Raised without calling the provider while its circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Stops calling a provider that keeps failing until a cooldown has passed.
+    Then it is half-open: exactly one probe call goes through, and only its
+    success closes the breaker again; its failure restarts the cooldown.
+    """
+
+    def __init__(self, name, failure_threshold=BREAKER_FAILURE_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self.probe_in_flight or time.monotonic() - self.opened_at < self.cooldown:
+                return False
+            self.probe_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.probe_in_flight:
+                self.probe_in_flight = False
+                self.opened_at = time.monotonic()
+                print(f"!!! Circuit breaker for '{self.name}' probe failed, staying open. !!!")
+            elif self.failures >= self.failure_threshold and self.opened_at is None:
+                self.opened_at = time.monotonic()
+                print(f"!!! Circuit breaker for '{self.name}' opened after {self.failures} failures. !!!")
+
+    def release_probe(self):
+        """Ends a probe that said nothing about the provider's health (e.g. a bad request); the next call probes instead."""
+        with self._lock:
+            self.probe_in_flight = False
+
+
+_sessions = {}
+_breakers = {}
+_last_call = {}
+_state_lock = threading.Lock()
+_groq_client = None
+_firebase_lock = threading.Lock()
+# Called as observer(provider, seconds, ok, attempts) after every call_with_retries(),
+# e.g. by instrumentation.py and tracing.py
+_call_observers = []
+
+
+def add_call_observer(observer):
+    if observer not in _call_observers:
+        _call_observers.append(observer)
+
+
+def _notify_observers(provider, started, ok, attempts):
+    for observer in _call_observers:
+        try:
+            observer(provider, time.perf_counter() - started, ok, attempts)
+        except Exception as e:
+            print(f"Provider call observer failed: {e}")
+
+
+def get_breaker(provider):
+    with _state_lock:
+        if provider not in _breakers:
+            _breakers[provider] = CircuitBreaker(provider)
+        return _breakers[provider]
+
+
+def get_session(provider):
+    """Returns the pooled keep-alive session for a provider."""
+    with _state_lock:
+        session = _sessions.get(provider)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=2, pool_maxsize=POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _sessions[provider] = session
+        return session
+
+
+def _wait_for_turn(provider):
+    """Enforces the provider's polite minimum interval between calls."""
+    min_interval = PROVIDER_SETTINGS[provider]['min_interval']
+    if not min_interval:
+        return
+    with _state_lock:
+        now = time.monotonic()
+        next_slot = max(now, _last_call.get(provider, 0) + min_interval)
+        _last_call[provider] = next_slot
+    if next_slot > now:
+        time.sleep(next_slot - now)
+
+
+def _backoff_delay(provider, attempt, retry_after=None):
+    """Exponential backoff with full jitter, honouring Retry-After when the provider sends it."""
+    base = PROVIDER_SETTINGS[provider]['backoff'] * (2 ** attempt)
+    delay = random.uniform(base / 2, base)
+    if retry_after:
+        try:
+            delay = max(delay, float(retry_after))
+        except ValueError:
+            pass
+    return delay
+
+
+def call_with_retries(provider, func, breaker_key=None, no_retry_statuses=()):
+    """
+    Runs func() under the provider's circuit breaker and retry policy.
+    func may raise ProviderError with a status code; only retryable ones are retried.
+    breaker_key gives part of a provider (e.g. one Groq model) its own breaker.
+    Statuses in no_retry_statuses fail at once, e.g. a 429 the caller can route around.
+    """
+    breaker = get_breaker(breaker_key or provider)
+    retries = PROVIDER_SETTINGS[provider]['retries']
+    last_error = None
+    started = time.perf_counter()
+
+    for attempt in range(retries + 1):
+        if not breaker.allow():
+            raise CircuitOpenError(provider, "circuit breaker is open, skipping call")
+        _wait_for_turn(provider)
+        try:
+            result = func()
+            breaker.record_success()
+            _notify_observers(provider, started, True, attempt + 1)
+            return result
+        except Exception as e:
+            last_error = e
+            status_code, retry_after = _error_details(e)
+            if not _is_transient(e, status_code, PROVIDER_SETTINGS[provider].get('retry_statuses')):
+                # A bad request says nothing about the provider's health, so don't trip the breaker
+                breaker.release_probe()
+                break
+            breaker.record_failure()
+            if attempt == retries or status_code in no_retry_statuses:
+                break
+            delay = _backoff_delay(provider, attempt, retry_after)
+            print(f"      - {provider} call failed ({e}). Retrying in {delay:.1f}s (Attempt {attempt + 2}/{retries + 1})...")
+            time.sleep(delay)
+
+    _notify_observers(provider, started, False, attempt + 1)
+    if isinstance(last_error, ProviderError):
+        raise last_error
+    status_code, _ = _error_details(last_error)
+    raise ProviderError(provider, str(last_error), status_code) from last_error
+
+
+def _is_transient(error, status_code, retry_statuses=None):
+    """Network errors, timeouts, rate limits and 5xx responses are worth retrying."""
+    if retry_statuses is not None:
+        return status_code in retry_statuses
+    if status_code is not None:
+        return status_code in RETRYABLE_STATUSES
+    if isinstance(error, (requests.exceptions.RequestException, ProviderError)):
+        return True
+    # Groq SDK connection and timeout errors carry no status code
+    from groq import APIConnectionError
+    return isinstance(error, APIConnectionError)
+
+
+def _error_details(error):
+    """Extracts (status_code, retry_after) from requests, Groq and our own errors."""
+    response = getattr(error, 'response', None)
+    status_code = getattr(error, 'status_code', None)
+    if status_code is None and response is not None:
+        status_code = getattr(response, 'status_code', None)
+    retry_after = response.headers.get('retry-after') if response is not None and hasattr(response, 'headers') else None
+    return status_code, retry_after
+
+
+def request(provider, method, url, **kwargs):
+    """Sends an HTTP request through the provider's pool, raising ProviderError on failure."""
+    kwargs.setdefault('timeout', PROVIDER_SETTINGS[provider]['timeout'])
+    session = get_session(provider)
+
+    def send():
+        response = session.request(method, url, **kwargs)
+        if response.status_code >= 400:
+            error = ProviderError(provider, f"HTTP {response.status_code}: {response.text[:200]}", response.status_code)
+            error.response = response
+            raise error
+        return response
+
+    return call_with_retries(provider, send)
+
+
+def post(provider, url, **kwargs):
+    return request(provider, 'POST', url, **kwargs)
+
+
+# --- GROQ ---
+def get_groq_client():
+    """Returns the process-wide Groq client; its httpx pool is reused across calls."""
+    global _groq_client
+    if _groq_client is None:
+        from groq import Groq
+        with _state_lock:
+            if _groq_client is None:
+                _groq_client = Groq(
+                    api_key=os.getenv("GROQ_API_KEY") or os.getenv("GROQ_APISEC_KEY"),
+                    base_url=os.getenv("GROQ_BASE_URL") or None,
+                    timeout=PROVIDER_SETTINGS['groq']['timeout'],
+                    max_retries=0, # Retries are handled by call_with_retries
+                )
+    return _groq_client
+
+
+def groq_chat(cache_ttl=None, validate=None, retry_rate_limits=True, **kwargs):
+    """
+    Creates a Groq chat completion with pooling, retries and the circuit breaker.
+    With cache_ttl set, identical requests are answered from the LLM cache.
+    Each model has its own breaker, so one rate-limited model doesn't block the
+    others. With retry_rate_limits=False a 429 is raised at once, for callers
+    that fall back to another model instead.
+    """
+    client = get_groq_client()
+    no_retry = () if retry_rate_limits else (429,)
+
+    def create(**request):
+        return call_with_retries('groq', lambda: client.chat.completions.create(**request),
+                                 breaker_key=f"groq:{request.get('model')}", no_retry_statuses=no_retry)
+
+    if cache_ttl:
+        import llm_cache
+        return llm_cache.cached_completion(create, cache_ttl, validate=validate, **kwargs)
+    return create(**kwargs)
+
+
+# --- FIREWORKS ---
+def generate_image(prompt, width=1024, height=512):
+    """Calls the Fireworks.ai API and returns the raw image bytes."""
+    headers = {
+        "Accept": "image/jpeg",
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {os.getenv('FIREWORKS_API_KEY')}"
+    }
+    payload = {"prompt": f"{prompt}, cinematic, masterpiece, 8k", "height": height, "width": width}
+    response = post('fireworks', FIREWORKS_API_URL, headers=headers, json=payload)
+    if not response.content:
+        raise ProviderError('fireworks', "API did not return an image.")
+    return response.content
+
+
+# --- LIBRETRANSLATE ---
+def translate(text, target_language, source_language):
+    """Translates text with LibreTranslate, returning None if the service gives back nothing useful."""
+    payload = {'q': text, 'source': source_language, 'target': target_language, 'format': 'text'}
+    response = post('libretranslate', LIBRETRANSLATE_API_URL, json=payload)
+    translation = response.json().get('translatedText')
+    if translation and translation != text:
+        return translation
+    return None
+
+
+# --- FIREBASE ---
+def init_firebase():
+    """Initializes the Firebase Admin SDK once per process."""
+    import firebase_admin
+    from firebase_admin import credentials
+
+    with _firebase_lock:
+        if firebase_admin._apps:
+            return True
+        try:
+            base_dir = os.path.dirname(os.path.abspath(__file__))
+            cred = credentials.Certificate(os.path.join(base_dir, "firebase-credentials.json"))
+            firebase_admin.initialize_app(cred, {'storageBucket': os.getenv("FIREBASE_STORAGE_BUCKET")})
+            print("Firebase Admin SDK initialized successfully.")
+            return True
+        except Exception as e:
+            print(f"!!! CRITICAL: Failed to initialize Firebase Admin SDK: {e} !!!")
+            return False
+
+
+def get_bucket():
+    """Returns the default Firebase Storage bucket, initializing Firebase on first use."""
+    from firebase_admin import storage
+    init_firebase()
+    return storage.bucket()
+
+
+# --- CONCURRENCY ---
+_executor = None
+
+
+def map_concurrently(func, items, max_workers=None):
+    """
+    Runs func over items on a shared thread pool and returns the results in order.
+    Provider calls are I/O-bound, so threads let one process keep several in flight.
+    Each item runs in a copy of the caller's context, so tracing spans nest under the caller's.
+    """
+    global _executor
+    items = list(items)
+    if len(items) <= 1:
+        return [func(item) for item in items]
+    jobs = [(contextvars.copy_context(), item) for item in items]
+    run = lambda job: job[0].run(func, job[1])
+    if max_workers:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(run, jobs))
+    with _state_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=CONCURRENCY, thread_name_prefix="provider")
+    return list(_executor.map(run, jobs))
@@ -0,0 +1,256 @@
+# /backend/storage.py
+"""
+Where generated images are stored and served from.
+
+STORAGE_BACKEND picks one of:
+  - firebase: the Firebase Storage bucket (the default, as before)
+  - local:    a directory on disk, served by the app under /media/
+  - s3:       any S3-compatible store (AWS S3, Cloudflare R2, MinIO...), needs boto3
+
+Objects are stored under content-hashed keys (images/<sha256>.<ext>), so the
+same bytes are only uploaded once, a key's content never changes, and objects
+can be cached forever by browsers and CDNs without ever being invalidated.
+"""
+import hashlib
+import os
+import random
+import tempfile
+import threading
+
+# --- CONFIGURATION ---
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "firebase").lower()
+IMAGE_PREFIX = "images/"
+VARIANT_PREFIX = "images/variants/" # resized copies made by image_processing.py
+# Keys are content-addressed, so an object may be cached for a year and never revalidated
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LOCAL_STORAGE_DIR = os.getenv("LOCAL_STORAGE_DIR", os.path.join(BASE_DIR, "media"))
+LOCAL_STORAGE_URL = os.getenv("LOCAL_STORAGE_URL", "http://localhost:5001/media")
+
+S3_BUCKET = os.getenv("S3_BUCKET")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL") # e.g. http://localhost:9000 for MinIO
+S3_REGION = os.getenv("S3_REGION", "auto")
+S3_PUBLIC_URL = os.getenv("S3_PUBLIC_URL") # CDN or public bucket URL; defaults to the endpoint
+S3_PUBLIC_READ = os.getenv("S3_PUBLIC_READ", "false").lower() == "true" # set a public-read ACL on upload
+
+# (magic bytes, offset, content type, extension)
+_SIGNATURES = [
+    (b'\x89PNG\r\n\x1a\n', 0, 'image/png', 'png'),
+    (b'\xff\xd8\xff', 0, 'image/jpeg', 'jpg'),
+    (b'GIF8', 0, 'image/gif', 'gif'),
+    (b'WEBP', 8, 'image/webp', 'webp'),
+    (b'ftypavif', 4, 'image/avif', 'avif'),
+]
+
+
+def sniff_content_type(data):
+    """Returns (content_type, extension) from the file's magic bytes, not its name."""
+    for magic, offset, content_type, extension in _SIGNATURES:
+        if data[offset:offset + len(magic)] == magic:
+            return content_type, extension
+    return 'application/octet-stream', 'bin'
+
+
+def content_key(data, prefix=IMAGE_PREFIX):
+    """The immutable object key for some bytes: <prefix><sha256>.<ext>."""
+    _, extension = sniff_content_type(data)
+    return f"{prefix}{hashlib.sha256(data).hexdigest()}.{extension}"
+
+
+class StorageBackend:
+    """Subclasses implement exists(), put(), delete(), public_url() and list_keys()."""
+
+    def save(self, data, prefix=IMAGE_PREFIX, content_type=None):
+        """Uploads data unless an identical object exists and returns its public URL."""
+        key = content_key(data, prefix)
+        if self.exists(key):
+            print(f"  -> Storage: {key} already stored, reusing it.")
+        else:
+            self.put(key, data, content_type or sniff_content_type(data)[0])
+        return self.public_url(key)
+
+    def exists(self, key):
+        raise NotImplementedError
+
+    def put(self, key, data, content_type, cache_control=CACHE_CONTROL, content_encoding=None):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def public_url(self, key):
+        raise NotImplementedError
+
+    def list_keys(self, prefix):
+        raise NotImplementedError
+
+
+class FirebaseStorage(StorageBackend):
+    def _bucket(self):
+        from providers import get_bucket
+        return get_bucket()
+
+    def exists(self, key):
+        return self._bucket().blob(key).exists()
+
+    def put(self, key, data, content_type, cache_control=CACHE_CONTROL, content_encoding=None):
+        blob = self._bucket().blob(key)
+        blob.cache_control = cache_control
+        blob.content_encoding = content_encoding
+        blob.upload_from_string(data, content_type=content_type)
+        blob.make_public()
+
+    def delete(self, key):
+        blob = self._bucket().blob(key)
+        if blob.exists():
+            blob.delete()
+
+    def public_url(self, key):
+        return self._bucket().blob(key).public_url
+
+    def list_keys(self, prefix):
+        return [blob.name for blob in self._bucket().list_blobs(prefix=prefix) if blob.name != prefix]
+
+
+class LocalStorage(StorageBackend):
+    def __init__(self, root=LOCAL_STORAGE_DIR, base_url=LOCAL_STORAGE_URL):
+        self.root = root
+        self.base_url = base_url.rstrip('/')
+
+    def _path(self, key):
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(os.path.abspath(self.root) + os.sep):
+            raise ValueError(f"Invalid storage key: {key}")
+        return path
+
+    def exists(self, key):
+        return os.path.exists(self._path(key))
+
+    def put(self, key, data, content_type, cache_control=CACHE_CONTROL, content_encoding=None):
+        # Headers are up to the web server here (e.g. nginx gzip_static for .gz copies)
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename, so a reader never sees a half-written file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def delete(self, key):
+        path = self._path(key)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def public_url(self, key):
+        return f"{self.base_url}/{key}"
+
+    def list_keys(self, prefix):
+        directory = self._path(prefix) if prefix.strip('/') else os.path.abspath(self.root)
+        if not os.path.isdir(directory):
+            return []
+        return [prefix + name for name in os.listdir(directory)
+                if not name.startswith(('.', 'tmp')) and os.path.isfile(os.path.join(directory, name))]
+
+
+class S3Storage(StorageBackend):
+    def __init__(self, bucket=S3_BUCKET, endpoint_url=S3_ENDPOINT_URL, region=S3_REGION, public_url=S3_PUBLIC_URL):
+        try:
+            import boto3
+            from botocore.config import Config as BotoConfig
+        except ImportError:
+            raise RuntimeError("STORAGE_BACKEND=s3 needs boto3. Run: pip install boto3")
+        if not bucket:
+            raise RuntimeError("STORAGE_BACKEND=s3 needs S3_BUCKET to be set.")
+
+        self.bucket = bucket
+        # Credentials come from the usual AWS_ACCESS_KEY_ID / AWS_SECRET_ACCESS_KEY variables.
+        # Path-style addressing works with MinIO and other self-hosted stores.
+        self.client = boto3.client('s3', endpoint_url=endpoint_url, region_name=region,
+                                   config=BotoConfig(s3={'addressing_style': 'path'}, retries={'max_attempts': 3}))
+        base = public_url or f"{(endpoint_url or f'https://s3.{region}.amazonaws.com').rstrip('/')}/{bucket}"
+        self.base_url = base.rstrip('/')
+
+    def exists(self, key):
+        from botocore.exceptions import ClientError
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+    def put(self, key, data, content_type, cache_control=CACHE_CONTROL, content_encoding=None):
+        extra = {'ACL': 'public-read'} if S3_PUBLIC_READ else {}
+        if content_encoding:
+            extra['ContentEncoding'] = content_encoding
+        self.client.put_object(Bucket=self.bucket, Key=key, Body=data,
+                               ContentType=content_type, CacheControl=cache_control, **extra)
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+    def public_url(self, key):
+        return f"{self.base_url}/{key}"
+
+    def list_keys(self, prefix):
+        keys = []
+        for page in self.client.get_paginator('list_objects_v2').paginate(Bucket=self.bucket, Prefix=prefix):
+            keys.extend(item['Key'] for item in page.get('Contents', []) if item['Key'] != prefix)
+        return keys
+
+
+BACKENDS = {
+    'firebase': FirebaseStorage,
+    'local': LocalStorage,
+    's3': S3Storage,
+}
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def get_storage():
+    """Returns the configured storage backend, created once per process."""
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            if STORAGE_BACKEND not in BACKENDS:
+                raise RuntimeError(f"Unknown STORAGE_BACKEND '{STORAGE_BACKEND}'. Use one of: {', '.join(BACKENDS)}")
+            _storage = BACKENDS[STORAGE_BACKEND]()
+        return _storage
+
+
+def upload_image(image_bytes):
+    """Stores a generated image and returns its public URL."""
+    image_url = get_storage().save(image_bytes)
+    print(f"  -> Image stored: {image_url}")
+    return image_url
+
+
+def get_random_fallback_image():
+    """Returns the public URL of a random stored image, or None."""
+    try:
+        print("--- Initiating fallback: picking an existing stored image ---")
+        storage = get_storage()
+        keys = [key for key in storage.list_keys(IMAGE_PREFIX) if not key.startswith(VARIANT_PREFIX)]
+        if not keys:
+            print("--- Fallback failed: No existing images found in storage. ---")
+            return None
+        random_url = storage.public_url(random.choice(keys))
+        print(f"--- Fallback successful. Selected random image: {random_url} ---")
+        return random_url
+    except Exception as e:
+        print(f"--- Fallback failed with an error: {e} ---")
+        return None
+
+
+if __name__ == '__main__':
+    # Smoke check for the configured backend, e.g. against a local MinIO:
+    # STORAGE_BACKEND=s3 S3_ENDPOINT_URL=http://localhost:9000 S3_BUCKET=test python storage.py
+    sample = b'\x89PNG\r\n\x1a\n' + os.urandom(32)
+    first = upload_image(sample)
+    second = upload_image(sample)
+    assert first == second, "Identical uploads should share one key"
+    print(f"{STORAGE_BACKEND}: stored and deduplicated {first}")
@@ -0,0 +1,272 @@
+# /backend/streaming.py
+"""
+Streaming article generation.
+
+Groq's streamed tokens are fed through an incremental parser for the flat
+JSON object our prompts ask for, so each field is available as soon as it
+is complete. If the stream is cut off, the fields that did finish are kept
+and only the missing or truncated ones are regenerated.
+"""
+import json
+import re
+import time
+
+from prompts import get_content_continuation_prompt, get_field_repair_prompt
+from model_router import route_chat
+
+# Fields a generated article must have before it can be saved
+REQUIRED_FIELDS = ['title', 'slug', 'meta_description', 'category', 'content']
+
+# How often (in characters received) a progress event is emitted
+PROGRESS_EVERY = 2000
+
+# A backslash escape cut off at the end of a string: an odd run of backslashes, maybe with part of a \uXXXX
+_DANGLING_ESCAPE_RE = re.compile(r'(?<!\\)(?:\\\\)*(\\(?:u[0-9a-fA-F]{0,3})?)$')
+
+# States of IncrementalJSONParser
+_BEFORE_OBJECT, _EXPECT_KEY, _IN_KEY, _EXPECT_COLON, _EXPECT_VALUE, _IN_STRING, _IN_OTHER, _DONE = range(8)
+
+
+class IncrementalJSONParser:
+    """
+    Parses a flat JSON object one chunk at a time.
+
+    Completed top-level fields land in `fields` as soon as their closing
+    quote arrives. The model sometimes wraps long content in Python-style
+    triple quotes, which is accepted too.
+    """
+
+    def __init__(self):
+        self.fields = {}
+        self.state = _BEFORE_OBJECT
+        self.current_key = None
+        self.completed = [] # Field names in the order they finished
+        self._buffer = []
+        self._escaped = False
+        self._triple = False
+        self._quote_run = 0
+        self._depth = 0
+        self._other_in_string = False
+
+    @property
+    def done(self):
+        return self.state == _DONE
+
+    def feed(self, chunk):
+        """Consumes a chunk and returns the names of the fields it completed."""
+        finished = []
+        for char in chunk:
+            key = self._step(char)
+            if key is not None:
+                finished.append(key)
+        return finished
+
+    def partial_field(self):
+        """Returns (name, decoded text so far) of a string field cut off mid-value, or (None, None)."""
+        if self.state != _IN_STRING:
+            return None, None
+        raw = ''.join(self._buffer)
+        if self._triple:
+            return self.current_key, raw.rstrip('"')
+        # Drop a dangling escape sequence so the prefix still decodes
+        dangling = _DANGLING_ESCAPE_RE.search(raw)
+        if dangling:
+            raw = raw[:dangling.start(1)]
+        try:
+            return self.current_key, json.loads(f'"{raw}"', strict=False)
+        except ValueError:
+            return self.current_key, raw
+
+    def _finish_value(self, value):
+        self.fields[self.current_key] = value
+        self.completed.append(self.current_key)
+        key, self.current_key, self._buffer = self.current_key, None, []
+        self.state = _EXPECT_KEY
+        return key
+
+    def _step(self, char):
+        state = self.state
+
+        if state == _BEFORE_OBJECT:
+            if char == '{':
+                self.state = _EXPECT_KEY
+        elif state == _EXPECT_KEY:
+            if char == '"':
+                self.state, self._buffer, self._escaped = _IN_KEY, [], False
+            elif char == '}':
+                self.state = _DONE
+        elif state == _IN_KEY:
+            if self._escaped:
+                self._escaped = False
+                self._buffer.append(char)
+            elif char == '\\':
+                self._escaped = True
+                self._buffer.append(char)
+            elif char == '"':
+                self.current_key = json.loads(f'"{"".join(self._buffer)}"', strict=False)
+                self.state = _EXPECT_COLON
+            else:
+                self._buffer.append(char)
+        elif state == _EXPECT_COLON:
+            if char == ':':
+                self.state = _EXPECT_VALUE
+        elif state == _EXPECT_VALUE:
+            if char == '"':
+                self.state, self._buffer, self._escaped = _IN_STRING, [], False
+                self._triple, self._quote_run = False, 1
+            elif not char.isspace():
+                self.state, self._buffer = _IN_OTHER, [char]
+                self._depth = 1 if char in '[{' else 0
+                self._other_in_string = False
+        elif state == _IN_STRING:
+            return self._step_string(char)
+        elif state == _IN_OTHER:
+            return self._step_other(char)
+        return None
+
+    def _step_string(self, char):
+        # Detect an opening triple quote: the value starts with three quotes
+        if self._quote_run and not self._buffer:
+            if char == '"':
+                self._quote_run += 1
+                if self._quote_run == 3:
+                    self._triple, self._quote_run = True, 0
+                return None
+            if self._quote_run == 2:
+                # It was just an empty string
+                self._quote_run = 0
+                key = self._finish_value('')
+                self._step(char)
+                return key
+            self._quote_run = 0
+
+        if self._triple:
+            self._buffer.append(char)
+            if len(self._buffer) >= 3 and self._buffer[-3:] == ['"', '"', '"']:
+                return self._finish_value(''.join(self._buffer[:-3]))
+            return None
+
+        if self._escaped:
+            self._escaped = False
+            self._buffer.append(char)
+        elif char == '\\':
+            self._escaped = True
+            self._buffer.append(char)
+        elif char == '"':
+            raw = ''.join(self._buffer)
+            try:
+                value = json.loads(f'"{raw}"', strict=False)
+            except ValueError:
+                value = raw
+            return self._finish_value(value)
+        else:
+            self._buffer.append(char)
+        return None
+
+    def _step_other(self, char):
+        # Numbers, booleans, arrays and nested objects: track depth until the value ends
+        if self._other_in_string:
+            self._buffer.append(char)
+            if self._escaped:
+                self._escaped = False
+            elif char == '\\':
+                self._escaped = True
+            elif char == '"':
+                self._other_in_string = False
+            return None
+        if char in ',}' and self._depth == 0:
+            raw = ''.join(self._buffer).strip()
+            try:
+                value = json.loads(raw)
+            except ValueError:
+                value = raw
+            key = self._finish_value(value)
+            if char == '}':
+                self.state = _DONE
+            return key
+        self._buffer.append(char)
+        if char == '"':
+            self._other_in_string = True
+        elif char in '[{':
+            self._depth += 1
+        elif char in ']}':
+            self._depth -= 1
+        return None
+
+
+def stream_article(prompt, temperature=0.7):
+    """
+    Streams a JSON article completion from Groq, yielding ('progress', ...) and
+    ('field', ...) events, and finally ('result', {...}) with the parsed fields,
+    any truncated partial field and the stream's finish reason.
+    """
+    parser = IncrementalJSONParser()
+    received, next_progress, finish_reason = 0, PROGRESS_EVERY, None
+    started = time.monotonic()
+
+    stream = route_chat('long_form',
+        messages=[{"role": "user", "content": prompt}],
+        temperature=temperature,
+        stream=True,
+    )
+    try:
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            choice = chunk.choices[0]
+            text = choice.delta.content or ''
+            finish_reason = choice.finish_reason or finish_reason
+            received += len(text)
+            for name in parser.feed(text):
+                yield 'field', {'name': name}
+            if received >= next_progress:
+                next_progress += PROGRESS_EVERY
+                yield 'progress', {
+                    'chars': received,
+                    'fields': list(parser.completed),
+                    'elapsed': round(time.monotonic() - started, 1),
+                }
+    except Exception as e:
+        # A dropped connection is treated like a truncated stream: keep what we have
+        print(f"Stream interrupted after {received} characters: {e}")
+        finish_reason = 'interrupted'
+
+    partial_name, partial_value = parser.partial_field()
+    yield 'result', {
+        'fields': dict(parser.fields),
+        'partial': {partial_name: partial_value} if partial_name else {},
+        'finish_reason': finish_reason,
+        'complete': parser.done,
+    }
+
+
+def repair_fields(query, fields, partial):
+    """
+    Fills in missing fields one by one. A truncated article body is continued
+    from where it stopped instead of being written again from scratch.
+    Yields ('repair', {'field': name}) for each field it regenerates and
+    finally ('result', data) with the completed article.
+    """
+    data = dict(fields)
+    for name in REQUIRED_FIELDS:
+        if data.get(name):
+            continue
+        yield 'repair', {'field': name}
+
+        if name == 'content' and partial.get('content'):
+            so_far = partial['content']
+            prompt = get_content_continuation_prompt(query, data.get('title', query), so_far)
+            completion = route_chat('long_form', messages=[{"role": "user", "content": prompt}], temperature=0.7)
+            data['content'] = so_far + completion.choices[0].message.content
+            continue
+
+        prompt = get_field_repair_prompt(query, name, {k: v for k, v in data.items() if k != 'content'})
+        completion = route_chat('repair',
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.5,
+            response_format={"type": "json_object"},
+        )
+        data[name] = json.loads(completion.choices[0].message.content, strict=False).get(name)
+        if not data[name]:
+            raise ValueError(f"Could not regenerate the '{name}' field.")
+    yield 'result', data
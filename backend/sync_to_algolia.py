@@ -4,7 +4,8 @@ from dotenv import load_dotenv
 from algoliasearch.search_client import SearchClient
 
 # This script needs access to your Flask app and models
-from app import app, Article
+from config import create_worker_app
+from models import Article
 
 # Load environment variables from .env file
 load_dotenv()
@@ -14,6 +15,8 @@ ALGOLIA_APP_ID = os.getenv("ALGOLIA_APP_ID")
 ALGOLIA_ADMIN_API_KEY = os.getenv("ALGOLIA_ADMIN_API_KEY")
 ALGOLIA_INDEX_NAME = "articles" # The name of the index you created
 
+app = create_worker_app()
+
 def sync_articles():
     """
     Fetches all published articles from the database and syncs them with Algolia.
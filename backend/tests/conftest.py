@@ -0,0 +1,62 @@
+# /backend/tests/conftest.py
+"""
+Shared setup for the backend tests: run from backend/ with `python -m pytest`.
+
+Tests use SQLite and never touch the network. Anything that needs an app
+gets one from make_app(), bound to a fresh database file.
+
+A few tests need Postgres and are skipped unless these point at scratch
+databases (their tables are dropped and recreated):
+
+    TEST_POSTGRES_URL           a primary
+    TEST_POSTGRES_REPLICA_URL   a second, independent instance used as a replica
+    TEST_PGBOUNCER_URL          TEST_POSTGRES_URL's database through PgBouncer in transaction mode
+"""
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+# Config is read at import time; keep it away from a developer's .env database
+os.environ['DATABASE_URL'] = 'sqlite://'
+os.environ.setdefault('CREATE_TABLES_ON_STARTUP', 'false')
+os.environ.setdefault('LLM_CACHE_ENABLED', 'false')
+
+import pytest
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """Returns create_app(config) with a fresh SQLite database file and its tables created."""
+    from app import create_app
+    from models import db
+
+    def factory(config=None):
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}",
+                          'CREATE_TABLES_ON_STARTUP': False, 'ADMIN_SECRET_KEY': 'test-admin-key', **(config or {})})
+        with app.app_context():
+            db.create_all(bind_key=None)
+        return app
+    return factory
+
+
+def _env_url(name):
+    url = os.getenv(name)
+    if not url:
+        pytest.skip(f"{name} is not set")
+    return url
+
+
+@pytest.fixture
+def postgres_url():
+    return _env_url('TEST_POSTGRES_URL')
+
+
+@pytest.fixture
+def replica_url():
+    return _env_url('TEST_POSTGRES_REPLICA_URL')
+
+
+@pytest.fixture
+def pgbouncer_url():
+    return _env_url('TEST_PGBOUNCER_URL')
@@ -0,0 +1,34 @@
+# /backend/tests/test_archive.py
+"""Archived content reads back whole, is decompressed once per instance, and an edit brings it back."""
+import datetime
+
+import archive
+from models import db, Article
+
+BODY = "An old article about tide pools. [IMAGE: a tide pool at dawn] " * 20
+
+
+def test_archived_content_is_decompressed_once(make_app, monkeypatch):
+    monkeypatch.setattr(archive, 'ARCHIVE_CODEC', 'zlib')
+    calls = []
+    decompress = archive.decompress
+    monkeypatch.setattr(archive, 'decompress', lambda *args: calls.append(args) or decompress(*args))
+
+    app = make_app()
+    with app.app_context():
+        article = Article(slug='tide-pools', lang='en', title='Tide pools', meta_description='Old', content=BODY,
+                          created_at=datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc))
+        db.session.add(article)
+        db.session.commit()
+        assert archive.archive_old_articles(days=30) == 1
+        db.session.expire_all()
+
+        article = Article.query.filter_by(slug='tide-pools').one()
+        assert article._content == ''
+        assert article.content == BODY and article.to_dict()['content'] and article.content == BODY
+        assert len(calls) == 1
+
+        article.content = "Rewritten."
+        assert article.content == "Rewritten." and article.archive is None
+        db.session.commit()
+        assert db.session.get(Article, article.id).content == "Rewritten."
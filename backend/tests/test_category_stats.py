@@ -0,0 +1,77 @@
+# /backend/tests/test_category_stats.py
+"""category_stats stays equal to a full recompute through every kind of article change."""
+from collections import defaultdict
+
+import pytest
+
+from models import db, Article, Category, CategoryStat
+from persistence import save_translations
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app()
+    with app.app_context():
+        db.session.add_all([Category(name='Science', slug='science'), Category(name='Travel', slug='travel')])
+        db.session.commit()
+        yield app
+
+
+def stored():
+    return {(stat.category_id, stat.lang): (stat.published_count, stat.latest_article_at)
+            for stat in CategoryStat.query if stat.published_count}
+
+
+def recomputed():
+    counts, latest = defaultdict(int), {}
+    for article in Article.query.filter_by(is_published=True):
+        for category in article.categories:
+            key = (category.id, article.lang)
+            counts[key] += 1
+            latest[key] = max(filter(None, [latest.get(key), article.created_at]), default=None)
+    return {key: (count, latest[key]) for key, count in counts.items()}
+
+
+def category(slug):
+    return Category.query.filter_by(slug=slug).one()
+
+
+def test_stats_match_a_full_recompute_after_each_change(app):
+    def check():
+        db.session.expire_all()
+        assert stored() == recomputed()
+
+    # Add
+    science, travel = category('science'), category('travel')
+    db.session.add_all([
+        Article(slug='tide-pools', title='Tide pools', meta_description='.', content='.', categories=[science]),
+        Article(slug='comets', title='Comets', meta_description='.', content='.', categories=[science, travel]),
+    ])
+    db.session.commit()
+    check()
+    assert stored()[(category('science').id, 'en')][0] == 2
+
+    # Translate
+    original = Article.query.filter_by(slug='comets').one()
+    save_translations(original, {lang: {'slug': f"comets-{lang}", 'title': 'Comets', 'meta_description': '.', 'content': '.'}
+                                 for lang in ('fr', 'es')})
+    check()
+    assert stored()[(category('travel').id, 'fr')][0] == 1
+
+    # Unpublish
+    Article.query.filter_by(slug='comets-fr').one().is_published = False
+    db.session.commit()
+    check()
+    assert (category('travel').id, 'fr') not in stored()
+
+    # Recategorize
+    Article.query.filter_by(slug='tide-pools').one().categories = [category('travel')]
+    db.session.commit()
+    check()
+    assert stored()[(category('science').id, 'en')][0] == 1
+
+    # Delete
+    db.session.delete(Article.query.filter_by(slug='comets').one())
+    db.session.commit()
+    check()
+    assert (category('science').id, 'en') not in stored()
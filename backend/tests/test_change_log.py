@@ -0,0 +1,84 @@
+# /backend/tests/test_change_log.py
+"""Image fills made with bulk updates still reach the change log, so feeds and snapshots pick them up."""
+import json
+
+import pytest
+
+import change_log
+import export
+import image_processing
+from app import mark_article_image_ready
+from models import db, Article
+
+CONSUMER = 'test'
+IMAGE_URL = 'https://cdn.example.com/images/abc.webp'
+VARIANTS = {'webp': [{'width': 480, 'url': 'https://cdn.example.com/variants/abc-480.webp'}]}
+
+
+@pytest.fixture
+def app(make_app, monkeypatch):
+    monkeypatch.setattr(change_log, 'SETTLE_SECONDS', 0)
+    app = make_app()
+    with app.app_context():
+        article = Article(slug='tide-pools', lang='en', title='Tide pools', meta_description='Tide pools',
+                          content="Intro. [IMAGE: a tide pool at dawn] More.")
+        article.sync_images()
+        db.session.add(article)
+        db.session.commit()
+    return app
+
+
+def caught_up(consumer):
+    """Moves the consumer's cursor past every change so far."""
+    change_log.advance(consumer, change_log.latest_change_id())
+
+
+def test_an_image_fill_is_logged(app):
+    with app.app_context():
+        caught_up(CONSUMER)
+        article = Article.query.filter_by(slug='tide-pools').one()
+        assert mark_article_image_ready(article.images[0], article.id, IMAGE_URL)
+        changed, _ = change_log.read_changes(CONSUMER)
+        assert changed == {article.id}
+
+
+def test_attached_variants_are_logged(app, monkeypatch):
+    monkeypatch.setattr(image_processing, 'process_image', lambda image_bytes: VARIANTS)
+    with app.app_context():
+        article = Article.query.filter_by(slug='tide-pools').one()
+        mark_article_image_ready(article.images[0], article.id, IMAGE_URL)
+        image_id, article_id = article.images[0].id, article.id
+        caught_up(CONSUMER)
+    image_processing._process_and_attach(app, image_id, IMAGE_URL, b'image')
+    with app.app_context():
+        changed, _ = change_log.read_changes(CONSUMER)
+        assert changed == {article_id}
+
+
+def test_an_incremental_export_rewrites_an_article_after_its_image_fill(app, tmp_path):
+    root = tmp_path / 'snapshots'
+    with app.app_context():
+        target = export.Target(str(root), str(tmp_path / 'manifest.json'), workers=1)
+        export.export(full=True, workers=1, target=target)
+        path = root / 'articles' / 'en' / 'tide-pools.json'
+        assert IMAGE_URL not in path.read_text()
+
+        article = Article.query.filter_by(slug='tide-pools').one()
+        mark_article_image_ready(article.images[0], article.id, IMAGE_URL)
+        target = export.Target(str(root), str(tmp_path / 'manifest.json'), workers=1)
+        assert export.export(workers=1, target=target) == 1
+        assert json.loads(path.read_text())['image_url'] == IMAGE_URL
+
+
+def test_prune_waits_for_every_consumer(app):
+    with app.app_context():
+        first = change_log.latest_change_id()
+        assert first
+        change_log.advance('feeds', first)
+        # export hasn't run yet: it still needs the changes feeds is done with
+        assert change_log.prune() == 0
+        assert change_log.read_changes('export')[0]
+
+        change_log.advance('export', first)
+        assert change_log.prune() > 0
+        assert change_log.latest_change_id() == 0
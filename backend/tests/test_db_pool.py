@@ -0,0 +1,155 @@
+# /backend/tests/test_db_pool.py
+"""
+engine_options() turns the DB_* variables into pool settings. With Postgres
+(and PgBouncer) available, more threads than connections check out at once.
+"""
+import threading
+
+import pytest
+from sqlalchemy import create_engine, exc, text
+
+import db_pool
+from db_pool import TimedNullPool, TimedQueuePool, engine_options
+from models import db
+
+POSTGRES = 'postgresql://localhost/blog'
+PSYCOPG3 = 'postgresql+psycopg://localhost/blog'
+DB_VARIABLES = ('DB_POOL', 'DB_POOL_SIZE', 'DB_MAX_OVERFLOW', 'DB_POOL_TIMEOUT',
+                'DB_POOL_RECYCLE', 'DB_POOL_PRE_PING', 'DB_PGBOUNCER')
+
+
+@pytest.fixture(autouse=True)
+def clean_env(monkeypatch):
+    for name in DB_VARIABLES:
+        monkeypatch.delenv(name, raising=False)
+
+
+def test_queue_pool_defaults():
+    options = engine_options(POSTGRES)
+    assert options['poolclass'] is TimedQueuePool
+    assert options['pool_pre_ping'] is True
+    assert (options['pool_recycle'], options['pool_timeout']) == (300, 30.0)
+    # SQLAlchemy's own size applies until DB_POOL_SIZE is set
+    assert 'pool_size' not in options and 'max_overflow' not in options
+
+
+def test_pool_size_from_the_environment(monkeypatch):
+    monkeypatch.setenv('DB_POOL_SIZE', '8')
+    monkeypatch.setenv('DB_POOL_TIMEOUT', '2.5')
+    monkeypatch.setenv('DB_POOL_PRE_PING', 'false')
+    options = engine_options(POSTGRES)
+    assert (options['pool_size'], options['max_overflow']) == (8, 2)
+    assert options['pool_timeout'] == 2.5 and options['pool_pre_ping'] is False
+
+    monkeypatch.setenv('DB_MAX_OVERFLOW', '0')
+    assert engine_options(POSTGRES)['max_overflow'] == 0
+
+    monkeypatch.setenv('DB_POOL_SIZE', 'eight')
+    with pytest.raises(ValueError):
+        engine_options(POSTGRES)
+
+
+def test_pgbouncer_mode(monkeypatch):
+    monkeypatch.setenv('DB_PGBOUNCER', 'true')
+    assert engine_options(POSTGRES) == {'poolclass': TimedNullPool}
+    # psycopg 3 would prepare statements on a server connection the next transaction may not get
+    assert engine_options(PSYCOPG3) == {'poolclass': TimedNullPool, 'connect_args': {'prepare_threshold': None}}
+    # An explicit DB_POOL still wins over the PgBouncer default
+    monkeypatch.setenv('DB_POOL', 'queue')
+    options = engine_options(PSYCOPG3)
+    assert options['poolclass'] is TimedQueuePool and options['connect_args'] == {'prepare_threshold': None}
+
+
+def test_unknown_pool_is_rejected(monkeypatch):
+    monkeypatch.setenv('DB_POOL', 'static')
+    with pytest.raises(ValueError):
+        engine_options(POSTGRES)
+
+
+def test_in_memory_sqlite_keeps_flask_sqlalchemys_pool():
+    assert engine_options('sqlite://') == {}
+    assert engine_options('sqlite:///:memory:') == {}
+
+
+def test_app_engine_uses_the_options(make_app, monkeypatch):
+    monkeypatch.setenv('DB_POOL_SIZE', '3')
+    with make_app().app_context():
+        pool = db.engine.pool
+        assert isinstance(pool, TimedQueuePool) and pool.size() == 3
+
+
+# --- CONCURRENT CHECKOUTS (Postgres) ---
+def run_concurrently(engine, threads, hold_seconds):
+    """Each thread checks out a connection and holds it; returns (outcomes, peak connections held at once)."""
+    outcomes, lock = [], threading.Lock()
+    held, peak = [0], [0]
+
+    def work():
+        try:
+            with engine.connect() as connection:
+                with lock:
+                    held[0] += 1
+                    peak[0] = max(peak[0], held[0])
+                connection.execute(text("SELECT pg_sleep(:seconds)"), {'seconds': hold_seconds})
+                with lock:
+                    held[0] -= 1
+            outcomes.append('ok')
+        except exc.TimeoutError:
+            outcomes.append('timeout')
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return outcomes, peak[0]
+
+
+@pytest.fixture
+def checkouts(monkeypatch):
+    observed = []
+    observer = lambda seconds, ok: observed.append((seconds, ok))
+    monkeypatch.setattr(db_pool, '_checkout_observers', [observer])
+    return observed
+
+
+@pytest.mark.parametrize('url_fixture', ['postgres_url', 'pgbouncer_url'])
+def test_checkouts_wait_for_a_free_connection(request, url_fixture, monkeypatch, checkouts):
+    url = request.getfixturevalue(url_fixture)
+    monkeypatch.setenv('DB_POOL', 'queue')
+    monkeypatch.setenv('DB_POOL_SIZE', '2')
+    monkeypatch.setenv('DB_MAX_OVERFLOW', '0')
+    monkeypatch.setenv('DB_POOL_TIMEOUT', '10')
+    engine = create_engine(url, **engine_options(url))
+    try:
+        outcomes, peak = run_concurrently(engine, threads=6, hold_seconds=0.3)
+    finally:
+        engine.dispose()
+    assert outcomes == ['ok'] * 6 and peak == 2
+    # Four of them queued behind the first two, and the wait was timed
+    assert len(checkouts) == 6 and all(ok for _, ok in checkouts)
+    assert sum(seconds >= 0.25 for seconds, _ in checkouts) >= 4
+
+
+def test_a_checkout_gives_up_after_the_pool_timeout(postgres_url, monkeypatch, checkouts):
+    monkeypatch.setenv('DB_POOL_SIZE', '2')
+    monkeypatch.setenv('DB_MAX_OVERFLOW', '0')
+    monkeypatch.setenv('DB_POOL_TIMEOUT', '0.2')
+    engine = create_engine(postgres_url, **engine_options(postgres_url))
+    try:
+        outcomes, peak = run_concurrently(engine, threads=5, hold_seconds=1.5)
+    finally:
+        engine.dispose()
+    assert sorted(outcomes) == ['ok', 'ok', 'timeout', 'timeout', 'timeout'] and peak == 2
+    failed = [seconds for seconds, ok in checkouts if not ok]
+    assert len(failed) == 3 and all(0.2 <= seconds < 1.5 for seconds in failed)
+
+
+def test_pgbouncer_queues_more_clients_than_server_connections(pgbouncer_url, monkeypatch, checkouts):
+    # The default in PgBouncer mode: no pool of our own, PgBouncer's pool (whatever its size) makes clients wait
+    monkeypatch.setenv('DB_PGBOUNCER', 'true')
+    engine = create_engine(pgbouncer_url, **engine_options(pgbouncer_url))
+    try:
+        outcomes, _ = run_concurrently(engine, threads=12, hold_seconds=0.2)
+    finally:
+        engine.dispose()
+    assert outcomes == ['ok'] * 12 and len(checkouts) == 12
@@ -0,0 +1,140 @@
+# /backend/tests/test_db_routing.py
+"""
+@replica_reads reads from the replica; writes, locking reads, admin requests
+and a down replica use the primary. The primary and the replica are two
+SQLite files holding different articles, so the answer shows which one ran.
+The Postgres tests do the same with two Postgres databases.
+"""
+import pytest
+from flask import g, jsonify
+from sqlalchemy import text
+
+import db_routing
+from db_routing import replica_reads
+from models import db, Article, Category
+
+ADMIN_KEY = 'test-admin-key'
+
+
+def seed(app, bind_key, slug):
+    with app.app_context():
+        engine = db.engines[bind_key]
+        db.metadata.drop_all(bind=engine)
+        db.metadata.create_all(bind=engine)
+        with engine.begin() as connection:
+            connection.execute(Category.__table__.insert().values(name=slug, slug=slug))
+            connection.execute(Article.__table__.insert().values(
+                slug=slug, lang='en', title=slug, meta_description=slug, content=slug,
+                is_published=True, is_breaking_news=True))
+
+
+@pytest.fixture
+def routed_app(make_app, tmp_path):
+    """An app whose primary holds 'primary-only' and whose replicas hold 'replica-only'. down=True adds an unreachable one first."""
+    def factory(healthy=1, down=False):
+        db_routing._health.clear()
+        replicas = [f"sqlite:///{tmp_path / f'replica-{i}.db'}" for i in range(healthy)]
+        if down:
+            replicas.insert(0, f"sqlite:///{tmp_path / 'missing' / 'none.db'}")
+        app = make_app({'SQLALCHEMY_BINDS': db_routing.replica_binds(','.join(replicas)), 'REPLICA_CHECK_SECONDS': 60})
+        seed(app, None, 'primary-only')
+        for key in db_routing.replica_keys(app)[1 if down else 0:]:
+            seed(app, key, 'replica-only')
+        return app
+    return factory
+
+
+def article_slugs(client, headers=None):
+    return [a['slug'] for a in client.get('/api/articles', headers=headers or {}).get_json()['articles']]
+
+
+def test_reads_go_to_the_replica(routed_app):
+    client = routed_app().test_client()
+    assert article_slugs(client) == ['replica-only']
+    assert [c['slug'] for c in client.get('/api/categories').get_json()] == ['replica-only']
+    # Not replicated yet: the 404 is retried on the primary
+    assert client.get('/api/get-article/primary-only').status_code == 200
+
+
+def test_admin_requests_read_the_primary(routed_app):
+    client = routed_app().test_client()
+    assert article_slugs(client, {'x-admin-secret-key': ADMIN_KEY}) == ['primary-only']
+
+
+def test_writes_and_locking_reads_go_to_the_primary(routed_app):
+    app = routed_app()
+
+    @replica_reads
+    def touch():
+        plain = Article.query.filter_by(slug='primary-only').first()
+        locked = Article.query.filter_by(slug='primary-only').with_for_update().first()
+        db.session.add(Category(name='Written', slug='written'))
+        db.session.commit()
+        return jsonify(plain=plain is not None, locked=locked is not None)
+
+    app.add_url_rule('/test/touch', view_func=touch)
+    assert app.test_client().get('/test/touch').get_json() == {'plain': False, 'locked': True}
+    with app.app_context():
+        assert db.session.query(Category).filter_by(slug='written').count() == 1
+        replica = db.engines[db_routing.replica_keys(app)[0]]
+        with replica.connect() as connection:
+            slugs = [row.slug for row in connection.execute(Category.__table__.select())]
+        assert slugs == ['replica-only']
+
+
+def test_a_down_replica_falls_back_to_the_primary(routed_app):
+    assert article_slugs(routed_app(healthy=0, down=True).test_client()) == ['primary-only']
+    # With a healthy replica as well, the down one is skipped
+    client = routed_app(healthy=1, down=True).test_client()
+    assert all(article_slugs(client) == ['replica-only'] for _ in range(4))
+
+
+# --- POSTGRES ---
+RECOVERY_CONFLICT = text("""
+    DO $$ BEGIN
+        RAISE EXCEPTION USING ERRCODE = '40001', MESSAGE = 'canceling statement due to conflict with recovery';
+    END $$
+""")
+
+
+@pytest.fixture
+def postgres_app(make_app, postgres_url, replica_url):
+    """The routed_app setup on Postgres: TEST_POSTGRES_URL as the primary, TEST_POSTGRES_REPLICA_URL as its replica."""
+    def factory(**config):
+        db_routing._health.clear()
+        app = make_app({'SQLALCHEMY_DATABASE_URI': postgres_url, 'SQLALCHEMY_BINDS': db_routing.replica_binds(replica_url),
+                        'REPLICA_CHECK_SECONDS': 60, **config})
+        seed(app, None, 'primary-only')
+        seed(app, db_routing.replica_keys(app)[0], 'replica-only')
+        return app
+    return factory
+
+
+def test_postgres_lag_is_measured(postgres_app):
+    app = postgres_app()
+    with app.app_context():
+        key = db_routing.replica_keys(app)[0]
+        assert db_routing.measure_lag(db.engines[key]) >= 0
+    assert article_slugs(app.test_client()) == ['replica-only']
+    assert db_routing._health[key]['usable'] and db_routing._health[key]['lag'] is not None
+
+
+def test_a_lagging_postgres_replica_is_skipped(postgres_app):
+    # Any lag, even none, is over a negative limit
+    assert article_slugs(postgres_app(REPLICA_MAX_LAG_SECONDS=-1).test_client()) == ['primary-only']
+
+
+def test_a_recovery_conflict_retries_on_the_primary(postgres_app):
+    app = postgres_app()
+
+    @replica_reads
+    def conflicted():
+        if g.get('db_replica'):
+            db.session.execute(RECOVERY_CONFLICT)
+        return jsonify(slugs=[article.slug for article in Article.query])
+
+    app.add_url_rule('/test/conflicted', view_func=conflicted)
+    assert app.test_client().get('/test/conflicted').get_json() == {'slugs': ['primary-only']}
+    assert not db_routing._health[db_routing.replica_keys(app)[0]]['usable']
+    # Until its next check, reads stay on the primary
+    assert article_slugs(app.test_client()) == ['primary-only']
@@ -0,0 +1,70 @@
+# /backend/tests/test_export.py
+"""Incremental exports update the article lists from the changed articles alone."""
+import json
+
+import pytest
+from sqlalchemy import event
+
+import change_log
+import export
+from models import db, Article
+
+
+@pytest.fixture
+def app(make_app, monkeypatch):
+    monkeypatch.setattr(change_log, 'SETTLE_SECONDS', 0)
+    app = make_app()
+    with app.app_context():
+        db.session.add_all([Article(slug=f"article-{i}", lang='en', title=f"Article {i}", meta_description='.',
+                                    content='Body.', is_breaking_news=i % 2 == 0) for i in range(30)])
+        db.session.commit()
+        yield app
+
+
+def run_export(tmp_path, full=False):
+    target = export.Target(str(tmp_path / 'snapshots'), str(tmp_path / 'manifest.json'), workers=1)
+    return export.export(full=full, workers=1, target=target)
+
+
+def read(tmp_path, key):
+    return json.loads((tmp_path / 'snapshots' / key).read_text())
+
+
+def test_lists_follow_the_changed_articles(app, tmp_path):
+    run_export(tmp_path, full=True)
+    assert len(read(tmp_path, 'articles/all.json')['articles']) == 30
+
+    renamed = Article.query.filter_by(slug='article-3').one()
+    renamed.title = 'Renamed'
+    db.session.delete(Article.query.filter_by(slug='article-29').one())
+    db.session.commit()
+
+    loaded = []
+    record = lambda target, context: loaded.append(target)
+    event.listen(Article, 'load', record)
+    try:
+        run_export(tmp_path)
+    finally:
+        event.remove(Article, 'load', record)
+    # The changed article and the few breaking ones, not all 30
+    assert len(loaded) < 10
+
+    articles = read(tmp_path, 'articles/all.json')['articles']
+    assert [a['id'] for a in articles] == sorted((a['id'] for a in articles), reverse=True)
+    titles = {a['slug']: a['title'] for a in articles}
+    assert len(titles) == 29 and titles['article-3'] == 'Renamed' and 'article-29' not in titles
+    page = read(tmp_path, 'articles/page-1.json')
+    assert page['articles'] == articles[:export.PAGE_SIZE] and page['has_more'] is True
+
+
+def test_an_incremental_run_matches_a_full_one(app, tmp_path):
+    run_export(tmp_path, full=True)
+    Article.query.filter_by(slug='article-5').one().is_published = False
+    db.session.add(Article(slug='article-new', lang='en', title='New', meta_description='.', content='Body.'))
+    db.session.commit()
+    run_export(tmp_path)
+    incremental = read(tmp_path, 'articles/all.json')
+
+    (tmp_path / 'manifest.json').unlink()
+    run_export(tmp_path, full=True)
+    assert read(tmp_path, 'articles/all.json') == incremental
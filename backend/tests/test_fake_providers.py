@@ -0,0 +1,74 @@
+# /backend/tests/test_fake_providers.py
+"""The benchmark fakes answer like the real providers, fail and rate limit on demand, and the pipeline clock skips sleeps."""
+import time
+
+import pytest
+import requests
+
+import providers
+from benchmarks.bench_pipeline import SleepClock
+from benchmarks.fake_providers import FakeProviderState, provider_env, start_fake_providers
+
+
+@pytest.fixture
+def fake(request):
+    server, base_url = start_fake_providers(**getattr(request, 'param', {}))
+    yield server, base_url
+    server.shutdown()
+    server.server_close()
+
+
+def test_groq_sdk_gets_a_completion(fake, monkeypatch):
+    server, base_url = fake
+    for name, value in provider_env(base_url).items():
+        monkeypatch.setenv(name, value)
+    monkeypatch.setattr(providers, '_groq_client', None)
+    monkeypatch.setattr(providers, '_breakers', {})
+    prompt = 'Return a JSON object with a single key "keywords" for: tide pools'
+    completion = providers.groq_chat(model='llama-3.1-8b-instant', messages=[{'role': 'user', 'content': prompt}])
+    assert completion.model == 'llama-3.1-8b-instant' and '"keywords"' in completion.choices[0].message.content
+    assert completion.usage.total_tokens == 2000
+    assert server.state.stats() == {'groq': {'200': 1}}
+
+
+def test_libretranslate_through_the_provider_layer(fake, monkeypatch):
+    _, base_url = fake
+    monkeypatch.setattr(providers, 'LIBRETRANSLATE_API_URL', provider_env(base_url)['LIBRETRANSLATE_API_URL'])
+    assert providers.translate('Tide pools', 'fr', 'en') == '[fr] Tide pools'
+
+
+@pytest.mark.parametrize('fake', [{'rate_limit': 2}], indirect=True)
+def test_rate_limited_calls_get_429_with_retry_after(fake):
+    server, base_url = fake
+    statuses = [requests.post(f"{base_url}/translate", json={'q': 'x', 'target': 'fr'}) for _ in range(3)]
+    assert [response.status_code for response in statuses] == [200, 200, 429]
+    assert 1 <= int(statuses[-1].headers['Retry-After']) <= 61
+    # Per provider: another one is still allowed, and storage is never limited
+    assert requests.post(f"{base_url}/fireworks/text_to_image", json={'prompt': 'a', 'width': 32, 'height': 32}).status_code == 200
+    assert all(requests.put(f"{base_url}/fake-bucket/k{i}", data=b'x').status_code == 200 for i in range(3))
+    assert requests.get(f"{base_url}/_stats").json()['libretranslate'] == {'200': 2, '429': 1}
+
+
+def test_error_rate_is_reproducible_for_a_seed():
+    def outcomes(seed):
+        state = FakeProviderState(error_rate=0.3, seed=seed)
+        return [state.admit('groq')[0] for _ in range(50)]
+    first = outcomes(5)
+    assert first == outcomes(5) and set(first) == {200, 500}
+    # RSS never fails
+    assert all(FakeProviderState(error_rate=1.0).admit('rss')[0] == 200 for _ in range(5))
+
+
+def test_sleep_clock_skips_sleeps_and_moves_monotonic_forward():
+    clock = SleepClock(scale=0)
+    clock.install()
+    try:
+        started_wall, started = time.perf_counter(), time.monotonic()
+        providers.time.sleep(30) # What the pipeline's modules call
+        time.sleep(5)
+        elapsed = time.monotonic() - started
+    finally:
+        clock.uninstall()
+    assert time.perf_counter() - started_wall < 1 and 35 <= elapsed < 36
+    requested, waited = clock.snapshot()
+    assert waited == 0 and sum(requested.values()) == 35
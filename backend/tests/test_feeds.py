@@ -0,0 +1,56 @@
+# /backend/tests/test_feeds.py
+"""Incremental feed builds rewrite the feeds an article has left, not only the ones it is in."""
+import pytest
+
+import change_log
+import feeds
+from models import db, Article, Category
+
+
+@pytest.fixture
+def app(make_app, monkeypatch, tmp_path):
+    monkeypatch.setattr(change_log, 'SETTLE_SECONDS', 0)
+    monkeypatch.setattr(feeds, 'FEEDS_DIR', str(tmp_path / 'feeds'))
+    monkeypatch.setattr(feeds, 'MANIFEST_PATH', str(tmp_path / 'feeds-manifest.json'))
+    app = make_app()
+    with app.app_context():
+        science, travel = Category(name='Science', slug='science'), Category(name='Travel', slug='travel')
+        db.session.add_all([
+            Article(slug='tide-pools', lang='en', title='Tide pools', meta_description='.', content='.', categories=[science]),
+            Article(slug='comets', lang='en', title='Comets', meta_description='.', content='.', categories=[science]),
+            Article(slug='lisbon', lang='en', title='Lisbon', meta_description='.', content='.', categories=[travel]),
+        ])
+        db.session.commit()
+        feeds.build(full=True)
+        yield app
+
+
+def feed(tmp_path, category=None):
+    return (tmp_path / 'feeds' / feeds.feed_path('en', category)).read_text()
+
+
+def test_a_recategorized_article_leaves_its_old_feed(app, tmp_path):
+    assert 'tide-pools' in feed(tmp_path, 'science')
+    article = Article.query.filter_by(slug='tide-pools').one()
+    article.categories = [Category.query.filter_by(slug='travel').one()]
+    db.session.commit()
+
+    feeds.build()
+    assert 'tide-pools' not in feed(tmp_path, 'science')
+    assert 'tide-pools' in feed(tmp_path, 'travel')
+
+
+def test_a_deleted_article_leaves_its_feeds_and_sitemap(app, tmp_path):
+    db.session.delete(Article.query.filter_by(slug='comets').one())
+    db.session.commit()
+
+    feeds.build()
+    assert 'comets' not in feed(tmp_path, 'science') and 'tide-pools' in feed(tmp_path, 'science')
+    assert 'comets' not in feed(tmp_path) and 'comets' not in (tmp_path / 'feeds' / 'sitemap-0.xml').read_text()
+
+
+def test_a_build_without_a_manifest_rebuilds_everything(app, tmp_path):
+    (tmp_path / 'feeds-manifest.json').unlink()
+    (tmp_path / 'feeds' / feeds.feed_path('en', 'travel')).unlink()
+    feeds.build()
+    assert 'lisbon' in feed(tmp_path, 'travel')
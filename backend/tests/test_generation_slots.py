@@ -0,0 +1,24 @@
+# /backend/tests/test_generation_slots.py
+"""Generation endpoints are capped by GENERATION_SLOTS, and admin ones authorize before taking a slot."""
+REGENERATE = '/api/admin/article/1/regenerate-image'
+
+
+def test_unauthorized_requests_do_not_take_a_slot(make_app):
+    client = make_app({'GENERATION_SLOTS': 0}).test_client()
+    assert client.post(REGENERATE, json={}).status_code == 401
+    assert client.post(REGENERATE, json={}, headers={'x-admin-secret-key': 'wrong'}).status_code == 401
+
+
+def test_admin_requests_wait_for_a_slot(make_app):
+    client = make_app({'GENERATION_SLOTS': 0}).test_client()
+    response = client.post(REGENERATE, json={}, headers={'x-admin-secret-key': 'test-admin-key'})
+    assert response.status_code == 503 and response.headers['Retry-After'] == '30'
+
+
+def test_a_slot_is_released_after_the_request(make_app):
+    app = make_app({'GENERATION_SLOTS': 1})
+    client = app.test_client()
+    for _ in range(3):
+        # No such article: the view runs and returns, freeing its slot each time
+        assert client.post(REGENERATE, json={}, headers={'x-admin-secret-key': 'test-admin-key'}).status_code == 404
+    assert app.extensions['generation_slots'].acquire(blocking=False)
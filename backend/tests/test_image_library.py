@@ -0,0 +1,39 @@
+# /backend/tests/test_image_library.py
+"""The image library never commits the caller's work and finds duplicates through the band index."""
+import image_library
+from image_library import _hash_bands, add_to_library, find_duplicate, find_reusable
+from models import db, Category, LibraryImage
+
+
+def reset_index():
+    image_library._index.update(loaded_at=0, rows=[], hashes={})
+
+
+def test_near_duplicates_share_a_band():
+    base = 0x0123456789ABCDEF
+    for flipped in ([0, 1, 2, 3], [5, 20, 40, 63], [12, 13, 25, 26]):
+        other = base
+        for bit in flipped:
+            other ^= 1 << bit
+        assert set(_hash_bands(base)) & set(_hash_bands(other))
+
+
+def test_library_changes_wait_for_the_callers_commit(make_app):
+    app = make_app()
+    with app.app_context():
+        reset_index()
+        db.session.add(LibraryImage(prompt="red fox in snow", shingles=image_library.prompt_shingles("red fox in snow"),
+                                    phash=0x0F0F0F0F0F0F0F0F, url="https://img/fox.jpg", use_count=1))
+        db.session.commit()
+        reset_index()
+
+        db.session.add(Category(name="Unsaved", slug="unsaved"))
+        assert find_reusable("red fox in snow") is not None
+        add_to_library("blue whale", "https://img/whale.jpg")
+        assert find_duplicate(0x0F0F0F0F0F0F0F0E) is not None
+        assert find_duplicate(0x7FFFFFFF00000000) is None
+
+        db.session.rollback()
+        assert Category.query.filter_by(slug="unsaved").first() is None
+        assert LibraryImage.query.filter_by(url="https://img/whale.jpg").first() is None
+        assert LibraryImage.query.filter_by(url="https://img/fox.jpg").one().use_count == 1
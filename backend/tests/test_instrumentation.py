@@ -0,0 +1,35 @@
+# /backend/tests/test_instrumentation.py
+"""With INSTRUMENTATION_ENABLED, responses report the queries they ran; without it nothing is added."""
+from models import db, Article, Category
+
+
+def seeded(make_app, **config):
+    app = make_app(config)
+    with app.app_context():
+        science = Category(name='Science', slug='science')
+        db.session.add_all([Article(slug=f"article-{i}", lang='en', title=f"Article {i}", meta_description='.',
+                                    content='Body.', categories=[science]) for i in range(3)])
+        db.session.commit()
+    return app
+
+
+def test_query_counts_and_timings_are_reported(make_app):
+    client = seeded(make_app, INSTRUMENTATION_ENABLED=True).test_client()
+    response = client.get('/api/get-article/article-1')
+    assert response.status_code == 200
+    assert int(response.headers['X-DB-Queries']) >= 1 and float(response.headers['X-DB-Time-Ms']) >= 0
+    timing = dict(part.split(';', 1)[0:2] for part in response.headers['Server-Timing'].split(', '))
+    assert set(timing) == {'pool', 'db', 'provider', 'serialize', 'app', 'total'}
+
+    # Counted per request, not accumulated across them
+    again = client.get('/api/get-article/article-1')
+    assert again.headers['X-DB-Queries'] == response.headers['X-DB-Queries']
+
+    metrics = client.get('/api/metrics').get_data(as_text=True)
+    assert 'http_requests_total{' in metrics and 'db_queries_total{' in metrics
+
+
+def test_off_by_default(make_app):
+    response = seeded(make_app).test_client().get('/api/get-article/article-1')
+    assert response.status_code == 200
+    assert 'X-DB-Queries' not in response.headers and 'Server-Timing' not in response.headers
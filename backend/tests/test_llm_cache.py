@@ -0,0 +1,120 @@
+# /backend/tests/test_llm_cache.py
+"""cached_completion calls the model once per distinct request and lifetime, and caches only usable output."""
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import llm_cache
+
+MESSAGES = [{'role': 'user', 'content': 'Keywords for tide pools'}]
+JSON_MODE = {'type': 'json_object'}
+
+
+@pytest.fixture(autouse=True)
+def cache(monkeypatch, tmp_path):
+    monkeypatch.setattr(llm_cache, 'CACHE_PATH', str(tmp_path / 'llm_cache.sqlite3'))
+    monkeypatch.setattr(llm_cache, 'CACHE_ENABLED', True)
+    monkeypatch.setattr(llm_cache, '_schema_ready', False)
+    monkeypatch.setattr(llm_cache, '_inflight', {})
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """llm_cache's time.time(), moved forward by clock.advance(seconds)."""
+    offset = [0]
+    monkeypatch.setattr(llm_cache, 'time', SimpleNamespace(time=lambda: time.time() + offset[0]))
+    return SimpleNamespace(advance=lambda seconds: offset.__setitem__(0, offset[0] + seconds))
+
+
+class FakeModel:
+    """A create() that counts its calls and answers with the given contents in turn."""
+    def __init__(self, *contents):
+        self.contents, self.calls = list(contents), 0
+
+    def create(self, **kwargs):
+        self.calls += 1
+        content = self.contents.pop(0) if len(self.contents) > 1 else self.contents[0]
+        return llm_cache._as_completion(kwargs['model'], content, 10, 5, cached=False)
+
+
+def complete(model, ttl=60, **kwargs):
+    return llm_cache.cached_completion(model.create, ttl, model='m', messages=MESSAGES, **kwargs)
+
+
+def test_a_repeated_request_is_served_from_the_cache():
+    model = FakeModel('tide, pools')
+    assert complete(model).cached is False
+    hit = complete(model)
+    assert hit.cached is True and hit.choices[0].message.content == 'tide, pools' and model.calls == 1
+    assert llm_cache.cache_stats() == {'entries': 1, 'hits': 1, 'tokens_saved': 15}
+
+
+def test_concurrent_identical_requests_share_one_call():
+    release = threading.Event()
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs)
+        release.wait(5)
+        return llm_cache._as_completion(kwargs['model'], 'tide, pools', 10, 5, cached=False)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(
+        llm_cache.cached_completion(create, 60, model='m', messages=MESSAGES))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while not calls and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.2) # Let the others reach the in-flight call
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    # Followers get the leader's completion, or a cache hit if they came after it was stored
+    assert len(calls) == 1 and len(results) == 8
+    assert all(result.choices[0].message.content == 'tide, pools' for result in results)
+    assert not llm_cache._inflight
+
+
+def test_an_expired_entry_is_recomputed(clock):
+    model = FakeModel('old', 'new')
+    complete(model, ttl=60)
+    clock.advance(30)
+    assert complete(model).choices[0].message.content == 'old' and model.calls == 1
+    clock.advance(31)
+    assert complete(model).choices[0].message.content == 'new' and model.calls == 2
+    assert complete(model).cached is True and model.calls == 2
+
+
+def test_invalid_json_is_not_stored():
+    model = FakeModel('{"keywords": [', '{"keywords": ["tide"]}')
+    assert complete(model, response_format=JSON_MODE).choices[0].message.content == '{"keywords": ['
+    assert llm_cache.cache_stats()['entries'] == 0
+    complete(model, response_format=JSON_MODE)
+    assert model.calls == 2 and complete(model, response_format=JSON_MODE).cached is True
+
+
+def test_a_custom_validator_decides_what_is_stored():
+    def at_least_three(content):
+        if len(content.split(',')) < 3:
+            raise ValueError("too few keywords")
+    model = FakeModel('tide', 'tide, pools, rocks')
+    complete(model, validate=at_least_three)
+    complete(model, validate=at_least_three)
+    assert model.calls == 2 and complete(model, validate=at_least_three).cached is True
+
+
+def test_purge_expired_deletes_only_expired_rows(clock):
+    short = FakeModel('short')
+    llm_cache.cached_completion(short.create, 60, model='m', messages=[{'role': 'user', 'content': 'short'}])
+    long = FakeModel('long')
+    llm_cache.cached_completion(long.create, 3600, model='m', messages=[{'role': 'user', 'content': 'long'}])
+    assert llm_cache.purge_expired() == 0
+
+    clock.advance(61)
+    assert llm_cache.purge_expired() == 1
+    assert llm_cache.cache_stats()['entries'] == 1
+    assert llm_cache.cached_completion(long.create, 3600, model='m', messages=[{'role': 'user', 'content': 'long'}]).cached is True
@@ -0,0 +1,73 @@
+# /backend/tests/test_migrations.py
+"""Data migrations leave the rows they touch consistent; each is run against SQLite."""
+import importlib.util
+import os
+
+import pytest
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from sqlalchemy import MetaData, create_engine, insert, inspect, select
+
+from models import db
+
+VERSIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations', 'versions')
+
+
+def load_migration(name):
+    spec = importlib.util.spec_from_file_location(name, os.path.join(VERSIONS_DIR, f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def run_upgrade(engine, migration):
+    with engine.begin() as connection:
+        with Operations.context(MigrationContext.configure(connection)):
+            migration.upgrade()
+
+
+@pytest.fixture
+def engine(tmp_path):
+    # The schema as it was before c3e8a1f47d92: article slugs were not unique per language
+    metadata = MetaData()
+    for table in db.metadata.sorted_tables:
+        table.to_metadata(metadata)
+    article = metadata.tables['article']
+    article.constraints = {c for c in article.constraints if c.name != 'uq_article_slug_lang'}
+    engine = create_engine(f"sqlite:///{tmp_path / 'migration.db'}")
+    metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def test_unique_article_slug_lang_keeps_the_oldest_row(engine):
+    tables = db.metadata.tables
+    article = lambda id, slug, lang='en', original=None: {
+        'id': id, 'slug': slug, 'lang': lang, 'title': slug, 'meta_description': '.', 'content': '.',
+        'is_published': True, 'is_breaking_news': False, 'original_article_id': original}
+    with engine.begin() as connection:
+        connection.execute(insert(tables['article']), [
+            article(1, 'tide-pools'),
+            article(2, 'tide-pools'), # Duplicate of 1
+            article(3, 'tide-pools', lang='fr', original=2), # Translation of the duplicate
+            article(4, 'comets'),
+            article(5, 'comets'), article(6, 'comets'), # Duplicates of 4
+            article(7, 'cometes', lang='fr', original=6),
+        ])
+        connection.execute(insert(tables['category']), [{'id': 1, 'name': 'Science', 'slug': 'science'}])
+        connection.execute(insert(tables['article_categories']), [{'article_id': 1, 'category_id': 1},
+                                                                  {'article_id': 2, 'category_id': 1}])
+        connection.execute(insert(tables['article_images']), [{'article_id': 2, 'index': 0, 'prompt': 'a rock pool',
+                                                               'status': 'pending'}])
+
+    run_upgrade(engine, load_migration('c3e8a1f47d92_unique_article_slug_lang'))
+
+    with engine.connect() as connection:
+        rows = connection.execute(select(tables['article'].c.id, tables['article'].c.slug, tables['article'].c.lang,
+                                         tables['article'].c.original_article_id)).all()
+        assert sorted(rows) == [(1, 'tide-pools', 'en', None), (3, 'tide-pools', 'fr', 1),
+                                (4, 'comets', 'en', None), (7, 'cometes', 'fr', 4)]
+        assert connection.execute(select(tables['article_categories'].c.article_id)).scalars().all() == [1]
+        assert connection.execute(select(tables['article_images'])).all() == []
+    assert {'name': 'uq_article_slug_lang', 'column_names': ['slug', 'lang']} in [
+        {key: c[key] for key in ('name', 'column_names')} for c in inspect(engine).get_unique_constraints('article')]
@@ -0,0 +1,136 @@
+# /backend/tests/test_model_router.py
+"""route_chat falls back to the next model when one is rate limited, failing or switched off, and records every call."""
+from types import SimpleNamespace
+
+import pytest
+
+import model_router
+import providers
+from models import LLMCallMetric
+from model_router import route_chat
+
+FIRST, SECOND = 'llama-3.3-70b-versatile', 'llama-3.1-8b-instant'
+MESSAGES = [{'role': 'user', 'content': 'Write about tide pools'}]
+
+
+class StubError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code, self.response = status_code, None
+
+
+class StubClient:
+    """Stands in for the Groq client: answers from `replies` per model, raising the ones that are errors."""
+    def __init__(self, replies):
+        self.replies, self.calls = replies, []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, **kwargs):
+        self.calls.append(model)
+        reply = self.replies[model]
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+
+def completion(model, content='Tide pools are...'):
+    return SimpleNamespace(model=model, choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+                           usage=SimpleNamespace(prompt_tokens=100, completion_tokens=50))
+
+
+def chunk(text, usage=None):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))], usage=None,
+                           x_groq=SimpleNamespace(usage=usage) if usage else None)
+
+
+@pytest.fixture
+def app(make_app, monkeypatch):
+    monkeypatch.setitem(model_router.MODEL_ROUTES, 'test', [FIRST, SECOND])
+    monkeypatch.setattr(providers, '_breakers', {})
+    monkeypatch.setattr(providers.time, 'sleep', lambda seconds: None)
+    app = make_app()
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def client(monkeypatch):
+    def install(replies):
+        stub = StubClient(replies)
+        monkeypatch.setattr(providers, '_groq_client', stub)
+        return stub
+    return install
+
+
+def metrics():
+    return [(row.model, row.status) for row in LLMCallMetric.query.order_by(LLMCallMetric.id)]
+
+
+def test_the_first_model_answers(app, client):
+    stub = client({FIRST: completion(FIRST)})
+    assert route_chat('test', messages=MESSAGES).model == FIRST
+    assert stub.calls == [FIRST] and metrics() == [(FIRST, 'ok')]
+    row = LLMCallMetric.query.one()
+    assert (row.prompt_tokens, row.completion_tokens) == (100, 50)
+
+
+def test_a_rate_limited_model_is_skipped_at_once(app, client):
+    stub = client({FIRST: StubError(429), SECOND: completion(SECOND)})
+    assert route_chat('test', messages=MESSAGES).model == SECOND
+    # No retries on the first model: the second one is waiting
+    assert stub.calls == [FIRST, SECOND]
+    assert metrics() == [(FIRST, 'error'), (SECOND, 'ok')]
+
+
+def test_a_failing_model_falls_back_after_its_retries(app, client):
+    stub = client({FIRST: StubError(503), SECOND: completion(SECOND)})
+    assert route_chat('test', messages=MESSAGES).model == SECOND
+    assert stub.calls == [FIRST] * (providers.PROVIDER_SETTINGS['groq']['retries'] + 1) + [SECOND]
+    assert metrics() == [(FIRST, 'error'), (SECOND, 'ok')]
+
+
+def test_an_open_circuit_falls_back_without_a_call(app, client):
+    breaker = providers.get_breaker(f"groq:{FIRST}")
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    stub = client({FIRST: completion(FIRST), SECOND: completion(SECOND)})
+    assert route_chat('test', messages=MESSAGES).model == SECOND
+    assert stub.calls == [SECOND] and metrics() == [(FIRST, 'error'), (SECOND, 'ok')]
+
+
+def test_the_last_models_error_is_raised(app, client):
+    client({FIRST: StubError(429), SECOND: StubError(500)})
+    with pytest.raises(providers.ProviderError) as raised:
+        route_chat('test', messages=MESSAGES)
+    assert raised.value.status_code == 500
+
+
+def test_a_bad_request_is_not_retried_on_another_model(app, client):
+    stub = client({FIRST: StubError(400), SECOND: completion(SECOND)})
+    with pytest.raises(providers.ProviderError):
+        route_chat('test', messages=MESSAGES)
+    assert stub.calls == [FIRST]
+
+
+def test_a_stream_is_recorded_with_its_usage_when_it_ends(app, client):
+    usage = SimpleNamespace(prompt_tokens=120, completion_tokens=3)
+    client({FIRST: StubError(429), SECOND: iter([chunk('Tide'), chunk(' pools'), chunk('.', usage)])})
+    stream = route_chat('test', messages=MESSAGES, stream=True)
+    assert metrics() == [(FIRST, 'error')] # Nothing for the stream until it is consumed
+    assert ''.join(c.choices[0].delta.content for c in stream) == 'Tide pools.'
+
+    row = LLMCallMetric.query.filter_by(model=SECOND).one()
+    assert (row.status, row.prompt_tokens, row.completion_tokens) == ('ok', 120, 3)
+    # cost_usd keeps 6 decimals
+    assert float(row.cost_usd) == pytest.approx(model_router.estimate_cost(SECOND, 120, 3), abs=1e-6) and row.cost_usd > 0
+
+
+def test_a_broken_stream_is_recorded_as_an_error(app, client):
+    def broken():
+        yield chunk('Tide')
+        raise StubError(502)
+    client({FIRST: broken()})
+    with pytest.raises(StubError):
+        list(route_chat('test', messages=MESSAGES, stream=True))
+    row = LLMCallMetric.query.one()
+    assert (row.model, row.status, row.error) == (FIRST, 'error', 'HTTP 502')
@@ -0,0 +1,41 @@
+# /backend/tests/test_persistence.py
+"""insert_article lets the (slug, lang) unique index settle duplicates."""
+import pytest
+
+from models import db, Article
+from persistence import insert_article
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app()
+    with app.app_context():
+        yield app
+
+
+def fields(slug, lang='en', title='Tide pools'):
+    return {'slug': slug, 'lang': lang, 'title': title, 'meta_description': '.', 'content': 'Body.'}
+
+
+def test_a_duplicate_returns_the_existing_row(app):
+    article, created = insert_article(**fields('tide-pools'))
+    db.session.commit()
+    assert created
+
+    duplicate, created = insert_article(**fields('tide-pools', title='Another take'))
+    db.session.commit() # The session is still usable: nothing was raised or rolled back
+    assert not created and duplicate.id == article.id and duplicate.title == 'Tide pools'
+    assert Article.query.count() == 1
+
+
+def test_the_same_slug_in_another_language_is_a_new_row(app):
+    english, _ = insert_article(**fields('tide-pools'))
+    french, created = insert_article(**fields('tide-pools', lang='fr'))
+    db.session.commit()
+    assert created and french.id != english.id and Article.query.count() == 2
+
+
+def test_lang_defaults_to_english(app):
+    article, _ = insert_article(**{k: v for k, v in fields('tide-pools').items() if k != 'lang'})
+    duplicate, created = insert_article(**fields('tide-pools'))
+    assert article.lang == 'en' and not created and duplicate.id == article.id
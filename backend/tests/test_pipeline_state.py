@@ -0,0 +1,66 @@
+# /backend/tests/test_pipeline_state.py
+"""Completed steps are reused, failed ones retried up to MAX_STEP_ATTEMPTS, and a run with a failure stays open."""
+import pytest
+
+import pipeline_state
+from models import PipelineRun, PipelineStep
+from pipeline_state import MAX_STEP_ATTEMPTS, StepExhausted, complete_run, run_step, start_run
+
+
+class Flaky:
+    """Fails the first `failures` calls, then returns 'done'."""
+
+    def __init__(self, failures=0):
+        self.failures, self.calls = failures, 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise RuntimeError(f"failure {self.calls}")
+        return 'done'
+
+
+@pytest.fixture
+def app(make_app):
+    pipeline_state._failed_runs.clear()
+    app = make_app()
+    with app.app_context():
+        yield app
+
+
+def test_a_completed_step_is_not_run_again(app):
+    run = start_run('test_job', run_key='r1')
+    work = Flaky()
+    assert run_step(run, 'draft', work) == 'done'
+    run = start_run('test_job', run_key='r1')
+    assert run_step(run, 'draft', work) == 'done'
+    assert work.calls == 1
+
+
+def test_a_failed_step_is_retried_on_the_next_run(app):
+    run = start_run('test_job', run_key='r1')
+    work = Flaky(failures=1)
+    with pytest.raises(RuntimeError):
+        run_step(run, 'draft', work)
+    assert complete_run(run) is False
+    assert PipelineRun.query.one().status == 'running'
+
+    run = start_run('test_job', run_key='r1')
+    assert run_step(run, 'draft', work) == 'done'
+    assert PipelineStep.query.one().attempts == 2
+    assert complete_run(run) is True
+    assert PipelineRun.query.one().status == 'completed'
+
+
+def test_a_step_is_given_up_after_max_attempts(app):
+    work = Flaky(failures=MAX_STEP_ATTEMPTS)
+    for _ in range(MAX_STEP_ATTEMPTS):
+        run = start_run('test_job', run_key='r1')
+        with pytest.raises(RuntimeError):
+            run_step(run, 'draft', work)
+    # The last attempt failed for good, so nothing is left to retry
+    assert complete_run(run) is True
+
+    with pytest.raises(StepExhausted):
+        run_step(run, 'draft', work)
+    assert work.calls == MAX_STEP_ATTEMPTS
@@ -0,0 +1,100 @@
+# /backend/tests/test_providers.py
+"""
+Generation calls to our own backend retry a busy 503 after its Retry-After,
+and nothing else. A half-open circuit breaker lets exactly one probe through.
+"""
+import threading
+import time
+
+import pytest
+
+import providers
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code, self.headers, self.text = status_code, headers or {}, ''
+
+
+class FakeSession:
+    def __init__(self, *responses):
+        self.responses, self.calls = list(responses), 0
+
+    def request(self, method, url, **kwargs):
+        self.calls += 1
+        return self.responses.pop(0)
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(providers.time, 'sleep', sleeps.append)
+    monkeypatch.setattr(providers, '_breakers', {})
+
+    def install(*responses):
+        session = FakeSession(*responses)
+        monkeypatch.setattr(providers, 'get_session', lambda provider: session)
+        return session, sleeps
+    return install
+
+
+def test_busy_backend_is_retried_after_retry_after(backend):
+    session, sleeps = backend(FakeResponse(503, {'retry-after': '30'}), FakeResponse(200))
+    assert providers.post('backend', 'http://backend/api/generate-article').status_code == 200
+    assert session.calls == 2
+    assert sleeps and sleeps[0] >= 30
+
+
+def test_failed_generation_is_not_repeated(backend):
+    session, sleeps = backend(FakeResponse(500), FakeResponse(200))
+    with pytest.raises(providers.ProviderError):
+        providers.post('backend', 'http://backend/api/generate-article')
+    assert session.calls == 1 and not sleeps
+
+
+def expired_breaker():
+    breaker = providers.CircuitBreaker('test', failure_threshold=2, cooldown=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert not breaker.allow()
+    breaker.opened_at = time.monotonic() - 61 # The cooldown is over
+    return breaker
+
+
+def test_one_probe_passes_a_half_open_breaker():
+    breaker = expired_breaker()
+    callers = 16
+    barrier = threading.Barrier(callers)
+    allowed = []
+
+    def call():
+        barrier.wait()
+        allowed.append(breaker.allow())
+    threads = [threading.Thread(target=call) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert allowed.count(True) == 1
+
+    # Only the probe's success closes it
+    assert not breaker.allow()
+    breaker.record_success()
+    assert all(breaker.allow() for _ in range(callers))
+
+
+def test_a_failed_probe_restarts_the_cooldown():
+    breaker = expired_breaker()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.opened_at > time.monotonic() - 1 and not breaker.allow()
+
+
+def test_a_bad_request_probe_lets_the_next_call_probe(backend):
+    session, _ = backend(FakeResponse(400), FakeResponse(200))
+    breaker = expired_breaker()
+    providers._breakers['backend'] = breaker
+    with pytest.raises(providers.ProviderError):
+        providers.post('backend', 'http://backend/api/generate-article')
+    assert providers.post('backend', 'http://backend/api/generate-article').status_code == 200
+    assert breaker.opened_at is None
@@ -0,0 +1,56 @@
+# /backend/tests/test_seed_corpus.py
+"""The benchmark corpus is reproducible from its seed and shaped like the pipeline's output."""
+import random
+from collections import Counter
+
+import pytest
+
+from benchmarks import seed_corpus
+from models import db, Article, Category
+from utils import ALL_TARGET_LANGUAGES
+
+COLUMNS = ('id', 'slug', 'lang', 'title', 'content', 'is_published', 'original_article_id')
+
+
+def corpus(make_app, tmp_path, name, total, seed):
+    app = make_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / name}"})
+    with app.app_context():
+        seed_corpus.seed(total, random.Random(seed), batch_size=7)
+        rows = [tuple(getattr(a, column) for column in COLUMNS) + (sorted(c.slug for c in a.categories),)
+                for a in Article.query.order_by(Article.id)]
+        db.session.remove()
+    return rows
+
+
+def test_the_same_seed_gives_the_same_corpus(make_app, tmp_path):
+    first = corpus(make_app, tmp_path, 'a.db', 25, seed=7)
+    assert first == corpus(make_app, tmp_path, 'b.db', 25, seed=7)
+    assert first != corpus(make_app, tmp_path, 'c.db', 25, seed=8)
+
+
+def test_articles_come_in_translation_groups(make_app, tmp_path):
+    total = 2 * len(ALL_TARGET_LANGUAGES) + 3 # The last group is cut short
+    rows = corpus(make_app, tmp_path, 'a.db', total, seed=1)
+    assert len(rows) == total
+
+    by_id = {row[0]: row for row in rows}
+    originals = [row for row in rows if row[2] == 'en']
+    assert len(originals) == 3 and all(row[6] is None for row in originals)
+    for row in rows:
+        if row[2] != 'en':
+            original = by_id[row[6]]
+            # Translations share their original's categories and never repeat a language
+            assert original[2] == 'en' and row[7] == original[7]
+    assert all(count == 1 for count in Counter((row[6] or row[0], row[2]) for row in rows).values())
+    assert all(1 <= len(row[7]) <= 2 for row in rows)
+    assert len({(row[1], row[2]) for row in rows}) == total # (slug, lang) is unique
+
+
+@pytest.mark.parametrize('total', [1, 10])
+def test_categories_are_created_once(make_app, tmp_path, total):
+    app = make_app()
+    with app.app_context():
+        seed_corpus.seed(total, random.Random(1))
+        seed_corpus.seed(total, random.Random(2))
+        assert Category.query.count() == len(seed_corpus.CATEGORIES)
+        assert Article.query.count() == 2 * total
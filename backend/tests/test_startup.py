@@ -0,0 +1,36 @@
+# /backend/tests/test_startup.py
+"""Startup budgets from benchmarks/bench_startup.py, enforced on every test run."""
+import os
+
+import pytest
+
+from benchmarks.bench_startup import IMPORT_TARGETS, measure_first_request, measure_imports
+
+IMPORT_BUDGET_MS = float(os.getenv('IMPORT_BUDGET_MS', '1500'))
+FIRST_REQUEST_BUDGET_MS = float(os.getenv('FIRST_REQUEST_BUDGET_MS', '2500'))
+
+
+@pytest.mark.parametrize('module', sorted(IMPORT_TARGETS))
+def test_import_within_budget(module):
+    total_ms, slowest = measure_imports(module)
+    budget = IMPORT_BUDGET_MS * IMPORT_TARGETS[module]
+    assert total_ms <= budget, f"import {module} took {total_ms:.0f}ms (budget {budget:.0f}ms); slowest: {slowest[:5]}"
+
+
+def test_first_request_within_budget():
+    timings = measure_first_request()
+    assert timings['status'] == 200
+    assert timings['total_ms'] <= FIRST_REQUEST_BUDGET_MS, timings
+
+
+def test_tables_are_not_created_on_startup_by_default(monkeypatch):
+    import importlib
+    import config
+
+    monkeypatch.delenv('CREATE_TABLES_ON_STARTUP', raising=False)
+    monkeypatch.delenv('FLASK_DEBUG', raising=False)
+    try:
+        assert importlib.reload(config).Config.CREATE_TABLES_ON_STARTUP is False
+    finally:
+        monkeypatch.undo()
+        importlib.reload(config)
@@ -0,0 +1,107 @@
+# /backend/tests/test_streaming.py
+"""IncrementalJSONParser gives the same fields however the stream is chunked, and salvages truncated output."""
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import streaming
+from streaming import IncrementalJSONParser, repair_fields
+
+ARTICLE = {
+    'title': 'Tide "pools" explained',
+    'slug': 'tide-pools',
+    'meta_description': 'Café notes\nwith a \\ backslash',
+    'category': 'Science',
+    'content': '# Tide pools\n\nA "quoted" line, a tab\tand ☃.',
+    'tags': ['sea', 'rocks'],
+    'reading_minutes': 4,
+}
+
+
+def parse(text, chunk_size):
+    parser = IncrementalJSONParser()
+    finished = []
+    for i in range(0, len(text), chunk_size):
+        finished += parser.feed(text[i:i + chunk_size])
+    return parser, finished
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 64, 10000])
+def test_fields_survive_any_chunking(chunk_size):
+    text = json.dumps(ARTICLE, ensure_ascii=True) # \" and \uXXXX escapes fall across chunk boundaries
+    parser, finished = parse(text, chunk_size)
+    assert parser.done and parser.fields == ARTICLE
+    assert finished == parser.completed == list(ARTICLE)
+
+
+def test_an_escape_split_between_chunks():
+    parser = IncrementalJSONParser()
+    assert parser.feed('{"title": "say \\') == []
+    assert parser.feed('"hi\\') == []
+    assert parser.feed('u00e9"}') == ['title']
+    assert parser.fields == {'title': 'say "hié'}
+
+
+def test_triple_quoted_content():
+    parser, _ = parse('{"title": "T", "content": """Line one\nHe said "hi" here""", "category": "News"}', 5)
+    assert parser.done
+    assert parser.fields == {'title': 'T', 'content': 'Line one\nHe said "hi" here', 'category': 'News'}
+
+
+def test_empty_strings_and_arrays():
+    parser, finished = parse('{"title": "", "tags": [], "author": {}, "content": ""}', 1)
+    assert parser.done and finished == ['title', 'tags', 'author', 'content']
+    assert parser.fields == {'title': '', 'tags': [], 'author': {}, 'content': ''}
+
+
+@pytest.mark.parametrize('tail, expected', [
+    ('Hello\\nWor', 'Hello\nWor'),
+    ('Hello \\', 'Hello '), # A dangling backslash is dropped
+    ('caf\\u00', 'caf'), # So is a half-received \\u escape
+    ('C:\\\\', 'C:\\'), # An escaped backslash is kept
+])
+def test_truncated_output_keeps_the_partial_field(tail, expected):
+    parser, _ = parse('{"title": "T", "content": "' + tail, 4)
+    assert not parser.done and parser.fields == {'title': 'T'}
+    assert parser.partial_field() == ('content', expected)
+
+
+def test_truncated_triple_quoted_content():
+    parser, _ = parse('{"content": """Part one ""', 3)
+    assert parser.partial_field() == ('content', 'Part one ')
+
+
+def test_nothing_is_partial_between_fields():
+    parser, _ = parse('{"title": "T", ', 1)
+    assert parser.partial_field() == (None, None)
+
+
+def completion(text):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+
+
+def test_repair_continues_truncated_content(monkeypatch):
+    calls = []
+
+    def fake_route_chat(task, messages, **kwargs):
+        calls.append((task, messages[0]['content']))
+        return completion('the rest.') if task == 'long_form' else completion(json.dumps({'category': 'Science'}))
+    monkeypatch.setattr(streaming, 'route_chat', fake_route_chat)
+
+    fields = {'title': 'Tide pools', 'slug': 'tide-pools', 'meta_description': 'About tide pools.'}
+    events = list(repair_fields('tide pools', fields, {'content': 'The beginning, and '}))
+
+    assert [event for event in events if event[0] == 'repair'] == [('repair', {'field': 'category'}),
+                                                                   ('repair', {'field': 'content'})]
+    kind, data = events[-1]
+    assert kind == 'result'
+    assert data['category'] == 'Science' and data['content'] == 'The beginning, and the rest.'
+    # The continuation prompt carries what was already written, so it isn't written again
+    assert [task for task, _ in calls] == ['repair', 'long_form'] and 'The beginning, and ' in calls[1][1]
+
+
+def test_repair_fails_when_a_field_cannot_be_regenerated(monkeypatch):
+    monkeypatch.setattr(streaming, 'route_chat', lambda task, messages, **kwargs: completion('{}'))
+    with pytest.raises(ValueError):
+        list(repair_fields('tide pools', {'title': 'T', 'slug': 't', 'meta_description': 'm', 'content': 'c'}, {}))
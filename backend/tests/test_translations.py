@@ -0,0 +1,76 @@
+# /backend/tests/test_translations.py
+"""Translations and their pipeline steps are saved in a single commit."""
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+import pipeline_state
+import utils
+from models import db, Article, Category, PipelineStep
+from persistence import save_translations
+from pipeline_state import complete_run, start_run
+
+
+@pytest.fixture
+def app(make_app):
+    pipeline_state._failed_runs.clear()
+    app = make_app()
+    with app.app_context():
+        category = Category(name='Science', slug='science')
+        original = Article(slug='tide-pools', lang='en', title='Tide pools', meta_description='Tide pools',
+                           content='About tide pools.', categories=[category])
+        # Already uses the slug the French translation will get
+        db.session.add_all([original, Article(slug='mares', lang='fr', title='Mares', meta_description='Mares', content='.')])
+        db.session.commit()
+        yield app
+
+
+@pytest.fixture
+def commits():
+    counted = []
+    listener = lambda session: counted.append(session)
+    event.listen(Session, 'after_commit', listener)
+    yield counted
+    event.remove(Session, 'after_commit', listener)
+
+
+def fields(slug):
+    return {'slug': slug, 'title': slug.title(), 'meta_description': slug, 'content': f"{slug} body"}
+
+
+def test_save_translations_commits_once(app, commits):
+    original = Article.query.filter_by(slug='tide-pools').one()
+    saved = save_translations(original, {'fr': fields('mares'), 'es': fields('charcas')})
+
+    assert sorted(saved) == ['es', 'fr'] and len(commits) == 1
+    french = Article.query.filter_by(lang='fr', original_article_id=original.id).one()
+    assert french.slug == f"mares-{original.id}"
+    for translation in original.translations:
+        assert [category.slug for category in translation.categories] == ['science']
+
+
+def test_translation_steps_commit_with_the_translations(app, commits, monkeypatch):
+    def translate(article, lang):
+        if lang == 'de':
+            raise utils.TranslationFailed("de is down")
+        return fields(f"tide-pools-{lang}")
+    monkeypatch.setattr(utils, 'translate_article_fields', translate)
+
+    original = Article.query.filter_by(slug='tide-pools').one()
+    run = start_run('test_job', run_key='r1')
+    commits.clear()
+    utils.create_and_save_translations(original, run=run, key_prefix='item')
+
+    assert len(commits) == 1
+    assert len(original.translations) == len(utils.ALL_TARGET_LANGUAGES) - 2
+    steps = {step.name: step for step in PipelineStep.query}
+    assert steps['translations:de'].status == 'failed'
+    assert all(step.result is None for step in steps.values())
+    # The failed language keeps the run open, and only it is retried
+    assert complete_run(run) is False
+    monkeypatch.setattr(utils, 'translate_article_fields', lambda article, lang: fields(f"tide-pools-{lang}"))
+    run = start_run('test_job', run_key='r1')
+    utils.create_and_save_translations(original, run=run, key_prefix='item')
+    assert steps['translations:de'].status == 'completed' and steps['translations:de'].attempts == 2
+    assert len(original.translations) == len(utils.ALL_TARGET_LANGUAGES) - 1
+    assert complete_run(run) is True
@@ -0,0 +1,84 @@
+# /backend/tests/test_worker_daemon.py
+"""CronSchedule matches like cron, and a job's advisory lock keeps a second run out."""
+import threading
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from worker_daemon import CronSchedule, ScheduledJob, advisory_lock_key, run_with_lock
+
+
+def test_steps_ranges_and_lists():
+    schedule = CronSchedule('*/15 9-11,20 * * *')
+    assert schedule.minutes == {0, 15, 30, 45}
+    assert schedule.hours == {9, 10, 11, 20}
+    assert CronSchedule('5/20 * * * *').minutes == {5, 25, 45}
+    assert CronSchedule('0 0-12/6 * * *').hours == {0, 6, 12}
+
+
+def test_seven_is_sunday():
+    assert CronSchedule('0 0 * * 7').weekdays == {0}
+    assert CronSchedule('0 0 * * 5-7').weekdays == {0, 5, 6}
+    # 2026-10-18 is a Sunday
+    assert CronSchedule('30 6 * * 7').next_after(datetime(2026, 10, 14, 12, 0)) == datetime(2026, 10, 18, 6, 30)
+
+
+def test_both_day_fields_restricted_match_either():
+    # The 1st of the month or any Monday (2026-10-19 is a Monday)
+    schedule = CronSchedule('0 8 1 * 1')
+    assert schedule.next_after(datetime(2026, 10, 14)) == datetime(2026, 10, 19, 8, 0)
+    assert schedule.next_after(datetime(2026, 10, 27)) == datetime(2026, 11, 1, 8, 0)
+
+
+def test_one_day_field_restricted_must_match():
+    # Mondays only, whatever the day of the month
+    assert CronSchedule('0 8 * * 1').next_after(datetime(2026, 10, 20)) == datetime(2026, 10, 26, 8, 0)
+    # The 1st only, whatever the weekday
+    assert CronSchedule('0 8 1 * *').next_after(datetime(2026, 10, 2)) == datetime(2026, 11, 1, 8, 0)
+
+
+def test_next_after_is_strictly_after():
+    schedule = CronSchedule('*/10 * * * *')
+    assert schedule.next_after(datetime(2026, 10, 19, 12, 10)) == datetime(2026, 10, 19, 12, 20)
+    assert schedule.next_after(datetime(2026, 10, 19, 12, 9, 59)) == datetime(2026, 10, 19, 12, 10)
+    assert CronSchedule('59 23 31 12 *').next_after(datetime(2026, 12, 31, 23, 59)) == datetime(2027, 12, 31, 23, 59)
+
+
+@pytest.mark.parametrize('expression', ['* * * *', '60 * * * *', '0 24 * * *', '0 0 0 * *', '0 0 * 13 *', '0 0 * * 8', 'a * * * *'])
+def test_invalid_expressions(expression):
+    with pytest.raises(ValueError):
+        CronSchedule(expression)
+
+
+def test_an_impossible_date_never_matches():
+    with pytest.raises(ValueError):
+        CronSchedule('0 0 31 2 *').next_after(datetime(2026, 10, 19))
+
+
+@pytest.mark.parametrize('url_fixture', ['postgres_url', 'pgbouncer_url'])
+def test_a_second_run_is_skipped_while_the_lock_is_held(request, url_fixture):
+    from config import create_worker_app
+    from models import db
+
+    url = request.getfixturevalue(url_fixture)
+    app = create_worker_app({'SQLALCHEMY_DATABASE_URI': url})
+    inner_runs = []
+
+    def second_run():
+        job = ScheduledJob('lock-test', '* * * * *', lambda: inner_runs.append(True), jitter=0)
+        thread = threading.Thread(target=run_with_lock, args=(app, db, job))
+        thread.start()
+        thread.join()
+
+    outer_runs = []
+    run_with_lock(app, db, ScheduledJob('lock-test', '* * * * *', lambda: outer_runs.append(second_run()), jitter=0))
+    assert outer_runs and not inner_runs
+
+    # Released when the job ends, on whichever server connection took it
+    engine = create_engine(url)
+    try:
+        with engine.connect() as connection:
+            assert connection.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {'key': advisory_lock_key('lock-test')}).scalar()
+    finally:
+        engine.dispose()
@@ -0,0 +1,194 @@
+# /backend/tracing.py
+"""
+Span-based tracing for the generation pipeline.
+
+Wrap a stage in span() or @traced() and it is timed as a span, nested under
+whatever span is open in the caller (across map_concurrently() threads too).
+Every provider call made inside a span is recorded as a provider.<name> span
+with its attempts, so retries and provider latency show up per stage.
+
+When a job's root span ends, a summary of wall time per stage and latency and
+retries per provider is printed. The finished trace is exported in the
+OpenTelemetry OTLP/JSON format when either of these is set:
+  - TRACE_FILE: appends one OTLP/JSON document per trace, the format the
+    OpenTelemetry Collector's otlpjsonfile receiver reads
+  - OTEL_EXPORTER_OTLP_ENDPOINT: posts it to a collector, e.g. http://localhost:4318
+"""
+import collections
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import secrets
+import threading
+import time
+
+import providers
+
+# --- CONFIGURATION ---
+TRACE_FILE = os.getenv("TRACE_FILE")
+OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT")
+SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "ai-blog-pipeline")
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+_traces = {} # trace_id -> finished spans, until the root span ends
+_traces_lock = threading.Lock()
+
+
+class Span:
+    def __init__(self, name, parent=None, attributes=None, start=None, summarize=False):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes or {})
+        self.start_ns = start if start is not None else time.time_ns()
+        self.end_ns = None
+        self.error = None
+        self.summarize = summarize
+
+    @property
+    def duration(self):
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def end(self, end=None):
+        self.end_ns = end if end is not None else time.time_ns()
+        with _traces_lock:
+            _traces.setdefault(self.trace_id, []).append(self)
+            spans = _traces.pop(self.trace_id) if self.parent_id is None else None
+        if spans is not None:
+            if self.summarize:
+                print_summary(self, spans)
+            export(spans)
+
+
+def current_span():
+    return _current_span.get()
+
+
+@contextlib.contextmanager
+def span(name, summarize=False, **attributes):
+    """Times the block as a span under the current one. summarize=True prints a report when a root span ends."""
+    new_span = Span(name, parent=current_span(), attributes=attributes, summarize=summarize)
+    token = _current_span.set(new_span)
+    try:
+        yield new_span
+    except BaseException as e:
+        new_span.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        new_span.end()
+
+
+def traced(name, summarize=False):
+    """Decorator form of span()."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name, summarize=summarize):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# --- PROVIDER CALLS ---
+def _record_provider_call(provider, seconds, ok, attempts):
+    """Adds a finished provider call as a span, if it happened inside a trace."""
+    parent = current_span()
+    if parent is None or provider == 'otlp':
+        return
+    end = time.time_ns()
+    call = Span(f"provider.{provider}", parent=parent, start=end - int(seconds * 1e9),
+                attributes={'provider': provider, 'attempts': attempts, 'retries': attempts - 1})
+    if not ok:
+        call.error = "failed after retries"
+    call.end(end)
+
+
+providers.add_call_observer(_record_provider_call)
+
+
+# --- SUMMARY ---
+def print_summary(root, spans):
+    """Prints wall time per stage and latency and retries per provider for one finished job."""
+    stages = collections.OrderedDict()
+    calls = collections.OrderedDict()
+    for s in sorted(spans, key=lambda s: s.start_ns):
+        if s is root:
+            continue
+        table = calls if s.name.startswith('provider.') else stages
+        stats = table.setdefault(s.name, {'count': 0, 'total': 0.0, 'max': 0.0, 'errors': 0, 'retries': 0})
+        stats['count'] += 1
+        stats['total'] += s.duration
+        stats['max'] = max(stats['max'], s.duration)
+        stats['errors'] += 1 if s.error else 0
+        stats['retries'] += s.attributes.get('retries', 0)
+
+    print(f"\n--- Trace summary: {root.name} (trace {root.trace_id}) ---")
+    print(f"Wall time: {root.duration:.1f}s{' (failed: ' + root.error + ')' if root.error else ''}")
+    print("Stages nest (an article includes its keywords, draft and images), so totals overlap.")
+    print(f"{'stage':<28} {'count':>6} {'total':>9} {'avg':>8} {'max':>8} {'% wall':>7} {'errors':>7}")
+    for name, stats in stages.items():
+        print(f"{name:<28} {stats['count']:>6} {stats['total']:>8.1f}s {stats['total'] / stats['count']:>7.2f}s "
+              f"{stats['max']:>7.2f}s {stats['total'] / max(root.duration, 1e-9):>7.0%} {stats['errors']:>7}")
+    if calls:
+        print(f"{'provider':<28} {'calls':>6} {'latency':>9} {'avg':>8} {'max':>8} {'retries':>7} {'errors':>7}")
+        for name, stats in calls.items():
+            print(f"{name:<28} {stats['count']:>6} {stats['total']:>8.1f}s {stats['total'] / stats['count']:>7.2f}s "
+                  f"{stats['max']:>7.2f}s {stats['retries']:>7} {stats['errors']:>7}")
+
+
+# --- EXPORT ---
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def to_otlp(spans):
+    """One OTLP/JSON ExportTraceServiceRequest for the given spans."""
+    otlp_spans = []
+    for s in spans:
+        otlp_span = {
+            'traceId': s.trace_id,
+            'spanId': s.span_id,
+            'name': s.name,
+            'kind': 3 if s.name.startswith('provider.') else 1, # CLIENT for provider calls, INTERNAL otherwise
+            'startTimeUnixNano': str(s.start_ns),
+            'endTimeUnixNano': str(s.end_ns),
+            'attributes': [{'key': key, 'value': _otlp_value(value)} for key, value in s.attributes.items()],
+            'status': {'code': 2, 'message': s.error} if s.error else {'code': 1},
+        }
+        if s.parent_id:
+            otlp_span['parentSpanId'] = s.parent_id
+        otlp_spans.append(otlp_span)
+    return {'resourceSpans': [{
+        'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': SERVICE_NAME}}]},
+        'scopeSpans': [{'scope': {'name': 'tracing'}, 'spans': otlp_spans}],
+    }]}
+
+
+def export(spans):
+    if not TRACE_FILE and not OTLP_ENDPOINT:
+        return
+    document = to_otlp(spans)
+    if TRACE_FILE:
+        try:
+            with open(TRACE_FILE, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(document) + '\n')
+        except OSError as e:
+            print(f"Could not write trace to {TRACE_FILE}: {e}")
+    if OTLP_ENDPOINT:
+        try:
+            providers.post('otlp', f"{OTLP_ENDPOINT.rstrip('/')}/v1/traces", json=document)
+        except providers.ProviderError as e:
+            print(f"Could not export trace to {OTLP_ENDPOINT}: {e}")
@@ -1,99 +1,131 @@
 # /backend/utils.py
-import time
-import requests
-import random
 from slugify import slugify
-from models import db, Article
+from models import db
+import providers
+from model_router import route_chat
+from prompts import get_translation_prompt
+from pipeline_state import StepExhausted, keep_open, track_step
+from persistence import existing_translation_langs, save_translations
+from tracing import current_span, traced
 
 # Define all your target languages in one place
 ALL_TARGET_LANGUAGES = ['en', 'hi', 'fr', 'de', 'pt', 'es', 'it', 'ja', 'ko', 'ru']
-LIBRETRANSLATE_API_URL = "https://libretranslate.de/translate"
 
+@traced('translate')
 def translate_text(text, target_language, source_language):
-    """Translates text using LibreTranslate with a 10-second delay and retries."""
+    """
+    Translates text using LibreTranslate. Pacing (10 seconds between calls) and
+    retries are handled by the shared provider client.
+    """
     if not text or source_language == target_language:
         return text
-    
-    max_retries = 3
-    for attempt in range(max_retries):
-        try:
-            print("      - Waiting 10 seconds before translation...")
-            time.sleep(10)
-            print(f"      - Translating from '{source_language}' to '{target_language}' (Attempt {attempt + 1})...")
-            payload = {'q': text, 'source': source_language, 'target': target_language, 'format': 'text'}
-            
-            response = requests.post(LIBRETRANSLATE_API_URL, json=payload, timeout=60)
-            
-            if response.status_code == 200:
-                translation = response.json().get('translatedText')
-                # If translation is empty or same as original, it's a failure
-                if translation and translation != text:
-                    return translation
-                else:
-                    print(f"      - !!! TRANSLATION ATTEMPT FAILED: Service returned empty or original text.")
-            else:
-                print(f"      - !!! TRANSLATION ATTEMPT FAILED (HTTP {response.status_code}): {response.text}")
-        
-        except requests.exceptions.RequestException as e:
-            print(f"      - !!! TRANSLATION ATTEMPT FAILED (Request Exception): {e}")
+    current_span().attributes.update(source=source_language, target=target_language, chars=len(text))
+    print(f"      - Translating from '{source_language}' to '{target_language}'...")
+    try:
+        translation = providers.translate(text, target_language, source_language)
+        if translation:
+            return translation
+        print(f"      - !!! TRANSLATION FAILED: Service returned empty or original text.")
+    except providers.ProviderError as e:
+        print(f"      - !!! TRANSLATION FAILED: {e}")
+
+    # Fall back to the LLM when LibreTranslate can't help
+    try:
+        print(f"      - Falling back to LLM translation for '{target_language}'...")
+        completion = route_chat('translation',
+            messages=[{"role": "user", "content": get_translation_prompt(text, target_language, source_language)}],
+            temperature=0.2,
+        )
+        translation = completion.choices[0].message.content.strip()
+        if translation and translation != text:
+            return translation
+    except providers.ProviderError as e:
+        print(f"      - !!! LLM TRANSLATION FAILED: {e}")
 
-    print(f"      - !!! FAILED all {max_retries} translation attempts.")
     # --- CHANGE #1: Return None on failure ---
     return None
 
-def create_and_save_translations(original_article):
+class TranslationFailed(Exception):
+    """Raised when any part of an article could not be translated."""
+
+
+def translate_article_fields(original_article, lang_code):
+    """
+    Translates an article's title, meta description and content.
+    Returns a dict of the translated fields, or raises TranslationFailed so
+    that partial translations are never saved.
+    """
+    source_lang = original_article.lang
+    translated_title = translate_text(original_article.title, lang_code, source_lang)
+    
+    # --- CHANGE #2: Check for translation failure before proceeding ---
+    if not translated_title:
+        raise TranslationFailed(f"Title translation to '{lang_code}' failed.")
+
+    translated_slug = slugify(translated_title)
+    if not translated_slug:
+        raise TranslationFailed(f"Empty slug for '{lang_code}' from title: '{translated_title}'")
+
+    translated_meta = translate_text(original_article.meta_description, lang_code, source_lang)
+    # Translate the content with its images merged in, so placeholders are not translated
+    translated_content = translate_text(original_article.render_content(), lang_code, source_lang)
+
+    # Another check to ensure we don't save partial translations
+    if not translated_meta or not translated_content:
+        raise TranslationFailed(f"Meta or Content translation to '{lang_code}' failed.")
+
+    return {'slug': translated_slug, 'title': translated_title,
+            'meta_description': translated_meta, 'content': translated_content}
+
+
+@traced('translations')
+def create_and_save_translations(original_article, run=None, key_prefix=None):
     """
     Takes an article object, translates it, and saves only successful
-    translations to the database.
+    translations to the database, all together in one commit. With a
+    pipeline run, each language is also a step of the run, committed with
+    the translations: a failed language keeps the run open to be retried,
+    up to MAX_STEP_ATTEMPTS. Languages already saved are never translated again.
     """
     print(f"--- Starting translation process for article ID: {original_article.id} ---")
     source_lang = original_article.lang
+    existing = existing_translation_langs(original_article.id)
+    translations = {}
 
     for lang_code in ALL_TARGET_LANGUAGES:
         if lang_code == source_lang:
             continue
 
-        if Article.query.filter_by(original_article_id=original_article.id, lang=lang_code).first():
+        if lang_code in existing:
             print(f"  -> Translation for '{lang_code}' already exists. Skipping.")
             continue
 
         try:
-            translated_title = translate_text(original_article.title, lang_code, source_lang)
-            
-            # --- CHANGE #2: Check for translation failure before proceeding ---
-            if not translated_title:
-                print(f"  -> CRITICAL: Title translation to '{lang_code}' failed. Skipping this language.")
-                continue
-
-            translated_slug = slugify(translated_title)
-            if not translated_slug:
-                print(f"  -> Skipping translation for '{lang_code}' due to empty slug from title: '{translated_title}'")
-                continue
-
-            translated_meta = translate_text(original_article.meta_description, lang_code, source_lang)
-            translated_content = translate_text(original_article.content, lang_code, source_lang)
-
-            # Another check to ensure we don't save partial translations
-            if not translated_meta or not translated_content:
-                print(f"  -> CRITICAL: Meta or Content translation to '{lang_code}' failed. Skipping.")
-                continue
-
-            new_translation = Article(
-                slug=translated_slug, lang=lang_code, title=translated_title,
-                meta_description=translated_meta, content=translated_content,
-                image_url=original_article.image_url, is_published=True,
-                is_breaking_news=original_article.is_breaking_news,
-                author_name=original_article.author_name, author_bio=original_article.author_bio,
-                original_article_id=original_article.id
-            )
-            
-            for category in original_article.categories:
-                new_translation.categories.append(category)
-                
-            db.session.add(new_translation)
-            db.session.commit()
-            print(f"  -> Successfully created and saved translation for '{lang_code}'.")
+            if run is not None:
+                fields = track_step(run, f"{key_prefix}:translations:{lang_code}",
+                    lambda: translate_article_fields(original_article, lang_code), name=f"translations:{lang_code}")
+            else:
+                fields = translate_article_fields(original_article, lang_code)
+            if fields:
+                translations[lang_code] = fields
+                print(f"  -> Translated to '{lang_code}'.")
 
+        except StepExhausted as e:
+            print(f"  -> Giving up on '{lang_code}': {e}")
+        except TranslationFailed as e:
+            print(f"  -> CRITICAL: {e} Skipping this language.")
         except Exception as e:
-            print(f"  -> A critical error occurred while creating translation for '{lang_code}': {e}")
-            db.session.rollback()
\ No newline at end of file
+            print(f"  -> A critical error occurred while translating to '{lang_code}': {e}")
+
+    if not translations:
+        if run is not None:
+            db.session.commit() # The failed steps
+        return
+    try:
+        saved = save_translations(original_article, translations)
+        print(f"  -> Successfully saved {len(saved)} translations: {', '.join(saved) or 'none'}.")
+    except Exception as e:
+        print(f"  -> A critical error occurred while saving translations for article {original_article.id}: {e}")
+        db.session.rollback()
+        if run is not None:
+            keep_open(run) # The steps were rolled back with the translations
@@ -1,54 +1,54 @@
 import os
 import json
-import requests
 import time
 from datetime import date
-from groq import Groq
 import subprocess
-from app import app, db, Article
+from config import create_worker_app
+from models import db, Article
 from prompts import get_ebook_outline_prompt
 from slugify import slugify
 from utils import create_and_save_translations
+import providers
+from model_router import route_chat
+from pipeline_state import start_run, run_step, complete_run, get_step
 
 # --- CONFIGURATION ---
-WEEKLY_PLAN_FILE = "weekly_plan.json"
 GENERATION_API_URL = os.getenv("GENERATION_API_URL")
 GUMROAD_ACCESS_TOKEN = os.getenv("GUMROAD_ACCESS_TOKEN")
-groq_client = Groq(api_key=os.getenv("GROQ_APISEC_KEY"))
+# Database-only app: workers don't need the web app's routes, CORS or Firebase setup
+app = create_worker_app()
 
 # --- EBOOK PLANNING ---
-def get_or_create_ebook_plan():
-    """Loads this week's ebook plan from a file, or generates a new one."""
-    current_week = date.today().isocalendar()[1]
-    plan = {}
-    if os.path.exists(WEEKLY_PLAN_FILE):
-        with open(WEEKLY_PLAN_FILE, 'r', encoding='utf-8') as f:
-            plan = json.load(f)
-
-    if not plan or plan.get("week_number") != current_week:
-        print("No valid ebook plan for this week. Generating a new one...")
-        try:
-            prompt = get_ebook_outline_prompt()
-            chat_completion = groq_client.chat.completions.create(
-                messages=[{"role": "user", "content": prompt}],
-                model="llama-3.3-70b-versatile",
-                response_format={"type": "json_object"},
-            )
-            new_plan = json.loads(chat_completion.choices[0].message.content)
-            new_plan["week_number"] = current_week
-            for chapter in new_plan["chapters"]:
-                chapter["status"] = "pending"
-                chapter["slug"] = ""
-            
-            with open(WEEKLY_PLAN_FILE, 'w', encoding='utf-8') as f:
-                json.dump(new_plan, f, indent=2)
-            print(f"Successfully generated new ebook plan: '{new_plan['ebook_title']}'")
-            return new_plan
-        except Exception as e:
-            print(f"FATAL: Could not generate a new ebook plan. Error: {e}")
-            return None
+def generate_ebook_plan():
+    """Asks the AI for a new ebook outline."""
+    print("No valid ebook plan for this week. Generating a new one...")
+    prompt = get_ebook_outline_prompt()
+    chat_completion = route_chat('planning',
+        messages=[{"role": "user", "content": prompt}],
+        response_format={"type": "json_object"},
+    )
+    new_plan = json.loads(chat_completion.choices[0].message.content)
+    print(f"Successfully generated new ebook plan: '{new_plan['ebook_title']}'")
+    return new_plan
+
+def get_or_create_ebook_plan(run):
+    """
+    Loads this week's ebook plan from the database, or generates a new one.
+    Chapter progress is read from the run's steps, so it survives ephemeral runners.
+    """
+    try:
+        plan = run_step(run, 'plan', generate_ebook_plan)
+    except Exception as e:
+        print(f"FATAL: Could not generate a new ebook plan. Error: {e}")
+        return None
+
+    for i, chapter in enumerate(plan["chapters"]):
+        step = get_step(run, f"chapter:{i}")
+        completed = step is not None and step.status == 'completed'
+        chapter["status"] = "completed" if completed else "pending"
+        chapter["slug"] = step.result["slug"] if completed else ""
     
-    print(f"Loaded existing ebook plan for week {current_week}: '{plan.get('ebook_title')}'")
+    print(f"Loaded ebook plan for week {run.run_key}: '{plan.get('ebook_title')}'")
     return plan
 
 def get_next_chapter_to_write(plan):
@@ -65,13 +65,12 @@ def get_next_chapter_to_write(plan):
             }
     return None
 
-def mark_chapter_as_completed(plan, chapter_index, generated_slug):
-    """Updates the plan file to mark a chapter as done."""
-    plan["chapters"][chapter_index]["status"] = "completed"
-    plan["chapters"][chapter_index]["slug"] = generated_slug
-    with open(WEEKLY_PLAN_FILE, 'w', encoding='utf-8') as f:
-        json.dump(plan, f, indent=2)
-    print(f"Marked chapter as completed: '{plan['chapters'][chapter_index]['title']}'")
+def write_chapter(context, category_name):
+    """Generates a chapter; raising marks the step as failed so the next run retries it."""
+    article_data = generate_chapter_article(context, category_name)
+    if not article_data or not article_data.get("slug"):
+        raise RuntimeError(f"Chapter generation failed for '{context['current_chapter_title']}'.")
+    return {'slug': article_data['slug'], 'article_id': article_data.get('id')}
 
 def generate_chapter_article(context, category_name):
     """Calls the main backend API to generate the article with full context."""
@@ -88,19 +87,12 @@ def generate_chapter_article(context, category_name):
     """
     
     try:
-        response = requests.post(GENERATION_API_URL, json={'query': context_query}, timeout=300)
-        response.raise_for_status()
+        response = providers.post('backend', GENERATION_API_URL, json={'query': context_query})
         
         article_data = response.json()
         print("  - Chapter generated and saved via API successfully.")
-    
-        original_article = Article.query.get(article_data['id'])
-
-        if original_article:
-            create_and_save_translations(original_article)
-
         return article_data 
-    except requests.exceptions.RequestException as e:
+    except providers.ProviderError as e:
         print(f"  - Error calling generation API: {e}")
         return None
 
@@ -130,36 +122,28 @@ def convert_md_to_pdf(md_path, pdf_path, metadata):
         return False
 
 def publish_to_gumroad(pdf_path, plan):
-    """Creates a new product on Gumroad and uploads the PDF."""
-    if not GUMROAD_ACCESS_TOKEN:
-        print("  -> GUMROAD_ACCESS_TOKEN not found. Skipping upload.")
-        return None
-    
+    """
+    Creates a new product on Gumroad, uploads the PDF and returns the product URL.
+    Raises on any failure, so the 'published' step is recorded as failed and retried.
+    """
     print(f"  -> Publishing {pdf_path} to Gumroad...")
-    try:
-        with open(pdf_path, 'rb') as f:
-            files = {'files[]': (os.path.basename(pdf_path), f, 'application/pdf')}
-            data = {
-                'access_token': GUMROAD_ACCESS_TOKEN,
-                'name': plan['ebook_title'],
-                'price': '49',
-                'description': f"A comprehensive guide on {plan['ebook_title']}. This ebook contains in-depth chapters covering everything you need to know to get started.",
-            }
-            response = requests.post("https://api.gumroad.com/v2/products", data=data, files=files)
-            response.raise_for_status()
-            product_data = response.json()
-            if product_data.get('success'):
-                product_url = product_data['product']['short_url']
-                print(f"  -> Successfully published to Gumroad! URL: {product_url}")
-                return product_url
-            else:
-                print(f"  -> Gumroad API Error: {product_data.get('message')}")
-                return None
-    except Exception as e:
-        print(f"  -> An error occurred while publishing to Gumroad: {e}")
-        return None
-
-def compile_ebook_if_complete(plan):
+    with open(pdf_path, 'rb') as f:
+        files = {'files[]': (os.path.basename(pdf_path), f, 'application/pdf')}
+        data = {
+            'access_token': GUMROAD_ACCESS_TOKEN,
+            'name': plan['ebook_title'],
+            'price': '49',
+            'description': f"A comprehensive guide on {plan['ebook_title']}. This ebook contains in-depth chapters covering everything you need to know to get started.",
+        }
+        response = providers.post('gumroad', "https://api.gumroad.com/v2/products", data=data, files=files)
+    product_data = response.json()
+    if not product_data.get('success') or not product_data.get('product', {}).get('short_url'):
+        raise providers.ProviderError('gumroad', f"API error: {product_data.get('message')}")
+    product_url = product_data['product']['short_url']
+    print(f"  -> Successfully published to Gumroad! URL: {product_url}")
+    return product_url
+
+def compile_ebook_if_complete(plan, run):
     """Checks if all chapters are written, then compiles and publishes the ebook."""
     chapters = plan.get("chapters", [])
     if not all(c.get("status") == "completed" for c in chapters):
@@ -169,8 +153,14 @@ def compile_ebook_if_complete(plan):
     md_filename = f"{ebook_slug}.md"
     pdf_filename = f"{ebook_slug}.pdf"
     
+    published = get_step(run, 'published')
+    if published is not None and published.status == 'completed':
+        print(f"Ebook '{plan['ebook_title']}' is already published.")
+        return
     if os.path.exists(pdf_filename):
-        print(f"PDF '{pdf_filename}' already exists. Skipping compilation and publishing.")
+        # A failed publish left the PDF behind; go straight to publishing it again
+        print(f"PDF '{pdf_filename}' already exists. Skipping compilation.")
+        publish_ebook(pdf_filename, plan, run)
         return
 
     print(f"--- All chapters complete! Compiling ebook: {md_filename} ---")
@@ -191,36 +181,54 @@ def compile_ebook_if_complete(plan):
     pdf_success = convert_md_to_pdf(md_filename, pdf_filename, {"title": plan["ebook_title"], "subtitle": plan["subtitle"]})
     
     if pdf_success:
-        product_url = publish_to_gumroad(pdf_filename, plan)
-        if product_url:
-            with open("published_ebooks.log", "a", encoding='utf-8') as log_file:
-                log_file.write(f"{plan['ebook_title']}|{product_url}\n")
+        publish_ebook(pdf_filename, plan, run)
+
+def publish_ebook(pdf_filename, plan, run):
+    """Publishes the compiled ebook once and completes the run. Failures are left for the next run to retry."""
+    if not GUMROAD_ACCESS_TOKEN:
+        print("  -> GUMROAD_ACCESS_TOKEN not found. Skipping upload; the run stays open until it is set.")
+        return
+    try:
+        # Publishing is a step too, so a rerun never creates a second Gumroad product
+        product_url = run_step(run, 'published', lambda: {'product_url': publish_to_gumroad(pdf_filename, plan)})['product_url']
+    except Exception as e:
+        print(f"  -> Publishing to Gumroad failed: {e}. Will retry on the next run.")
+        return
+    if not product_url:
+        return
+    with open("published_ebooks.log", "a", encoding='utf-8') as log_file:
+        log_file.write(f"{plan['ebook_title']}|{product_url}\n")
+    complete_run(run)
 
 # --- MAIN JOB ORCHESTRATION ---
 def run_weekly_job():
     print("--- Starting Weekly Ebook Generation Job ---")
     with app.app_context():
-        plan = get_or_create_ebook_plan()
+        run = start_run('weekly_ebook', run_key=date.today().strftime('%G-W%V'))
+        plan = get_or_create_ebook_plan(run)
         if not plan: return
 
         next_chapter = get_next_chapter_to_write(plan)
         if not next_chapter:
             print("All chapters for this week's ebook have been generated.")
-            compile_ebook_if_complete(plan)
+            compile_ebook_if_complete(plan, run)
             return
 
-        article_data = generate_chapter_article(next_chapter, plan.get("category", "General"))
-        
-        if article_data and article_data.get("slug"):
-            mark_chapter_as_completed(next_chapter["current_chapter_index"], article_data["slug"])
-            # Reload plan from file to get the latest state
-            with open(WEEKLY_PLAN_FILE, 'r', encoding='utf-8') as f:
-                plan = json.load(f)
-        else:
-            print("Chapter generation failed. Will retry on the next run.")
+        index = next_chapter["current_chapter_index"]
+        try:
+            chapter = run_step(run, f"chapter:{index}", lambda: write_chapter(next_chapter, plan.get("category", "General")))
+            plan["chapters"][index]["status"] = "completed"
+            plan["chapters"][index]["slug"] = chapter["slug"]
+            print(f"Marked chapter as completed: '{plan['chapters'][index]['title']}'")
+
+            original_article = Article.query.get(chapter['article_id']) if chapter.get('article_id') else None
+            if original_article:
+                create_and_save_translations(original_article, run=run, key_prefix=f"chapter:{index}")
+        except Exception as e:
+            print(f"Chapter generation failed: {e}. Will retry on the next run.")
         
-        compile_ebook_if_complete(plan)
+        compile_ebook_if_complete(plan, run)
     print("--- Weekly Ebook Generation Job Finished ---")
 
 if __name__ == '__main__':
-    run_weekly_job()
\ No newline at end of file
+    run_weekly_job()
@@ -0,0 +1,266 @@
+# /backend/worker_daemon.py
+"""
+A single long-running worker process that runs every content job on an
+in-process cron scheduler:
+
+    python worker_daemon.py
+
+The database engine, Firebase, the Groq client and the provider connection pools are
+loaded once and stay warm across jobs, instead of paying a cold start on
+every cron run. A Postgres advisory lock per job stops two daemons (or a
+daemon and a manual run) from running the same job at the same time.
+
+When the daemon is deployed, set the WORKER_DAEMON_ENABLED repository
+variable to 'true' so the GitHub Actions cron workflows stand down. The
+weekly ebook is the exception: it always runs in its workflow, which has
+pandoc and LaTeX and commits the compiled PDF. The daemon only keeps the
+backend awake when KEEP_ALIVE_URL is set; set a KEEP_ALIVE_URL repository
+variable as well, or keep_alive.yml keeps running.
+"""
+import datetime
+import os
+import random
+import signal
+import threading
+import time
+import zlib
+
+from sqlalchemy import text
+
+import providers
+
+# --- CONFIGURATION ---
+# Extra random delay (seconds) before each run, so jobs don't all hit the providers at once
+DEFAULT_JITTER = int(os.getenv("WORKER_JITTER_SECONDS", "60"))
+KEEP_ALIVE_URL = os.getenv("KEEP_ALIVE_URL") # e.g. https://my-backend.onrender.com/api/health
+
+
+class CronSchedule:
+    """A standard 5-field cron expression (minute hour day-of-month month day-of-week), in UTC."""
+
+    RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 6)]
+
+    def __init__(self, expression):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression must have 5 fields: '{expression}'")
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, self.weekdays = [
+            self._parse(field, low, high) for field, (low, high) in zip(fields, self.RANGES)
+        ]
+        # Like cron: if both day fields are restricted, a match on either one is enough
+        self.days_restricted = fields[2] != '*'
+        self.weekdays_restricted = fields[4] != '*'
+
+    @staticmethod
+    def _parse(field, low, high):
+        values = set()
+        for part in field.split(','):
+            part, _, step = part.partition('/')
+            step = int(step) if step else 1
+            if part == '*':
+                start, end = low, high
+            elif '-' in part:
+                start, end = (int(x) for x in part.split('-'))
+            else:
+                start = int(part)
+                end = high if step > 1 else start
+            values.update(range(start, end + 1, step))
+        if high == 6 and 7 in values: # 7 is also Sunday
+            values.discard(7)
+            values.add(0)
+        if not values or min(values) < low or max(values) > high:
+            raise ValueError(f"Cron field '{field}' is out of range {low}-{high}")
+        return values
+
+    def _day_matches(self, moment):
+        weekday = (moment.weekday() + 1) % 7 # cron counts from Sunday = 0
+        day_ok = moment.day in self.days
+        weekday_ok = weekday in self.weekdays
+        if self.days_restricted and self.weekdays_restricted:
+            return day_ok or weekday_ok
+        return day_ok and weekday_ok
+
+    def next_after(self, moment):
+        """Returns the first matching minute strictly after moment."""
+        candidate = moment.replace(second=0, microsecond=0) + datetime.timedelta(minutes=1)
+        limit = candidate + datetime.timedelta(days=366)
+        while candidate < limit:
+            if candidate.month not in self.months or not self._day_matches(candidate):
+                candidate = (candidate + datetime.timedelta(days=1)).replace(hour=0, minute=0)
+                continue
+            if candidate.hour not in self.hours:
+                candidate = (candidate + datetime.timedelta(hours=1)).replace(minute=0)
+                continue
+            if candidate.minute not in self.minutes:
+                candidate += datetime.timedelta(minutes=1)
+                continue
+            return candidate
+        raise ValueError(f"Cron expression '{self.expression}' never matches")
+
+
+class ScheduledJob:
+    def __init__(self, name, cron, func, jitter=DEFAULT_JITTER):
+        self.name = name
+        self.schedule = CronSchedule(cron)
+        self.func = func
+        self.jitter = jitter
+        self.running = False
+        self.next_run = None
+
+    def plan_next(self, now):
+        self.next_run = self.schedule.next_after(now) + datetime.timedelta(seconds=random.uniform(0, self.jitter))
+
+
+def advisory_lock_key(name):
+    """Postgres advisory locks take a 64-bit integer; derive a stable one from the job name."""
+    return zlib.crc32(f"worker_daemon:{name}".encode('utf-8'))
+
+
+def run_with_lock(app, db, job):
+    """
+    Runs a job while holding its advisory lock; skips the run if someone else
+    holds it. The lock is transaction-level, held by a transaction left open
+    on its own connection until the job ends: behind PgBouncer in transaction
+    mode, a session lock could be released on a different server connection
+    and leak, while an open transaction keeps its server connection.
+    """
+    with app.app_context():
+        is_postgres = db.engine.dialect.name == 'postgresql'
+        connection = db.engine.connect() if is_postgres else None
+        try:
+            if connection is not None:
+                locked = connection.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {'key': advisory_lock_key(job.name)}).scalar()
+                if not locked:
+                    print(f"[daemon] '{job.name}' is already running elsewhere. Skipping this run.")
+                    return
+            started = time.monotonic()
+            print(f"[daemon] Starting '{job.name}'...")
+            job.func()
+            print(f"[daemon] Finished '{job.name}' in {time.monotonic() - started:.0f}s.")
+        except Exception as e:
+            print(f"[daemon] '{job.name}' failed: {e}")
+        finally:
+            if connection is not None:
+                connection.rollback() # Ends the transaction, releasing the lock
+                connection.close()
+            db.session.remove()
+
+
+def keep_alive():
+    providers.request('backend', 'GET', KEEP_ALIVE_URL, timeout=30)
+
+
+def purge_llm_cache():
+    import llm_cache
+    print(f"[daemon] Purged {llm_cache.purge_expired()} expired LLM completions.")
+
+
+def build_feeds():
+    """Sitemaps and feeds for what changed; FEEDS_DIR must be the directory the web app or nginx serves."""
+    import change_log
+    import feeds
+    feeds.build()
+    change_log.prune()
+
+
+def export_snapshots():
+    import change_log
+    import export
+    export.export()
+    change_log.prune()
+
+
+def archive_articles():
+    import archive
+    archive.archive_old_articles()
+
+
+def train_archive_dictionaries():
+    """New archive rows use the newest dictionaries; older rows keep theirs until archive.py --recompress."""
+    import archive
+    if archive.ARCHIVE_CODEC == 'zstd':
+        archive.train_dictionaries()
+
+
+def build_jobs():
+    """Imports every worker once; their clients and pools then stay warm for the daemon's lifetime."""
+    from breaking_news_worker import run_breaking_news_job
+    from daily_content_worker import run_daily_job
+    from future_content_worker import run_future_content_job
+
+    # Same schedules as the GitHub Actions workflows. The weekly ebook stays in
+    # its workflow: it needs pandoc and LaTeX, and commits the compiled PDF to the repo.
+    jobs = [
+        ScheduledJob('breaking_news', '0 */3 * * *', run_breaking_news_job),
+        ScheduledJob('daily_content', '0 1 * * *', run_daily_job),
+        ScheduledJob('future_content', '0 5 * * 0', run_future_content_job),
+        ScheduledJob('llm_cache_purge', '30 4 * * *', purge_llm_cache),
+        ScheduledJob('archive', '0 3 * * *', archive_articles),
+        # Incremental, so a run with nothing new is a single query
+        ScheduledJob('feeds', '*/5 * * * *', build_feeds, jitter=10),
+        ScheduledJob('export', '*/2 * * * *', export_snapshots, jitter=10),
+        ScheduledJob('archive_dictionaries', '30 2 1 * *', train_archive_dictionaries), # Before that day's archive run
+    ]
+    if KEEP_ALIVE_URL:
+        jobs.append(ScheduledJob('keep_alive', '*/10 * * * *', keep_alive, jitter=0))
+    return jobs
+
+
+def run_daemon():
+    from config import create_worker_app
+    from models import db
+
+    app = create_worker_app()
+
+    jobs = build_jobs()
+    if not KEEP_ALIVE_URL:
+        print("[daemon] KEEP_ALIVE_URL is not set, so the backend is not kept awake (keep_alive.yml still runs without the KEEP_ALIVE_URL repository variable).")
+    stop = threading.Event()
+    threads = []
+
+    def shutdown(signum, frame):
+        print("[daemon] Shutdown requested. Waiting for running jobs to finish...")
+        stop.set()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    for job in jobs:
+        job.plan_next(now)
+        print(f"[daemon] '{job.name}' ({job.schedule.expression}) next runs at {job.next_run:%Y-%m-%d %H:%M:%S} UTC.")
+
+    while not stop.is_set():
+        now = datetime.datetime.now(datetime.timezone.utc)
+        for job in jobs:
+            if job.next_run > now:
+                continue
+            job.plan_next(now)
+            if job.running:
+                # Overlap prevention within this process
+                print(f"[daemon] '{job.name}' is still running from its last slot. Skipping.")
+                continue
+
+            def target(job=job):
+                job.running = True
+                try:
+                    run_with_lock(app, db, job)
+                finally:
+                    job.running = False
+
+            thread = threading.Thread(target=target, name=f"job-{job.name}", daemon=True)
+            thread.start()
+            threads.append(thread)
+
+        threads = [t for t in threads if t.is_alive()]
+        next_wake = min(job.next_run for job in jobs)
+        stop.wait(max(1.0, min(30.0, (next_wake - now).total_seconds())))
+
+    for thread in threads:
+        thread.join()
+    print("[daemon] Stopped.")
+
+
+if __name__ == '__main__':
+    run_daemon()